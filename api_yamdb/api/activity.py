@@ -0,0 +1,129 @@
+"""Лента активности пользователя: отзывы и комментарии по времени.
+
+Каждый источник читается по индексу (author, pub_date) от курсора не
+больше чем на страницу вперёд, а heapq.merge сливает их на лету, так
+что стоимость страницы не зависит от объёма активности пользователя.
+"""
+import heapq
+import json
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+from itertools import islice
+
+from django.db.models import F, Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from reviews.models import Comment, Review
+
+# Порядок видов при совпадении времени: больший - раньше в ленте.
+COMMENT = 'comment'
+REVIEW = 'review'
+KINDS = (COMMENT, REVIEW)
+
+
+def _sort_key(item):
+    return item['pub_date'], KINDS.index(item['type']), item['id']
+
+
+def _after(kind, cursor):
+    """Условие "позже в ленте, чем курсор" для источника kind."""
+    if cursor is None:
+        return Q()
+    pub_date, cursor_kind, pk = cursor
+    earlier = Q(pub_date__lt=pub_date)
+    rank, cursor_rank = KINDS.index(kind), KINDS.index(cursor_kind)
+    if rank < cursor_rank:
+        return earlier | Q(pub_date=pub_date)
+    if rank == cursor_rank:
+        return earlier | Q(pub_date=pub_date, pk__lt=pk)
+    return earlier
+
+
+def _sources(user_id, cursor, limit):
+    reviews = Review.objects.filter(
+        _after(REVIEW, cursor), author_id=user_id
+    ).order_by('-pub_date', '-pk').values(
+        'id', 'title_id', 'text', 'score', 'pub_date'
+    )
+    comments = Comment.objects.filter(
+        _after(COMMENT, cursor), author_id=user_id
+    ).order_by('-pub_date', '-pk').values(
+        'id', 'review_id', 'text', 'pub_date',
+        title_id=F('review__title_id'),
+    )
+    return [
+        _tagged(REVIEW, reviews[:limit]), _tagged(COMMENT, comments[:limit])
+    ]
+
+
+def _tagged(kind, queryset):
+    for row in queryset.iterator():
+        row['type'] = kind
+        yield row
+
+
+def iter_activity(user_id, cursor=None, limit=None):
+    """Отзывы и комментарии пользователя от новых к старым, начиная
+    после курсора (pub_date, вид, id). Каждый источник читает не больше
+    limit строк.
+    """
+    return heapq.merge(
+        *_sources(user_id, cursor, limit), key=_sort_key, reverse=True
+    )
+
+
+class ActivityPagination:
+    """Курсорная пагинация ленты: только вперёд, ссылка next."""
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Некорректный курсор.'
+
+    def __init__(self, page_size=None):
+        self.page_size = page_size or api_settings.PAGE_SIZE
+
+    def encode_cursor(self, item):
+        payload = json.dumps([
+            item['pub_date'].isoformat(), item['type'], item['id']
+        ]).encode()
+        return b64encode(payload).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            pub_date, kind, pk = json.loads(b64decode(encoded.encode()))
+            pub_date, pk = parse_datetime(pub_date), int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if pub_date is None or kind not in KINDS:
+            raise NotFound(self.invalid_cursor_message)
+        return pub_date, kind, pk
+
+    def paginate(self, user_id, request):
+        self.request = request
+        cursor = self.decode_cursor(request)
+        page = list(islice(
+            iter_activity(user_id, cursor, self.page_size + 1),
+            self.page_size + 1
+        ))
+        self.has_next = len(page) > self.page_size
+        self.page = page[:self.page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.page[-1])
+        )
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
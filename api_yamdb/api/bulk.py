@@ -0,0 +1,122 @@
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from reviews.models import GenreTitle, Title
+from reviews.signals import bump_on_commit
+from .serializers import TitleSerializer
+
+CREATED = 'created'
+UPDATED = 'updated'
+VALID = 'valid'
+ERROR = 'error'
+
+
+def _is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def validate_titles(items):
+    """Проверяет пакет произведений. Элементы с id обновляют
+    существующие произведения (как PATCH), остальные создаются.
+    Возвращает список пар (результат, проверенный сериализатор или None).
+    Существующие произведения читаются одним запросом с блокировкой
+    строк, жанры и категории берутся из справочника в памяти. Вызывается
+    в одной транзакции с save_titles(), чтобы проверенные произведения
+    не изменились до записи.
+    """
+    existing = Title.objects.select_for_update().in_bulk([
+        item['id'] for item in items
+        if isinstance(item, dict) and _is_id(item.get('id'))
+    ])
+    seen = set()
+    results = []
+    for index, item in enumerate(items):
+        result = {'index': index}
+        if not isinstance(item, dict):
+            result.update(status=ERROR, errors={
+                'non_field_errors': ['Ожидался объект произведения.']
+            })
+            results.append((result, None))
+            continue
+        pk = item.get('id')
+        instance = None
+        if pk is not None:
+            instance = existing.get(pk) if _is_id(pk) else None
+            if instance is None or pk in seen:
+                result.update(status=ERROR, id=pk, errors={'id': [
+                    'Произведение не найдено или повторяется в пакете.'
+                ]})
+                results.append((result, None))
+                continue
+            seen.add(pk)
+        serializer = TitleSerializer(
+            instance, data=item, partial=instance is not None
+        )
+        if not serializer.is_valid():
+            result.update(status=ERROR, errors=serializer.errors)
+            if pk is not None:
+                result['id'] = pk
+            results.append((result, None))
+            continue
+        result['status'] = VALID
+        results.append((result, serializer))
+    return results
+
+
+def _insert_titles(titles):
+    if connection.features.can_return_ids_from_bulk_insert:
+        Title.objects.bulk_create(titles)
+        return
+    # Без RETURNING (SQLite) id новых строк известны только по одной.
+    for title in titles:
+        title.save(force_insert=True)
+
+
+def save_titles(validated):
+    """Записывает проверенные произведения и их жанры пакетными
+    запросами и дополняет результаты id. Изменяемые произведения
+    сгруппированы по набору переданных полей: каждое получает только
+    свои поля.
+    """
+    to_create, written = [], []
+    to_update = defaultdict(list)
+    now = timezone.now()
+    for result, serializer in validated:
+        data = dict(serializer.validated_data)
+        genre = data.pop('genre', None)
+        if serializer.instance is None:
+            title = Title(**data)
+            to_create.append(title)
+            result['status'] = CREATED
+        else:
+            title = serializer.instance
+            for field, value in data.items():
+                setattr(title, field, value)
+            title.updated = now
+            to_update[frozenset(data)].append(title)
+            result['status'] = UPDATED
+        written.append((result, title, genre))
+    with transaction.atomic():
+        _insert_titles(to_create)
+        for fields, titles in to_update.items():
+            Title.objects.bulk_update(titles, sorted({'updated', *fields}))
+        relinked = [
+            title.pk for result, title, genre in written
+            if genre is not None and result['status'] == UPDATED
+        ]
+        # Без сигналов по каждой связи: штампы меняются ниже одним вызовом.
+        GenreTitle.objects.filter(title_id__in=relinked)._raw_delete(
+            GenreTitle.objects.db
+        )
+        GenreTitle.objects.bulk_create([
+            GenreTitle(title_id=title.pk, genre_id=item.pk)
+            for _, title, genre in written if genre is not None
+            for item in genre
+        ])
+        bump_on_commit('titles', *(
+            f'title:{title.pk}' for _, title, _ in written
+        ))
+    for result, title, _ in written:
+        result['id'] = title.pk
@@ -0,0 +1,102 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from rest_framework.renderers import BaseRenderer
+
+from reviews import catalog
+from reviews.models import GenreTitle
+
+EXPORT_FIELDS = ('id', 'name', 'year', 'rating', 'description', 'updated')
+CSV_HEADER = EXPORT_FIELDS + ('category', 'genre')
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Форматы выгрузки каталога. Ответ выгрузки потоковый и не
+    рендерится, рендереры нужны для выбора формата через Accept или
+    ?format=ndjson|csv.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode()
+
+
+class CSVRenderer(NDJSONRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_title_chunks(queryset, chunk_size):
+    """Произведения с жанрами и категорией порциями по chunk_size.
+    Строки читаются курсором на стороне сервера (QuerySet.iterator),
+    связи с жанрами - одним запросом на порцию, названия жанров и
+    категорий - из справочника в памяти, поэтому память не растёт
+    с размером каталога.
+    """
+    rows = queryset.order_by('pk').values_list(
+        *EXPORT_FIELDS, 'category_id'
+    ).iterator(chunk_size=chunk_size)
+    for chunk in _chunks(rows, chunk_size):
+        genres = {}
+        links = GenreTitle.objects.filter(
+            title_id__in=[row[0] for row in chunk], genre__isnull=False
+        ).values_list('title_id', 'genre_id')
+        for title_id, genre_id in links:
+            genre = catalog.genres.get_by_id(genre_id)
+            if genre is not None:
+                genres.setdefault(title_id, []).append(genre)
+        items = []
+        for row in chunk:
+            item = dict(zip(EXPORT_FIELDS, row))
+            item['updated'] = item['updated'].isoformat()
+            item['category'] = catalog.categories.get_by_id(row[-1])
+            item['genre'] = sorted(
+                genres.get(item['id'], ()), key=lambda genre: genre.name
+            )
+            items.append(item)
+        yield items
+
+
+def _reference(obj):
+    return {'name': obj.name, 'slug': obj.slug}
+
+
+def ndjson_stream(chunks):
+    encoder = json.JSONEncoder(ensure_ascii=False)
+    for items in chunks:
+        lines = []
+        for item in items:
+            category = item['category']
+            item['category'] = _reference(category) if category else None
+            item['genre'] = [_reference(genre) for genre in item['genre']]
+            lines.append(encoder.encode(item) + '\n')
+        yield ''.join(lines)
+
+
+def csv_stream(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    yield buffer.getvalue()
+    for items in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        for item in items:
+            category = item['category']
+            writer.writerow([item[field] for field in EXPORT_FIELDS] + [
+                category.slug if category else '',
+                '|'.join(genre.slug for genre in item['genre']),
+            ])
+        yield buffer.getvalue()
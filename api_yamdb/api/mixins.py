@@ -1,4 +1,19 @@
-from rest_framework import mixins, viewsets
+import hashlib
+import math
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import (
+    http_date, parse_etags, parse_http_date_safe, quote_etag
+)
+from rest_framework import mixins, status, viewsets
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+from core import metrics, routers, versions
 
 
 class ListCreateDestroyViewSet(
@@ -8,3 +23,205 @@ class ListCreateDestroyViewSet(
     viewsets.GenericViewSet,
 ):
     pass
+
+
+def get_request_role(request):
+    """Роль пользователя, от которой может зависеть ответ."""
+    user = request.user
+    if not user or not user.is_authenticated:
+        return 'anonymous'
+    if user.is_superuser:
+        return 'superuser'
+    return user.role
+
+
+class NestedResourceMixin:
+    """Родительские объекты вложенных маршрутов (произведение, отзыв).
+    resolve_parents() проверяет всю цепочку из URL одним запросом, а
+    результат запоминается в request.parents, откуда его берут вьюсет,
+    сериализаторы и разрешения. Запросы к одному объекту родителей
+    не читают: цепочку проверяет условие запроса самого объекта.
+    """
+
+    def resolve_parents(self):
+        raise NotImplementedError(
+            'Укажите, как получить родительские объекты.'
+        )
+
+    @property
+    def parents(self):
+        parents = getattr(self.request, 'parents', None)
+        if parents is None:
+            parents = self.resolve_parents()
+            self.request.parents = parents
+        return parents
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'Ресурс был изменён, получите его заново.'
+    default_code = 'precondition_failed'
+
+
+class CachedResponseMixin:
+    """Кэширует ответы GET-запросов и отвечает на условные запросы.
+    Ключ кэша состоит из полного адреса запроса (ссылки next и previous
+    в ответе абсолютные и зависят от схемы и хоста), роли пользователя
+    и штампов версий ресурсов из get_cache_scopes(), поэтому изменение
+    данных сразу делает закэшированные ответы недостижимыми, а TTL
+    лишь освобождает место. Попадания и промахи учитываются в счётчике
+    response_cache_requests, результат виден в заголовке X-Cache.
+    Из тех же штампов строятся ETag и Last-Modified: запрос с
+    совпавшим If-None-Match или If-Modified-Since получает 304 без
+    обращения к базе и сериализатору. If-None-Match: * совпадает,
+    только если ресурс существует, поэтому такой запрос ответ строит.
+    """
+
+    def get_cache_scopes(self):
+        raise NotImplementedError(
+            'Укажите ресурсы, от которых зависит ответ.'
+        )
+
+    def get_validators(self, request):
+        """ETag и время последнего изменения ответа."""
+        stamps = versions.get_stamps(*self.get_cache_scopes())
+        raw = '|'.join([
+            request.accepted_media_type or '',
+            *(f'{scope}={stamps[scope]}' for scope in sorted(stamps)),
+        ])
+        etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+        last_modified = max(map(versions.stamp_time, stamps.values()))
+        return etag, last_modified
+
+    def get_last_modified_header(self, last_modified):
+        """Время изменения с точностью до секунды, округлённое вверх.
+        Пока эта секунда не закончилась, в неё может попасть ещё одно
+        изменение, которое клиент с таким If-Modified-Since не увидит,
+        поэтому заголовок не отдаётся.
+        """
+        rounded = math.ceil(last_modified)
+        if rounded > time.time():
+            return None
+        return http_date(rounded)
+
+    def is_not_modified(self, request, etag, last_modified):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            return etag in parse_etags(if_none_match)
+        if_modified_since = parse_http_date_safe(
+            request.META.get('HTTP_IF_MODIFIED_SINCE', '')
+        )
+        return (if_modified_since is not None
+                and last_modified <= if_modified_since)
+
+    def matches_any(self, request):
+        return '*' in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+
+    def get_cache_key(self, request, etag):
+        raw = '|'.join([
+            request.build_absolute_uri(), get_request_role(request), etag
+        ])
+        digest = hashlib.md5(raw.encode()).hexdigest()
+        return f'response:{self.basename}:{self.action}:{digest}'
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        if routers.may_lag(last_modified):
+            # Реплики могли ещё не получить последние изменения: ответ
+            # с реплики не кэшируется и не получает валидаторов.
+            return handler(request, *args, **kwargs)
+        if self.is_not_modified(request, etag, last_modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = self.fetch_response(
+                etag, handler, request, *args, **kwargs
+            )
+            if response.status_code == 200 and self.matches_any(request):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            last_modified = self.get_last_modified_header(last_modified)
+            if last_modified is not None:
+                response['Last-Modified'] = last_modified
+        return response
+
+    def fetch_response(self, etag, handler, request, *args, **kwargs):
+        cache = caches[settings.RESPONSE_CACHE_ALIAS]
+        key = self.get_cache_key(request, etag)
+        cached = cache.get(key)
+        result = 'hit' if cached is not None else 'miss'
+        metrics.inc(
+            'response_cache_requests',
+            view=self.basename, action=self.action, result=result
+        )
+        if cached is not None:
+            response = Response(cached)
+        else:
+            response = handler(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(
+                    key, response.data, settings.RESPONSE_CACHE_TIMEOUT
+                )
+        response['X-Cache'] = result.upper()
+        return response
+
+
+class CachedListMixin(CachedResponseMixin):
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+
+class CachedRetrieveMixin(CachedResponseMixin):
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+
+class IfMatchMixin(CachedResponseMixin):
+    """Оптимистическая блокировка: изменение и удаление объекта с
+    заголовком If-Match выполняются, только если ETag объекта, который
+    отдаёт retrieve, не изменился с момента чтения. Иначе - 412.
+    Проверка и запись идут в одной транзакции под блокировкой строки
+    объекта, а штамп версии меняется до её фиксации, поэтому из
+    параллельных запросов с одним If-Match проходит только первый.
+    """
+
+    @contextmanager
+    def if_match(self, request):
+        """Выполняет блок, если If-Match нет или он совпадает с ETag
+        объекта.
+        """
+        if_match = request.META.get('HTTP_IF_MATCH')
+        if not if_match:
+            yield
+            return
+        model = self.get_queryset().model
+        with transaction.atomic():
+            list(model.objects.select_for_update().filter(
+                pk=self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+            ).values_list('pk'))
+            etag, _ = self.get_validators(request)
+            etags = parse_etags(if_match)
+            if '*' not in etags and etag not in etags:
+                raise PreconditionFailed()
+            # Следующий запрос с тем же If-Match дождётся блокировки и
+            # уже не совпадёт. Сигналы сменят штамп ещё раз после
+            # фиксации.
+            versions.bump(*self.get_cache_scopes())
+            yield
+
+    def update(self, request, *args, **kwargs):
+        with self.if_match(request):
+            response = super().update(request, *args, **kwargs)
+        etag, _ = self.get_validators(request)
+        response['ETag'] = etag
+        return response
+
+    def destroy(self, request, *args, **kwargs):
+        with self.if_match(request):
+            return super().destroy(request, *args, **kwargs)
@@ -0,0 +1,138 @@
+import json
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetCursorPagination:
+    """Постраничная выдача по непрозрачному курсору.
+    Курсор хранит значение поля сортировки и id последнего объекта
+    страницы, следующая страница выбирается условием
+    (поле, id) > (значение, id), поэтому стоимость запроса не зависит
+    от глубины. Поле сортировки берётся из order_by запроса или из
+    Meta.ordering модели, id используется для разрешения равенств.
+    """
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Некорректный курсор.'
+
+    def __init__(self, page_size):
+        self.page_size = page_size
+
+    def get_ordering(self, queryset):
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        if len(ordering) != 1 or not isinstance(ordering[0], str):
+            raise NotFound(
+                'Курсорная пагинация недоступна для этой сортировки.'
+            )
+        field_name = ordering[0].lstrip('-')
+        return field_name, ordering[0].startswith('-')
+
+    def encode_cursor(self, obj, reverse):
+        value = self.field.value_to_string(obj)
+        payload = json.dumps([value, obj.pk, reverse]).encode()
+        return b64encode(payload).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, pk, reverse = json.loads(b64decode(encoded.encode()))
+            value = self.field.to_python(value)
+            if value is None:
+                # Поля сортировки списков обязательные, с NULL не
+                # сравнить.
+                raise ValueError
+            return value, int(pk), bool(reverse)
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        field_name, descending = self.get_ordering(queryset)
+        self.field = queryset.model._meta.get_field(field_name)
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor[2])
+        # При движении назад порядок и сравнения меняются на обратные.
+        backwards = descending != reverse
+        lookup = 'lt' if backwards else 'gt'
+        if cursor is not None:
+            value, pk = cursor[0], cursor[1]
+            queryset = queryset.filter(
+                Q(**{f'{field_name}__{lookup}': value})
+                | Q(**{field_name: value, f'pk__{lookup}': pk})
+            )
+        prefix = '-' if backwards else ''
+        queryset = queryset.order_by(f'{prefix}{field_name}', f'{prefix}pk')
+        page = list(queryset[:self.page_size + 1])
+        has_more = len(page) > self.page_size
+        page = page[:self.page_size]
+        if reverse:
+            page.reverse()
+        self.has_next = has_more if not reverse else cursor is not None
+        self.has_previous = cursor is not None if not reverse else has_more
+        self.page = page
+        return page
+
+    def get_link(self, obj, reverse):
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(obj, reverse)
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.get_link(self.page[-1], False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.get_link(self.page[0], True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+
+class PageNumberOrCursorPagination(PageNumberPagination):
+    """Пагинация по номеру страницы, как и раньше, либо по курсору,
+    если в запросе передан параметр cursor (пустое значение - первая
+    страница). Клиенты выбирают режим в каждом запросе.
+    """
+    cursor_query_param = KeysetCursorPagination.cursor_query_param
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params:
+            return super().paginate_queryset(queryset, request, view)
+        self.cursor_paginator = KeysetCursorPagination(
+            self.get_page_size(request)
+        )
+        return self.cursor_paginator.paginate_queryset(
+            queryset, request, view
+        )
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_next_link(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_next_link()
+        return super().get_next_link()
+
+    def get_previous_link(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_previous_link()
+        return super().get_previous_link()
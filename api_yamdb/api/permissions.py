@@ -9,7 +9,8 @@ class IsAuthorAdminModeratorOrReadOnly(permissions.BasePermission):
     - moderator, admin - право удалять и редактировать любые отзывы и
     комментарии.
     - author - создателю объекта разрешено удаление и редактирование
-    созданного объекта.
+    созданного объекта. Автор сравнивается по id, без загрузки
+    пользователя.
     """
     def has_permission(self, request, view):
         return (request.method in permissions.SAFE_METHODS
@@ -17,7 +18,7 @@ class IsAuthorAdminModeratorOrReadOnly(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
         return (request.method in permissions.SAFE_METHODS
-                or obj.author == request.user
+                or obj.author_id == request.user.id
                 or request.user.is_admin
                 or request.user.is_moderator
                 )
@@ -1,13 +1,24 @@
 from django.shortcuts import get_object_or_404
+from django.utils.encoding import smart_str
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from reviews.models import Category, Comment, Genre, Review, Title, User
+from core.timing import TimedSerializerMixin
+from reviews import catalog
+from reviews.models import (
+    SCORE_FIELDS, Category, Comment, Genre, Review, Title, User
+)
+from users.authentication import add_user_claims
 
 
-class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+class CustomTokenObtainPairSerializer(
+    TimedSerializerMixin, TokenObtainPairSerializer
+):
     """Сериализатор для включения данных, которые
     хотим отправить в ответ.
+    В ответе - access-токен (token по спецификации, он же access) и
+    refresh-токен. В токенах - id, роль пользователя и версия его
+    токенов: права проверяются по токену без запроса к базе.
     """
 
     def __init__(self, *args, **kwargs):
@@ -23,11 +34,16 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         user = get_object_or_404(User, username=username)
         if user.confirmation_code != confirmation_code:
             raise ValidationError(detail='Код не корректный')
-        data = {}
-        return data
+        refresh = self.get_token(user)
+        access = str(refresh.access_token)
+        return {'token': access, 'access': access, 'refresh': str(refresh)}
 
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
 
-class CategorySerializer(serializers.ModelSerializer):
+
+class CategorySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Категории, описание."""
 
     class Meta:
@@ -39,7 +55,7 @@ class CategorySerializer(serializers.ModelSerializer):
         }
 
 
-class GenreSerializer(serializers.ModelSerializer):
+class GenreSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Жанры, описание."""
 
     class Meta:
@@ -51,76 +67,144 @@ class GenreSerializer(serializers.ModelSerializer):
         }
 
 
-class TitleSerializer(serializers.ModelSerializer):
+class CatalogSlugRelatedField(serializers.SlugRelatedField):
+    """Ссылка на категорию или жанр по slug. Объект ищется в справочнике
+    в памяти, поэтому N slug'ов разрешаются без N запросов.
+    """
+
+    def __init__(self, reference, **kwargs):
+        self.reference = reference
+        kwargs.setdefault('queryset', reference.model.objects.all())
+        super().__init__(slug_field='slug', **kwargs)
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            self.fail('invalid')
+        obj = self.reference.get_by_slug(data)
+        if obj is None:
+            self.fail(
+                'does_not_exist',
+                slug_name=self.slug_field, value=smart_str(data)
+            )
+        return obj
+
+
+class TitleSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Основной метод записи информации."""
-    genre = serializers.SlugRelatedField(
-        slug_field='slug', many=True, queryset=Genre.objects.all()
-    )
-    category = serializers.SlugRelatedField(
-        slug_field='slug', queryset=Category.objects.all()
-    )
+    genre = CatalogSlugRelatedField(catalog.genres, many=True)
+    category = CatalogSlugRelatedField(catalog.categories)
 
     class Meta:
         model = Title
-        fields = '__all__'
-
-
-class ReadOnlyTitleSerializer(serializers.ModelSerializer):
-    rating = serializers.IntegerField(
-        source='reviews__score__avg', read_only=True
-    )
-    genre = GenreSerializer(many=True)
-    category = CategorySerializer()
+        exclude = ('score_sum', 'score_count', 'updated', *SCORE_FIELDS)
+        read_only_fields = ('rating',)
+
+
+class ReadOnlyTitleSerializer(
+    TimedSerializerMixin, serializers.ModelSerializer
+):
+    """Чтение произведений. Рейтинг и количество отзывов берутся из
+    полей Title.rating и Title.score_count, которые поддерживаются при
+    изменении отзывов. Жанры и категория берутся из справочника в
+    памяти, из базы читаются только связи произведения с жанрами
+    (genretitle_set).
+    """
+    rating = serializers.IntegerField(read_only=True)
+    reviews_count = serializers.IntegerField(source='score_count')
+    genre = serializers.SerializerMethodField()
+    category = serializers.SerializerMethodField()
 
     class Meta:
         model = Title
         fields = (
-            'id', 'name', 'year', 'rating', 'description', 'genre', 'category'
+            'id', 'name', 'year', 'rating', 'reviews_count', 'description',
+            'genre', 'category'
         )
 
+    def get_genre(self, obj):
+        genres = filter(None, (
+            catalog.genres.get_by_id(link.genre_id)
+            for link in obj.genretitle_set.all()
+        ))
+        return GenreSerializer(
+            sorted(genres, key=lambda genre: genre.name), many=True
+        ).data
+
+    def get_category(self, obj):
+        category = catalog.categories.get_by_id(obj.category_id)
+        if category is None:
+            return None
+        return CategorySerializer(category).data
+
+
+class TitleHistogramSerializer(
+    TimedSerializerMixin, serializers.ModelSerializer
+):
+    """Распределение оценок произведения, их среднее и медиана.
+    Считаются по агрегатам произведения, без чтения отзывов.
+    """
+    count = serializers.IntegerField(source='score_count')
+    mean = serializers.SerializerMethodField()
+    median = serializers.FloatField(source='score_median')
+    scores = serializers.SerializerMethodField()
 
-class ReviewSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Title
+        fields = ('id', 'count', 'mean', 'median', 'scores')
+
+    def get_mean(self, obj):
+        if not obj.score_count:
+            return None
+        return round(obj.score_sum / obj.score_count, 2)
+
+    def get_scores(self, obj):
+        return {str(score): count
+                for score, count in obj.score_histogram.items()}
+
+
+class ReviewSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор модели Review.
     Список полей модели, которые будут сериализовать или
     десериализовать: 'title', 'text', 'author', 'score', 'pub_date'.
     Поля доступные только для чтения: 'id', 'author', 'pub_date'.
-    Ключ author возвращает username автора.
-    В сериализаторе имеется проверка:
-    - уникальность пары: автор отзыва, произведение, на которое оставлен
-    отзыв.
+    Ключ author возвращает username автора, вьюсет загружает авторов
+    вместе с отзывами (select_related).
+    Повторный отзыв на произведение отклоняет ограничение
+    unique_author_title в базе, вьюсет превращает его в ошибку 400.
     """
-    author = serializers.SlugRelatedField(
-        read_only=True,
-        default=serializers.CurrentUserDefault(),
-        slug_field='username')
+    author = serializers.CharField(source='author.username', read_only=True)
 
     class Meta:
         model = Review
-        fields = ('id', 'text', 'author', 'score', 'pub_date')
-        read_only_fields = ('id', 'title', 'pub_date')
-
-    def validate(self, data):
-        if self.context['request'].method != 'POST':
-            return data
-        author = self.context['request'].user
-        title = self.context['view'].kwargs.get('title_id')
-        if Review.objects.filter(author=author, title=title).exists():
-            raise serializers.ValidationError(
-                'Вы уже оставляли отзыв на это произведение!')
-        return data
+        fields = ('id', 'text', 'author', 'score', 'pub_date',
+                  'comments_count')
+        read_only_fields = ('id', 'title', 'pub_date', 'comments_count')
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор модели Comment.
     Список полей модели, которые будут сериализовать или
     десериализовать: 'id', 'review', 'text', 'author', 'pub_date'.
     Поля доступные только для чтения: 'id', 'review', 'pub_date'.
     Ключ author возвращает username автора.
     """
-    author = serializers.SlugRelatedField(read_only=True,
-                                          slug_field='username')
+    author = serializers.CharField(source='author.username', read_only=True)
 
     class Meta:
         model = Comment
         fields = ('id', 'text', 'author', 'pub_date')
         read_only_fields = ('id', 'review', 'pub_date')
+
+
+class ActivitySerializer(TimedSerializerMixin, serializers.Serializer):
+    """Элемент ленты активности пользователя: отзыв или комментарий.
+    Строки приходят из api.activity словарями; review есть только у
+    комментариев, score - только у отзывов.
+    """
+    type = serializers.CharField()
+    id = serializers.IntegerField()
+    title = serializers.IntegerField(source='title_id')
+    review = serializers.IntegerField(source='review_id', required=False)
+    text = serializers.CharField()
+    score = serializers.IntegerField(required=False)
+    pub_date = serializers.DateTimeField()
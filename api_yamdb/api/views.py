@@ -1,13 +1,38 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_datetime
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Avg
-from rest_framework import filters, viewsets
-from rest_framework.permissions import AllowAny
+from rest_framework import filters, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework_simplejwt.views import TokenObtainPairView
 
-from reviews.models import Category, Comment, Genre, Review, Title
-from .mixins import ListCreateDestroyViewSet
+from core.throttling import IPThrottle, UsernameThrottle
+from reviews.models import (
+    SCORE_FIELDS, Category, Comment, Genre, Review, Title
+)
+from .mixins import (
+    CachedListMixin,
+    CachedRetrieveMixin,
+    IfMatchMixin,
+    ListCreateDestroyViewSet,
+    NestedResourceMixin,
+)
 from reviews.filters import TitlesFilter
+from users.permissions import IsAdministratorRole
+from .bulk import save_titles, validate_titles
+from .export import (
+    CSVRenderer,
+    NDJSONRenderer,
+    csv_stream,
+    iter_title_chunks,
+    ndjson_stream,
+)
 from .permissions import (
     IsAdminOrReadOnly,
     IsAuthorAdminModeratorOrReadOnly
@@ -20,11 +45,15 @@ from .serializers import (
     GenreSerializer,
     ReadOnlyTitleSerializer,
     ReviewSerializer,
+    TitleHistogramSerializer,
     TitleSerializer,
 )
 
 
-class CategoryViewSet(ListCreateDestroyViewSet):
+DUPLICATE_REVIEW_MESSAGE = 'Вы уже оставляли отзыв на это произведение!'
+
+
+class CategoryViewSet(CachedListMixin, ListCreateDestroyViewSet):
     """
     Получить список всех категорий.
     """
@@ -35,8 +64,11 @@ class CategoryViewSet(ListCreateDestroyViewSet):
     search_fields = ('name',)
     lookup_field = 'slug'
 
+    def get_cache_scopes(self):
+        return ('categories',)
+
 
-class GenreViewSet(ListCreateDestroyViewSet):
+class GenreViewSet(CachedListMixin, ListCreateDestroyViewSet):
     """
     Получить список всех жанров.
     """
@@ -47,13 +79,18 @@ class GenreViewSet(ListCreateDestroyViewSet):
     search_fields = ('name',)
     lookup_field = 'slug'
 
+    def get_cache_scopes(self):
+        return ('genres',)
 
-class TitleViewSet(viewsets.ModelViewSet):
+
+class TitleViewSet(
+    CachedListMixin, CachedRetrieveMixin, viewsets.ModelViewSet
+):
     """
     Получить список всех объектов.
     """
-    queryset = Title.objects.all().annotate(
-        Avg('reviews__score')
+    queryset = Title.objects.prefetch_related(
+        'genretitle_set'
     ).order_by('name')
     serializer_class = TitleSerializer
     permission_classes = (IsAdminOrReadOnly,)
@@ -65,17 +102,110 @@ class TitleViewSet(viewsets.ModelViewSet):
             return ReadOnlyTitleSerializer
         return TitleSerializer
 
+    def get_cache_scopes(self):
+        if self.action == 'histogram':
+            return (f'title:{self.kwargs["pk"]}',)
+        if self.detail:
+            return (f'title:{self.kwargs["pk"]}', 'genres', 'categories')
+        return ('titles',)
+
+    @action(detail=True)
+    def histogram(self, request, pk=None):
+        """Распределение оценок 1-10, среднее и медиана оценок
+        произведения. Читается одна строка произведения по pk.
+        """
+        return self.cached_response(self._histogram, request, pk=pk)
+
+    def _histogram(self, request, pk=None):
+        title = get_object_or_404(
+            Title.objects.only('score_sum', 'score_count', *SCORE_FIELDS),
+            pk=pk
+        )
+        return Response(TitleHistogramSerializer(title).data)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Пакетное создание и изменение произведений.
+        Принимает список произведений; элементы с id изменяются.
+        mode=atomic (по умолчанию) - при любой ошибке ничего не
+        записывается, ответ 400. mode=partial - записываются корректные
+        элементы, при наличии ошибок ответ 207. В ответе результат по
+        каждому элементу.
+        """
+        mode = request.query_params.get('mode', 'atomic')
+        if mode not in ('atomic', 'partial'):
+            raise ValidationError({'mode': 'Допустимы atomic и partial.'})
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError('Ожидался список произведений.')
+        if len(items) > settings.BULK_TITLES_MAX:
+            raise ValidationError(
+                f'Не больше {settings.BULK_TITLES_MAX} произведений за раз.'
+            )
+        with transaction.atomic():
+            validated = validate_titles(items)
+            valid = [pair for pair in validated if pair[1] is not None]
+            has_errors = len(valid) < len(validated)
+            if has_errors and mode == 'atomic':
+                return Response(
+                    [result for result, _ in validated],
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if valid:
+                save_titles(valid)
+        results = [result for result, _ in validated]
+        if has_errors:
+            return Response(results, status=status.HTTP_207_MULTI_STATUS)
+        return Response(results, status=status.HTTP_201_CREATED)
+
+    @action(
+        detail=False, permission_classes=(IsAdministratorRole,),
+        renderer_classes=(NDJSONRenderer, CSVRenderer)
+    )
+    def export(self, request):
+        """Потоковая выгрузка всего каталога с жанрами, категорией и
+        рейтингом в NDJSON (по умолчанию) или CSV (?format=csv).
+        updated_since=<дата ISO 8601> оставляет произведения, изменённые
+        после указанного момента.
+        """
+        queryset = Title.objects.all()
+        updated_since = request.query_params.get('updated_since')
+        if updated_since:
+            moment = parse_datetime(updated_since)
+            if moment is None:
+                raise ValidationError(
+                    {'updated_since': 'Ожидалась дата в формате ISO 8601.'}
+                )
+            queryset = queryset.filter(updated__gt=moment)
+        chunks = iter_title_chunks(queryset, settings.EXPORT_CHUNK_SIZE)
+        renderer = request.accepted_renderer
+        stream = csv_stream if renderer.format == 'csv' else ndjson_stream
+        response = StreamingHttpResponse(
+            stream(chunks),
+            content_type=f'{renderer.media_type}; charset=utf-8'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="titles.{renderer.format}"'
+        )
+        return response
+
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     """Обработка выдачи токенов. Принимает набор учетных данных
     пользователя и возвращает пару веб-токенов для подтверждения
     аутентификации этих учетных данных.
+    Частота запросов ограничена по IP и по username до работы с базой.
     """
     permission_classes = [AllowAny]
     serializer_class = CustomTokenObtainPairSerializer
+    throttle_classes = (IPThrottle, UsernameThrottle)
+    throttle_scope = 'token'
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(
+    NestedResourceMixin, CachedListMixin, CachedRetrieveMixin, IfMatchMixin,
+    viewsets.ModelViewSet
+):
     """Вьюсет ReviewViewSet.
     Во вьюсете переопределяем метод perform_create().
     При создании отзыва значение автора берем из объекта request: в нем
@@ -84,7 +214,8 @@ class ReviewViewSet(viewsets.ModelViewSet):
     - получить список всех отзывов,
     - получить отзыв по id для указанного произведения.
     Доступно аутентифицированному пользователю:
-    - добавить новый отзыв.
+    - добавить новый отзыв,
+    - создать или заменить свой отзыв (PUT reviews/me/).
     Доступно автору отзыва, модератору или администратору:
     - частичное обновление отзыва по id,
     - удаление отзыва по id.
@@ -92,22 +223,63 @@ class ReviewViewSet(viewsets.ModelViewSet):
     permission_classes = (IsAuthorAdminModeratorOrReadOnly,)
     serializer_class = ReviewSerializer
 
-    def get_title(self):
-        return get_object_or_404(Title, pk=self.kwargs.get('title_id'))
+    def resolve_parents(self):
+        return {'title': get_object_or_404(Title, pk=self.kwargs['title_id'])}
 
     def get_queryset(self):
-        return Review.objects.filter(title=self.get_title())
+        reviews = Review.objects.select_related('author')
+        if self.detail:
+            return reviews.filter(title_id=self.kwargs['title_id'])
+        return reviews.filter(title=self.parents['title'])
+
+    def get_cache_scopes(self):
+        if self.detail:
+            return (f'review:{self.kwargs["pk"]}',)
+        return (f'reviews:{self.kwargs["title_id"]}',)
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user, title=self.get_title())
+        title = self.parents['title']
+        try:
+            serializer.save(author_id=self.request.user.pk, title=title)
+        except IntegrityError:
+            if not Review.objects.filter(
+                author_id=self.request.user.pk, title=title
+            ).exists():
+                raise
+            raise ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [DUPLICATE_REVIEW_MESSAGE]
+            })
+
+    @action(
+        detail=False, methods=['put'], url_path='me',
+        permission_classes=(IsAuthenticated,)
+    )
+    def upsert(self, request, title_id=None):
+        """Создаёт или заменяет отзыв пользователя на произведение.
+        Повтор запроса с теми же данными ничего не меняет.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        review, created = Review.objects.upsert(
+            self.parents['title'], request.user.pk,
+            **serializer.validated_data
+        )
+        return Response(
+            self.get_serializer(review).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(
+    NestedResourceMixin, CachedListMixin, CachedRetrieveMixin, IfMatchMixin,
+    viewsets.ModelViewSet
+):
     """Вьюсет CommentViewSet.
     Во вьюсете переопределяем метод perform_create().
     - При создании комментария значение автора берем из объекта request: в нем
     доступен экземпляр пользователя, которому принадлежит токен.
-    - Принадлежность комментария посту получаем через self.kwargs.
+    - Отзыв и произведение из URL проверяются одним запросом, комментарий
+    привязывается к отзыву из request.parents.
     Доступно всем:
     - получить список всех комментариев к отзыву,
     - получить комментарий для отзыва по id.
@@ -118,14 +290,31 @@ class CommentViewSet(viewsets.ModelViewSet):
     - удаление комментария по id.
     """
     permission_classes = (IsAuthorAdminModeratorOrReadOnly,)
-    queryset = Comment.objects.all()
     serializer_class = CommentSerializer
 
-    def get_review(self):
-        return get_object_or_404(Review, pk=self.kwargs.get('review_id'))
+    def resolve_parents(self):
+        review = get_object_or_404(
+            Review.objects.select_related('title'),
+            pk=self.kwargs['review_id'],
+            title_id=self.kwargs['title_id'],
+        )
+        return {'title': review.title, 'review': review}
 
     def get_queryset(self):
-        return Comment.objects.filter(review=self.get_review())
+        comments = Comment.objects.select_related('author', 'review')
+        if self.detail:
+            return comments.filter(
+                review_id=self.kwargs['review_id'],
+                review__title_id=self.kwargs['title_id'],
+            )
+        return comments.filter(review=self.parents['review'])
+
+    def get_cache_scopes(self):
+        if self.detail:
+            return (f'comment:{self.kwargs["pk"]}',)
+        return (f'comments:{self.kwargs["review_id"]}',)
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user, review=self.get_review())
+        serializer.save(
+            author_id=self.request.user.pk, review=self.parents['review']
+        )
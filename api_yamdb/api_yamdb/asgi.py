@@ -1,7 +1,12 @@
 import os
 
-from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+
+from core.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_yamdb.settings')
 
-application = get_asgi_application()
+# В Django 2.2 нет ASGI-обработчика: запросы выполняет WSGI-приложение
+# в пуле потоков (см. core.asgi). Запуск - SERVER_MODE=asgi в Dockerfile
+# или gunicorn api_yamdb.asgi:application с gunicorn.conf.py.
+application = ASGIHandler(get_wsgi_application())
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from datetime import timedelta
 
 from dotenv import load_dotenv
@@ -32,7 +33,10 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.PrimaryPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -75,10 +79,80 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', default='postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='postgres1'),
         'HOST': os.getenv('DB_HOST', default='db'),
-        'PORT': os.getenv('DB_PORT', default='5432')
+        'PORT': os.getenv('DB_PORT', default='5432'),
+        # Сколько секунд поток держит соединение между запросами.
+        # Бэкенды с пулом (core.db.postgresql, core.db.sqlite3)
+        # возвращают соединение в пул после каждого запроса.
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default=60)),
+        'POOL': {
+            'MAX_SIZE': int(os.getenv('DB_POOL_SIZE', default=10)),
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', default=10)),
+            'CHECK_INTERVAL': float(
+                os.getenv('DB_POOL_CHECK_INTERVAL', default=5)
+            ),
+            'MAX_IDLE': float(os.getenv('DB_POOL_MAX_IDLE', default=300)),
+        },
     }
 }
 
+# Реплики для чтения: DB_REPLICA_HOSTS=replica1,replica2 (остальные
+# параметры подключения - как у основной базы), см. core.routers.
+REPLICA_HOSTS = [
+    host.strip() for host in os.getenv('DB_REPLICA_HOSTS', default='').split(',')
+    if host.strip()
+]
+REPLICA_DATABASES = [
+    f'replica{number}' for number in range(1, len(REPLICA_HOSTS) + 1)
+]
+DATABASES.update({
+    alias: {**DATABASES['default'], 'HOST': host, 'TEST': {'MIRROR': 'default'}}
+    for alias, host in zip(REPLICA_DATABASES, REPLICA_HOSTS)
+})
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Сколько секунд после изменения данных клиент читает с основной базы.
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', default=5))
+REPLICA_PIN_CACHE = 'default'
+# Через сколько секунд снова пробовать недоступную реплику.
+REPLICA_RETRY_INTERVAL = int(os.getenv('REPLICA_RETRY_INTERVAL', default=30))
+
+# Кэш ответов: locmem (по умолчанию, в памяти воркера), filebased или
+# общий memcached, например
+# CACHE_BACKEND=django.core.cache.backends.memcached.PyLibMCCache.
+# Штампы версий должны быть общими для воркеров, поэтому по умолчанию
+# хранятся в файловом кэше.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='yamdb'),
+    },
+    'versions': {
+        'BACKEND': os.getenv(
+            'VERSIONS_CACHE_BACKEND',
+            default='django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.getenv(
+            'VERSIONS_CACHE_LOCATION',
+            default=os.path.join(tempfile.gettempdir(), 'yamdb-versions')
+        ),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', default=300))
+VERSIONS_CACHE_ALIAS = 'versions'
+
+METRICS_DIR = os.getenv(
+    'METRICS_DIR', default=os.path.join(tempfile.gettempdir(), 'yamdb-metrics')
+)
+METRICS_FLUSH_INTERVAL = 1.0
+# /metrics отдаёт метрики только с Authorization: Bearer <токен>, без
+# заданного токена - никому.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', default='')
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -126,15 +200,68 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.ClaimsJWTAuthentication',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 5
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.PageNumberOrCursorPagination',
+    'PAGE_SIZE': 5,
+    # Число прокси перед приложением (nginx). IP клиента для лимитов -
+    # адрес, который последний прокси дописал в X-Forwarded-For, а не
+    # присланный самим клиентом.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', default=1)),
+    # Корзины токенов core.throttling для регистрации и выдачи токена.
+    'DEFAULT_THROTTLE_RATES': {
+        'signup_ip': os.getenv('SIGNUP_IP_RATE', default='20/min'),
+        'signup_username': os.getenv('SIGNUP_USERNAME_RATE', default='3/min'),
+        'token_ip': os.getenv('TOKEN_IP_RATE', default='30/min'),
+        'token_username': os.getenv('TOKEN_USERNAME_RATE', default='10/min'),
+    },
 }
+# Пулы потоков ASGI-приложения (core.asgi): для чтений и для остальных
+# запросов. Потоки ограничивают число одновременных запросов к базе.
+ASGI_READ_THREADS = int(os.getenv('ASGI_READ_THREADS', default=16))
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', default=4))
+# Где хранить корзины: local - в памяти воркера, cache - в общем кэше
+# THROTTLE_CACHE_ALIAS (лимит на все воркеры).
+THROTTLE_STORE = os.getenv('THROTTLE_STORE', default='local')
+THROTTLE_CACHE_ALIAS = 'default'
 
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
+# Сколько последних версий токенов пользователей помнит каждый процесс.
+TOKEN_VERSIONS_LRU_SIZE = int(
+    os.getenv('TOKEN_VERSIONS_LRU_SIZE', default=1024)
+)
 
 MAIL_FROM = 'from@example.com'
+# Очередь исходящих писем (core.mail): фоновый поток в каждом процессе,
+# порции по MAIL_OUTBOX_BATCH_SIZE писем через одно соединение и
+# повторы с удвоением задержки от MAIL_OUTBOX_RETRY_DELAY секунд.
+MAIL_OUTBOX_WORKER = os.getenv('MAIL_OUTBOX_WORKER', default='1') == '1'
+MAIL_OUTBOX_BATCH_SIZE = int(os.getenv('MAIL_OUTBOX_BATCH_SIZE', default=100))
+MAIL_OUTBOX_POLL_INTERVAL = 10
+MAIL_OUTBOX_LEASE = 300
+MAIL_OUTBOX_MAX_ATTEMPTS = 8
+MAIL_OUTBOX_RETRY_DELAY = 30
+MAIL_OUTBOX_MAX_RETRY_DELAY = 3600
+
+BULK_TITLES_MAX = 10000
+EXPORT_CHUNK_SIZE = 2000
+
+# Server-Timing (core.middleware.ServerTimingMiddleware): доля запросов
+# с подробными замерами и записью в журнал и сколько одинаковых
+# SQL-запросов считать признаком N+1.
+SERVER_TIMING_SAMPLE_RATE = float(os.getenv('SERVER_TIMING_SAMPLE_RATE', default=0.05))
+SERVER_TIMING_REPEATED_QUERIES = 5
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
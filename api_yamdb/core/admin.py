@@ -0,0 +1,5 @@
+from django.contrib import admin
+
+from .models import OutgoingMail
+
+admin.site.register(OutgoingMail)
@@ -0,0 +1,189 @@
+"""ASGI-приложение поверх WSGI-обработчика Django.
+
+Django 2.2 не умеет ASGI, поэтому сервер (uvicorn) держит соединения
+в цикле событий, а сам запрос Django - с разбором, запросами к базе и
+сериализацией - выполняется в ограниченном пуле потоков. Медленные
+клиенты, которые долго присылают запрос или читают ответ, не занимают
+потоков: тело запроса читается, а готовый ответ отправляется в цикле
+событий. Когда все потоки заняты (например, база отвечает медленно),
+новые запросы ждут в очереди пула, а не занимают по воркеру.
+
+Чтения - GET и HEAD к спискам и объектам произведений, категорий и
+жанров и к спискам отзывов и комментариев - выполняются в своём пуле
+ASGI_READ_THREADS, остальные запросы - в пуле ASGI_THREADS, так что
+медленные записи не отнимают потоки у чтений.
+"""
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.urls import Resolver404, resolve
+
+from . import metrics
+
+READ_METHODS = ('GET', 'HEAD')
+READ_ROUTES = {
+    'api:titles-list',
+    'api:titles-detail',
+    'api:categories-list',
+    'api:genres-list',
+    'api:reviews-list',
+    'api:comments-list',
+}
+
+
+def is_read_route(method, path):
+    """Запрос к одной из конечных точек только для чтения."""
+    if method not in READ_METHODS:
+        return False
+    try:
+        return resolve(path).view_name in READ_ROUTES
+    except Resolver404:
+        return False
+
+
+def build_environ(scope, body):
+    """WSGI-окружение для запроса ASGI."""
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('ascii'),
+        'SERVER_PROTOCOL': f'HTTP/{scope["http_version"]}',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    server = scope.get('server') or ('localhost', 80)
+    environ['SERVER_NAME'], environ['SERVER_PORT'] = server[0], str(
+        server[1]
+    )
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+        environ['REMOTE_PORT'] = str(scope['client'][1])
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name not in ('CONTENT_LENGTH', 'CONTENT_TYPE'):
+            name = f'HTTP_{name}'
+        if name in environ:
+            value = f'{environ[name]},{value}'
+        environ[name] = value
+    return environ
+
+
+class ASGIHandler:
+    """ASGI-приложение (ASGI 3) для WSGI-приложения Django."""
+
+    def __init__(self, wsgi_application, read_threads=None, threads=None):
+        self.wsgi_application = wsgi_application
+        self.read_executor = ThreadPoolExecutor(
+            read_threads or settings.ASGI_READ_THREADS,
+            thread_name_prefix='asgi-read',
+        )
+        self.executor = ThreadPoolExecutor(
+            threads or settings.ASGI_THREADS, thread_name_prefix='asgi',
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(
+                f'Неподдерживаемый тип соединения {scope["type"]}'
+            )
+        body = await self.read_body(receive)
+        if body is None:
+            return
+        read = is_read_route(scope['method'], scope['path'])
+        executor = self.read_executor if read else self.executor
+        metrics.inc('asgi_requests', pool='read' if read else 'default')
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(
+            executor, self.run, build_environ(scope, body), loop, send
+        )
+        if response is not None:
+            status, headers, content = response
+            await send({
+                'type': 'http.response.start',
+                'status': status,
+                'headers': headers,
+            })
+            await send({'type': 'http.response.body', 'body': content})
+
+    async def read_body(self, receive):
+        """Тело запроса или None, если клиент отключился, не дослав
+        его: такой запрос не выполняется.
+        """
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        return b''.join(chunks)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.read_executor.shutdown(wait=False)
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def run(self, environ, loop, send):
+        """Выполняет запрос в потоке пула. Обычный ответ возвращается
+        целиком и отправляется клиенту уже в цикле событий. Потоковый
+        ответ (экспорт) читает базу по мере отправки, поэтому
+        отправляется из этого же потока.
+        """
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in headers
+            ]
+
+        def send_from_thread(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        result = self.wsgi_application(environ, start_response)
+        # close() в том же потоке: сигнал request_finished закрывает
+        # соединение с базой этого потока.
+        try:
+            if not getattr(result, 'streaming', False):
+                return (
+                    started['status'], started['headers'], b''.join(result)
+                )
+            send_from_thread({
+                'type': 'http.response.start',
+                'status': started['status'],
+                'headers': started['headers'],
+            })
+            for chunk in result:
+                if chunk:
+                    send_from_thread({
+                        'type': 'http.response.body',
+                        'body': chunk,
+                        'more_body': True,
+                    })
+            send_from_thread({'type': 'http.response.body', 'body': b''})
+            return None
+        finally:
+            close = getattr(result, 'close', None)
+            if close is not None:
+                close()
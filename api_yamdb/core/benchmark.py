@@ -0,0 +1,34 @@
+"""Приложения для сравнения WSGI и ASGI (команда benchmark_serving).
+
+wsgi_application и asgi_application - те же приложения, что в
+api_yamdb.wsgi и api_yamdb.asgi, но при BENCHMARK_DB_DELAY каждый
+запрос к базе задерживается на указанное число секунд, как на
+медленной базе.
+"""
+import os
+import time
+
+from django.core.wsgi import get_wsgi_application
+from django.db.backends.signals import connection_created
+
+from .asgi import ASGIHandler
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_yamdb.settings')
+
+
+def _delay(execute, sql, params, many, context):
+    time.sleep(float(os.environ['BENCHMARK_DB_DELAY']))
+    return execute(sql, params, many, context)
+
+
+def _slow_database(sender, connection, **kwargs):
+    # Объект соединения потока переживает переподключения к базе.
+    if _delay not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_delay)
+
+
+if float(os.environ.get('BENCHMARK_DB_DELAY') or 0):
+    connection_created.connect(_slow_database)
+
+wsgi_application = get_wsgi_application()
+asgi_application = ASGIHandler(wsgi_application)
@@ -0,0 +1,258 @@
+"""Пул соединений с базой для воркера.
+
+Django держит по соединению на поток и без CONN_MAX_AGE открывает его
+заново на каждый запрос. Бэкенды core.db.postgresql и core.db.sqlite3
+вместо этого берут соединение из пула процесса при первом запросе к
+базе и возвращают его в пул в конце запроса (настройка
+DATABASES[...]['POOL']):
+
+* MAX_SIZE - не больше стольких соединений процесса одновременно;
+  потоки сверх лимита ждут свободное соединение до TIMEOUT секунд;
+* CHECK_INTERVAL - соединение, простоявшее в пуле дольше (или
+  вернувшееся после ошибки базы), перед выдачей проверяется SELECT 1,
+  неработающее закрывается и заменяется новым; 0 - проверять всегда;
+* MAX_IDLE - соединения, простоявшие без дела дольше, закрываются.
+
+Счётчики db_pool_creates, db_pool_reuses, db_pool_waits,
+db_pool_timeouts, db_pool_discarded и показатель db_pool_connections
+(занятые и свободные соединения) пишутся в core.metrics с меткой alias.
+"""
+import os
+import threading
+import time
+
+from .. import metrics
+
+DEFAULTS = {
+    'MAX_SIZE': 10,
+    'TIMEOUT': 10.0,
+    'CHECK_INTERVAL': 5.0,
+    'MAX_IDLE': 300.0,
+}
+
+
+class PoolTimeoutError(Exception):
+    """Свободное соединение не появилось за TIMEOUT секунд."""
+
+
+def _close_quietly(raw):
+    try:
+        raw.close()
+    except Exception:
+        pass
+
+
+def ping(raw):
+    """Соединение отвечает на запросы."""
+    if getattr(raw, 'closed', False):
+        return False
+    try:
+        cursor = raw.cursor()
+        try:
+            cursor.execute('SELECT 1')
+        finally:
+            cursor.close()
+        # Без автокоммита SELECT открыл транзакцию.
+        raw.rollback()
+    except Exception:
+        return False
+    return True
+
+
+class ConnectionPool:
+    """Пул соединений одного alias в одном процессе. Потокобезопасен."""
+
+    timer = time.monotonic
+
+    def __init__(self, alias, max_size, timeout, check_interval, max_idle):
+        self.alias = alias
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.max_idle = max_idle
+        self.pid = os.getpid()
+        # Свободные соединения: (соединение, когда вернули, проверено),
+        # последние вернувшиеся - в конце.
+        self.idle = []
+        self.in_use = 0
+        self.condition = threading.Condition()
+
+    def _evict(self, now):
+        """Убирает из пула простаивающие дольше MAX_IDLE. Вызывается
+        под блокировкой, возвращает соединения для закрытия.
+        """
+        expired = 0
+        while (
+            expired < len(self.idle)
+            and now - self.idle[expired][1] > self.max_idle
+        ):
+            expired += 1
+        evicted = [raw for raw, _, _ in self.idle[:expired]]
+        del self.idle[:expired]
+        return evicted
+
+    def _discard(self, connections, reason):
+        for raw in connections:
+            _close_quietly(raw)
+            metrics.inc('db_pool_discarded', alias=self.alias, reason=reason)
+
+    def _report(self):
+        metrics.set_gauge(
+            'db_pool_connections', self.in_use,
+            alias=self.alias, state='in_use',
+        )
+        metrics.set_gauge(
+            'db_pool_connections', len(self.idle),
+            alias=self.alias, state='idle',
+        )
+
+    def _checkout(self):
+        """Занимает место в пуле, при исчерпанном лимите дождавшись
+        освобождения. Возвращает свободное соединение, если оно есть.
+        Вызывается под блокировкой.
+        """
+        deadline = None
+        while not self.idle and self.in_use >= self.max_size:
+            now = self.timer()
+            if deadline is None:
+                deadline = now + self.timeout
+                metrics.inc('db_pool_waits', alias=self.alias)
+            if now >= deadline:
+                metrics.inc('db_pool_timeouts', alias=self.alias)
+                raise PoolTimeoutError(
+                    f'Все {self.max_size} соединений с базой '
+                    f'{self.alias} заняты'
+                )
+            self.condition.wait(deadline - now)
+        self.in_use += 1
+        entry = self.idle.pop() if self.idle else None
+        self._report()
+        return entry
+
+    def _is_usable(self, entry):
+        raw, returned, checked = entry
+        if checked and self.timer() - returned < self.check_interval:
+            return not getattr(raw, 'closed', False)
+        return ping(raw)
+
+    def acquire(self, connect):
+        """Выдаёт соединение из пула или открывает новое вызовом
+        connect(). При исчерпанном лимите ждёт освобождения соединения.
+        """
+        evicted = []
+        try:
+            with self.condition:
+                evicted = self._evict(self.timer())
+                entry = self._checkout()
+        finally:
+            self._discard(evicted, 'idle')
+        if entry is not None:
+            if self._is_usable(entry):
+                metrics.inc('db_pool_reuses', alias=self.alias)
+                return entry[0]
+            self._discard([entry[0]], 'invalid')
+        try:
+            raw = connect()
+        except Exception:
+            self.discard(None)
+            raise
+        metrics.inc('db_pool_creates', alias=self.alias)
+        return raw
+
+    def release(self, raw, checked=True):
+        """Возвращает соединение в пул. checked=False - соединение
+        нужно проверить перед следующей выдачей.
+        """
+        with self.condition:
+            self.in_use -= 1
+            self.idle.append((raw, self.timer(), checked))
+            evicted = self._evict(self.timer())
+            self._report()
+            self.condition.notify()
+        self._discard(evicted, 'idle')
+
+    def discard(self, raw, reason='broken'):
+        """Закрывает выданное соединение и освобождает его место в
+        пуле. raw=None - соединение так и не открылось.
+        """
+        with self.condition:
+            self.in_use -= 1
+            self._report()
+            self.condition.notify()
+        if raw is not None:
+            self._discard([raw], reason)
+
+    def close(self):
+        """Закрывает свободные соединения."""
+        with self.condition:
+            idle, self.idle = self.idle, []
+            self._report()
+        for raw, _, _ in idle:
+            _close_quietly(raw)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, options):
+    """Пул alias текущего процесса. После fork воркера создаётся новый
+    пул: соединения родителя потомку не достаются.
+    """
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None or pool.pid != os.getpid():
+            options = {**DEFAULTS, **(options or {})}
+            pool = _pools[alias] = ConnectionPool(
+                alias,
+                max_size=int(options['MAX_SIZE']),
+                timeout=float(options['TIMEOUT']),
+                check_interval=float(options['CHECK_INTERVAL']),
+                max_idle=float(options['MAX_IDLE']),
+            )
+        return pool
+
+
+class PooledDatabaseWrapperMixin:
+    """Подмешивается к DatabaseWrapper бэкенда Django: соединения
+    берутся из пула и возвращаются в него вместо закрытия.
+    CONN_MAX_AGE не действует - соединение возвращается в пул в конце
+    каждого запроса, а живёт в пуле до MAX_IDLE.
+    """
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict.get('POOL'))
+
+    def get_new_connection(self, conn_params):
+        try:
+            return self.pool.acquire(
+                lambda: super(
+                    PooledDatabaseWrapperMixin, self
+                ).get_new_connection(conn_params)
+            )
+        except PoolTimeoutError as error:
+            raise self.Database.OperationalError(str(error)) from error
+
+    def _close(self):
+        if self.connection is None:
+            return
+        raw = self.connection
+        if self.in_atomic_block:
+            # Django оставит соединение у себя до выхода из atomic,
+            # поэтому в пул оно не вернётся.
+            self.pool.discard(raw, 'transaction')
+            return
+        try:
+            # Незавершённая транзакция не должна достаться другому потоку.
+            raw.rollback()
+        except Exception:
+            self.pool.discard(raw)
+            return
+        self.pool.release(raw, checked=not self.errors_occurred)
+
+    def close_if_unusable_or_obsolete(self):
+        # Вызывается в начале и в конце запроса: соединение между
+        # запросами лежит в пуле, а не у потока.
+        if self.connection is not None and not self.in_atomic_block:
+            self.close()
@@ -0,0 +1,9 @@
+from django.db.backends.sqlite3 import base
+
+from ..pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """SQLite с пулом соединений (см. core.db.pool): для разработки и
+    тестов пула без PostgreSQL.
+    """
@@ -0,0 +1,249 @@
+"""Потоковая загрузка больших наборов строк в таблицы моделей.
+
+Строки читаются и пишутся порциями, минуя ORM и сигналы: в PostgreSQL
+через COPY, в остальных базах - пакетным executemany. В режиме
+update и skip повторная загрузка тех же данных не создаёт дублей:
+конфликт по первичному ключу обновляет строку или пропускает её.
+"""
+import csv
+import io
+from functools import lru_cache
+from itertools import islice
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connection
+from django.db.models import DateField
+from django.utils import timezone
+
+ERROR = 'error'
+SKIP = 'skip'
+UPDATE = 'update'
+CONFLICT_MODES = (ERROR, SKIP, UPDATE)
+
+
+class LoadError(Exception):
+    pass
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _default(field):
+    if isinstance(field, DateField) and (field.auto_now
+                                         or field.auto_now_add):
+        return timezone.now()
+    return field.get_default()
+
+
+TEXT_TYPES = {'CharField', 'SlugField', 'EmailField', 'TextField'}
+INTEGER_TYPES = {
+    'AutoField', 'BigAutoField', 'IntegerField', 'BigIntegerField',
+    'SmallIntegerField', 'PositiveIntegerField', 'PositiveSmallIntegerField',
+}
+
+
+def _converter(field):
+    """Функция, приводящая значение из файла к значению для базы.
+    Строки и числа - самые массовые значения - приводятся напрямую,
+    остальные проходят через поле модели (повторы - из кэша).
+    """
+    internal_type = (field.target_field if field.is_relation
+                     else field).get_internal_type()
+    if internal_type in TEXT_TYPES:
+        convert = str
+    elif internal_type in INTEGER_TYPES:
+        convert = int
+    else:
+        @lru_cache(maxsize=4096)
+        def prepare(value):
+            return field.get_db_prep_save(field.to_python(value), connection)
+
+        def convert(value):
+            # Текст из файла COPY разбирает сам, быстрее чем Python.
+            if isinstance(value, str) and connection.vendor == 'postgresql':
+                return value
+            return prepare(value)
+    if not field.null:
+        return convert
+
+    def convert_nullable(value):
+        if value is None or value == '':
+            return None
+        return convert(value)
+    return convert_nullable
+
+
+class TableLoader:
+    """Загружает строки в таблицу модели. header - имена полей или их
+    столбцов (author или author_id) в порядке значений строки. Значения
+    приводятся к типу поля, пустая строка в поле с null=True - NULL.
+    Поля, которых нет в заголовке, получают значения по умолчанию,
+    вычисленные один раз на загрузку. При конфликте (режим update)
+    обновляются только поля из заголовка и поля с auto_now: остальные
+    (пароль, код подтверждения, версия токенов и т.п.) сохраняют
+    прежние значения.
+    """
+
+    def __init__(self, model, header, conflict=UPDATE):
+        self.model = model
+        self.conflict = conflict
+        self.fields = []
+        opts = model._meta
+        for name in header:
+            try:
+                field = opts.get_field(name)
+            except FieldDoesNotExist:
+                raise LoadError(
+                    f'{opts.label}: неизвестное поле {name!r}'
+                ) from None
+            if not field.concrete or field.many_to_many:
+                raise LoadError(
+                    f'{opts.label}: поле {name!r} нельзя загрузить'
+                )
+            self.fields.append(field)
+        self.converters = [_converter(field) for field in self.fields]
+        if opts.pk not in self.fields:
+            raise LoadError(f'{opts.label}: в данных нет первичного ключа')
+        defaults = [
+            field for field in opts.concrete_fields
+            if field not in self.fields
+        ]
+        self.defaults = [
+            field.get_db_prep_save(_default(field), connection)
+            for field in defaults
+        ]
+        self.columns = [field.column for field in self.fields + defaults]
+        self.update_columns = [
+            field.column
+            for field in self.fields + defaults
+            if not field.primary_key and (
+                field in self.fields or getattr(field, 'auto_now', False)
+            )
+        ]
+
+    def prepare(self, row):
+        values = [
+            convert(value) for convert, value in zip(self.converters, row)
+        ]
+        values.extend(self.defaults)
+        return values
+
+    def _conflict_sql(self):
+        if self.conflict == ERROR:
+            return ''
+        pk = self.model._meta.pk.column
+        quote = connection.ops.quote_name
+        if self.conflict == SKIP or not self.update_columns:
+            return f' ON CONFLICT ({quote(pk)}) DO NOTHING'
+        assignments = ', '.join(
+            f'{quote(column)} = excluded.{quote(column)}'
+            for column in self.update_columns
+        )
+        return f' ON CONFLICT ({quote(pk)}) DO UPDATE SET {assignments}'
+
+    def load(self, rows, chunk_size, progress=None):
+        """Загружает строки (последовательности значений в порядке
+        заголовка) и возвращает их количество.
+        """
+        if (self.conflict != ERROR
+                and connection.vendor not in ('postgresql', 'sqlite')):
+            raise LoadError(
+                f'Режим {self.conflict} поддерживается только '
+                'в PostgreSQL и SQLite'
+            )
+        write = (self._copy if connection.vendor == 'postgresql'
+                 else self._executemany)
+        total = 0
+        with connection.cursor() as cursor:
+            staging = self._create_staging(cursor)
+            for chunk in _chunks(rows, chunk_size):
+                try:
+                    prepared = [self.prepare(row) for row in chunk]
+                except (TypeError, ValueError, ValidationError) as error:
+                    raise LoadError(
+                        f'{self.model._meta.label}: некорректное значение '
+                        f'в строках {total + 1}-{total + len(chunk)}: {error}'
+                    ) from None
+                write(cursor, staging, prepared)
+                total += len(chunk)
+                if progress:
+                    progress(total)
+            if staging:
+                self._merge_staging(cursor, staging)
+        return total
+
+    def _create_staging(self, cursor):
+        # В PostgreSQL COPY не умеет ON CONFLICT: строки копируются во
+        # временную таблицу и переносятся одним INSERT ... SELECT.
+        if connection.vendor != 'postgresql' or self.conflict == ERROR:
+            return None
+        quote = connection.ops.quote_name
+        staging = f'import_{self.model._meta.db_table}'
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE {quote(staging)} '
+            f'(LIKE {quote(self.model._meta.db_table)} INCLUDING DEFAULTS) '
+            'ON COMMIT DROP'
+        )
+        return staging
+
+    def _merge_staging(self, cursor, staging):
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(column) for column in self.columns)
+        cursor.execute(
+            f'INSERT INTO {quote(self.model._meta.db_table)} ({columns}) '
+            f'SELECT {columns} FROM {quote(staging)}'
+            + self._conflict_sql()
+        )
+        cursor.execute(f'DROP TABLE {quote(staging)}')
+
+    def _copy(self, cursor, staging, rows):
+        buffer = io.StringIO()
+        # Строки в кавычках, NULL - пустое значение без кавычек.
+        writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+        writer.writerows(rows)
+        buffer.seek(0)
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(column) for column in self.columns)
+        table = staging or self.model._meta.db_table
+        cursor.copy_expert(
+            f'COPY {quote(table)} ({columns}) FROM STDIN WITH (FORMAT csv)',
+            buffer,
+        )
+
+    def _executemany(self, cursor, staging, rows):
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(column) for column in self.columns)
+        placeholders = ', '.join(['%s'] * len(self.columns))
+        cursor.executemany(
+            f'INSERT INTO {quote(self.model._meta.db_table)} ({columns}) '
+            f'VALUES ({placeholders})' + self._conflict_sql(),
+            rows,
+        )
+
+
+def dependency_order(models):
+    """Модели в порядке внешних ключей: сначала те, на которые ссылаются."""
+    models = list(dict.fromkeys(models))
+    ordered = []
+    visiting = set()
+
+    def visit(model):
+        if model in ordered or model in visiting:
+            return
+        visiting.add(model)
+        for field in model._meta.concrete_fields:
+            target = field.related_model
+            if field.is_relation and target in models and target != model:
+                visit(target)
+        visiting.discard(model)
+        ordered.append(model)
+
+    for model in models:
+        visit(model)
+    return ordered
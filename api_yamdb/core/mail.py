@@ -0,0 +1,219 @@
+"""Очередь исходящих писем (transactional outbox).
+
+enqueue() записывает письмо в таблицу OutgoingMail в текущей
+транзакции, а после её фиксации будит фоновый поток процесса. Поток
+забирает готовые к отправке письма порциями, отправляет каждую порцию
+через одно соединение с почтовым сервером и повторяет неудачные
+отправки с растущей задержкой. Письма, оставшиеся в очереди (например,
+после перезапуска воркера), забирает при очередном опросе поток любого
+процесса или команда mail_outbox.
+
+Порция помечается "взятой": next_attempt сдвигается на
+MAIL_OUTBOX_LEASE секунд, так что параллельные обработчики её не
+трогают, а письма упавшего обработчика вернутся в очередь.
+"""
+import logging
+import os
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from . import metrics
+from .models import OutgoingMail
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограммы задержки доставки, секунд: письма ждут
+# и повторов с задержкой до MAIL_OUTBOX_MAX_RETRY_DELAY.
+DELIVERY_BUCKETS = (1, 5, 15, 30, 60, 300, 900, 3600, 4 * 3600, 24 * 3600)
+
+
+def enqueue(subject, body, from_email, recipients):
+    """Ставит письмо в очередь. Отправка начнётся после фиксации
+    текущей транзакции.
+    """
+    mail = OutgoingMail.objects.create(
+        subject=subject, body=body, from_email=from_email,
+        recipients='\n'.join(recipients),
+    )
+    metrics.inc('mail_enqueued')
+    if settings.MAIL_OUTBOX_WORKER:
+        transaction.on_commit(wake)
+    return mail
+
+
+def retry_delay(attempts):
+    """Задержка перед следующей попыткой: удваивается с каждой
+    неудачей, но не больше MAIL_OUTBOX_MAX_RETRY_DELAY секунд.
+    """
+    return min(
+        settings.MAIL_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1),
+        settings.MAIL_OUTBOX_MAX_RETRY_DELAY,
+    )
+
+
+def claim(batch_size):
+    """Забирает до batch_size писем, которым пора уйти."""
+    now = timezone.now()
+    with transaction.atomic():
+        queue = OutgoingMail.objects.filter(
+            status=OutgoingMail.PENDING, next_attempt__lte=now
+        ).order_by('next_attempt', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            queue = queue.select_for_update(skip_locked=True)
+        batch = list(queue[:batch_size])
+        OutgoingMail.objects.filter(
+            pk__in=[mail.pk for mail in batch]
+        ).update(next_attempt=now + timedelta(
+            seconds=settings.MAIL_OUTBOX_LEASE
+        ))
+    return batch
+
+
+def _message(mail, mail_connection):
+    return EmailMessage(
+        mail.subject, mail.body, mail.from_email,
+        mail.recipients.splitlines(), connection=mail_connection,
+    )
+
+
+def _failed(mail, error):
+    mail.attempts += 1
+    mail.last_error = repr(error)
+    if mail.attempts >= settings.MAIL_OUTBOX_MAX_ATTEMPTS:
+        mail.status = OutgoingMail.FAILED
+        metrics.inc('mail_failed')
+        logger.error('Письмо %s не доставлено: %r', mail.pk, error)
+    else:
+        mail.next_attempt = timezone.now() + timedelta(
+            seconds=retry_delay(mail.attempts)
+        )
+        metrics.inc('mail_retried')
+    mail.save(
+        update_fields=['attempts', 'last_error', 'status', 'next_attempt']
+    )
+
+
+def send_batch(batch):
+    """Отправляет письма порции через одно соединение. Возвращает
+    количество отправленных.
+    """
+    mail_connection = get_connection(fail_silently=False)
+    try:
+        mail_connection.open()
+    except Exception as error:
+        for mail in batch:
+            _failed(mail, error)
+        return 0
+    sent = []
+    try:
+        for mail in batch:
+            try:
+                _message(mail, mail_connection).send()
+            except Exception as error:
+                _failed(mail, error)
+            else:
+                sent.append(mail)
+    finally:
+        mail_connection.close()
+    now = timezone.now()
+    OutgoingMail.objects.filter(pk__in=[mail.pk for mail in sent]).update(
+        status=OutgoingMail.SENT, sent=now, attempts=F('attempts') + 1,
+        last_error='',
+    )
+    for mail in sent:
+        metrics.inc('mail_sent')
+        metrics.observe(
+            'mail_delivery_seconds', (now - mail.created).total_seconds(),
+            buckets=DELIVERY_BUCKETS,
+        )
+    return len(sent)
+
+
+def drain(batch_size=None):
+    """Отправляет все готовые письма порциями. Возвращает количество
+    отправленных.
+    """
+    batch_size = batch_size or settings.MAIL_OUTBOX_BATCH_SIZE
+    total = 0
+    while True:
+        batch = claim(batch_size)
+        if not batch:
+            return total
+        total += send_batch(batch)
+
+
+def stats():
+    """Глубина очереди и средняя задержка доставки."""
+    now = timezone.now()
+    pending = OutgoingMail.objects.filter(status=OutgoingMail.PENDING)
+    counts = dict(
+        OutgoingMail.objects.order_by().values_list('status')
+        .annotate(Count('pk'))
+    )
+    oldest = pending.aggregate(oldest=Min('created'))['oldest']
+    delivery = [
+        (total, count) for (name, labels), (buckets, counts, total, count)
+        in metrics.collect_all()['histograms'].items()
+        if name == 'mail_delivery_seconds'
+    ]
+    delivered = sum(count for _, count in delivery)
+    return {
+        'pending': counts.get(OutgoingMail.PENDING, 0),
+        'ready': pending.filter(next_attempt__lte=now).count(),
+        'retrying': pending.filter(attempts__gt=0).count(),
+        'sent': counts.get(OutgoingMail.SENT, 0),
+        'failed': counts.get(OutgoingMail.FAILED, 0),
+        'oldest_pending_seconds': (
+            (now - oldest).total_seconds() if oldest else 0.0
+        ),
+        'average_delivery_seconds': (
+            sum(total for total, _ in delivery) / delivered
+            if delivered else 0.0
+        ),
+    }
+
+
+class MailWorker(threading.Thread):
+    """Фоновый поток процесса, который отправляет письма из очереди.
+    Просыпается по wake() и раз в MAIL_OUTBOX_POLL_INTERVAL секунд.
+    """
+
+    def __init__(self):
+        super().__init__(name='mail-outbox', daemon=True)
+        self.pid = os.getpid()
+        self.event = threading.Event()
+
+    def run(self):
+        while True:
+            self.event.wait(settings.MAIL_OUTBOX_POLL_INTERVAL)
+            self.event.clear()
+            try:
+                drain()
+            except Exception:
+                logger.exception('Ошибка обработки очереди писем')
+            finally:
+                # У потока своё соединение с базой: между опросами
+                # оно не держится открытым.
+                connection.close()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def wake():
+    """Будит поток отправки текущего процесса, запуская его при первом
+    вызове (и заново после fork воркера gunicorn).
+    """
+    global _worker
+    with _worker_lock:
+        if _worker is None or _worker.pid != os.getpid():
+            _worker = MailWorker()
+            _worker.start()
+    _worker.event.set()
@@ -0,0 +1,165 @@
+import json
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from core.query_audit import (
+    capture_queries, explain, is_select, suggest_index
+)
+from reviews.models import Category, Comment, Genre, Review, Title
+from users.models import User
+
+AUDIT_CACHE_ALIAS = 'query_audit'
+
+
+def scenarios():
+    """Типичные запросы к вьюсетам api и users: (имя, URL).
+    Запросы к конкретным объектам берут первые объекты из базы и
+    пропускаются, если объектов нет.
+    """
+    yield 'categories-list', '/api/v1/categories/'
+    yield 'categories-search', '/api/v1/categories/?search=фильм'
+    yield 'genres-list', '/api/v1/genres/'
+    yield 'titles-list', '/api/v1/titles/'
+    yield 'titles-page-2', '/api/v1/titles/?page=2'
+    yield 'titles-cursor', '/api/v1/titles/?cursor='
+    yield 'titles-search', '/api/v1/titles/?search=побег'
+    yield 'titles-name', '/api/v1/titles/?name=от'
+    yield 'titles-year', '/api/v1/titles/?year=2000'
+    category = Category.objects.order_by('pk').first()
+    if category is not None:
+        yield (
+            'titles-category', f'/api/v1/titles/?category={category.slug}'
+        )
+    genre = Genre.objects.order_by('pk').first()
+    if genre is not None:
+        yield 'titles-genre', f'/api/v1/titles/?genre={genre.slug}'
+    title = Title.objects.order_by('-score_count', 'pk').first()
+    if title is not None:
+        yield 'titles-detail', f'/api/v1/titles/{title.pk}/'
+        yield 'titles-histogram', f'/api/v1/titles/{title.pk}/histogram/'
+        reviews = f'/api/v1/titles/{title.pk}/reviews/'
+        yield 'reviews-list', reviews
+        yield 'reviews-page-2', f'{reviews}?page=2'
+        yield 'reviews-cursor', f'{reviews}?cursor='
+    review = Review.objects.order_by('-comments_count', 'pk').first()
+    if review is not None:
+        yield (
+            'reviews-detail',
+            f'/api/v1/titles/{review.title_id}/reviews/{review.pk}/'
+        )
+        comments = (
+            f'/api/v1/titles/{review.title_id}/reviews/{review.pk}/comments/'
+        )
+        yield 'comments-list', comments
+        yield 'comments-cursor', f'{comments}?cursor='
+        comment = Comment.objects.filter(review=review).first()
+        if comment is not None:
+            yield 'comments-detail', f'{comments}{comment.pk}/'
+    yield 'users-list', '/api/v1/users/'
+    yield 'users-search', '/api/v1/users/?search=admin'
+    user = User.objects.order_by('pk').first()
+    if user is not None:
+        yield 'users-detail', f'/api/v1/users/{user.username}/'
+        yield 'users-activity', f'/api/v1/users/{user.username}/activity/'
+    yield 'users-me', '/api/v1/users/me/'
+    yield 'users-me-activity', '/api/v1/users/me/activity/'
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет типичные запросы к API на текущей базе, строит планы '
+        'всех SQL-запросов и выводит в JSON полные сканирования, '
+        'сортировки без индекса, дорогие запросы и недостающие индексы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cost-threshold', type=float, default=1000.0,
+            help='Стоимость плана (PostgreSQL), выше которой запрос '
+                 'отмечается как дорогой.'
+        )
+        parser.add_argument(
+            '--no-analyze', action='store_true',
+            help='Не выполнять запросы при построении плана (без ANALYZE).'
+        )
+        parser.add_argument(
+            '--output', help='Файл для отчёта, по умолчанию stdout.'
+        )
+
+    def handle(self, *args, **options):
+        caches = dict(settings.CACHES)
+        caches[AUDIT_CACHE_ALIAS] = {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache'
+        }
+        # Ответы не берутся из кэша и не попадают в него, а аудитор -
+        # временный администратор - исчезает с откатом транзакции.
+        with override_settings(
+            CACHES=caches, RESPONSE_CACHE_ALIAS=AUDIT_CACHE_ALIAS
+        ), transaction.atomic():
+            report = self.audit(options)
+            transaction.set_rollback(True)
+        output = json.dumps(
+            report, ensure_ascii=False, indent=2, sort_keys=True,
+            default=str
+        )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    def audit(self, options):
+        name = f'query-audit-{uuid.uuid4().hex[:8]}'
+        auditor = User.objects.create(
+            username=name, email=f'{name}@yamdb.fake',
+            role='admin', is_superuser=True
+        )
+        client = APIClient()
+        client.force_authenticate(auditor)
+        analyze = (not options['no_analyze']
+                   and connection.vendor == 'postgresql')
+        endpoints, suggestions = [], {}
+        for name, url in scenarios():
+            with capture_queries() as queries:
+                response = client.get(url)
+            statements = []
+            for sql, params in queries:
+                if not is_select(sql):
+                    continue
+                result = explain(
+                    sql, params, analyze, options['cost_threshold']
+                )
+                statements.append(dict(result, sql=sql))
+                suggestion = suggest_index(sql) if result['flags'] else None
+                if suggestion is not None:
+                    model, fields = suggestion
+                    entry = suggestions.setdefault(
+                        (model, tuple(fields)),
+                        {'model': model, 'fields': fields, 'endpoints': []}
+                    )
+                    if name not in entry['endpoints']:
+                        entry['endpoints'].append(name)
+            endpoints.append({
+                'name': name,
+                'url': url,
+                'status': response.status_code,
+                'queries': statements,
+                'flags': sorted({
+                    flag['flag'] for statement in statements
+                    for flag in statement['flags']
+                }),
+            })
+        return {
+            'database': connection.vendor,
+            'analyze': analyze,
+            'cost_threshold': options['cost_threshold'],
+            'endpoints': endpoints,
+            'suggested_indexes': [
+                suggestions[key] for key in sorted(suggestions)
+            ],
+        }
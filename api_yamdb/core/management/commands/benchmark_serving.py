@@ -0,0 +1,172 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from reviews.models import Review, Title
+
+# В gunicorn 20.0 нет python -m gunicorn.
+GUNICORN = 'from gunicorn.app.wsgiapp import run; run()'
+SERVERS = {
+    'wsgi': ['core.benchmark:wsgi_application'],
+    'asgi': [
+        'core.benchmark:asgi_application',
+        '--worker-class', 'uvicorn.workers.UvicornH11Worker',
+    ],
+}
+
+
+def read_paths():
+    """Конечные точки только для чтения с объектами из базы."""
+    paths = [
+        '/api/v1/titles/', '/api/v1/categories/', '/api/v1/genres/',
+    ]
+    title = Title.objects.order_by('pk').first()
+    if title is not None:
+        paths.append(f'/api/v1/titles/{title.pk}/')
+        paths.append(f'/api/v1/titles/{title.pk}/reviews/')
+    review = Review.objects.order_by('pk').first()
+    if review is not None:
+        paths.append(
+            f'/api/v1/titles/{review.title_id}/reviews/{review.pk}/comments/'
+        )
+    return paths
+
+
+async def fetch(host, port, path):
+    """GET-запрос по HTTP/1.1. Возвращает код ответа."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write((
+            f'GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\n'
+            'Connection: close\r\n\r\n'
+        ).encode('latin-1'))
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    return int(response.split(b' ', 2)[1])
+
+
+async def run_load(host, port, paths, concurrency, total):
+    """total запросов по кругу paths в concurrency соединений.
+    Возвращает длительности успешных запросов, число ошибок и общее
+    время.
+    """
+    queue = asyncio.Queue()
+    for number in range(total):
+        queue.put_nowait(paths[number % len(paths)])
+    latencies, errors = [], 0
+
+    async def client():
+        nonlocal errors
+        while not queue.empty():
+            path = queue.get_nowait()
+            started = time.monotonic()
+            try:
+                status = await fetch(host, port, path)
+            except (OSError, IndexError, ValueError):
+                status = None
+            if status == 200:
+                latencies.append(time.monotonic() - started)
+            else:
+                errors += 1
+
+    started = time.monotonic()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, errors, time.monotonic() - started
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def wait_for_port(host, port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError('Сервер завершился при запуске')
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f'Сервер не ответил на порту {port}')
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность и задержки (p50, p99) '
+        'конечных точек для чтения в WSGI (gunicorn, синхронные воркеры) '
+        'и ASGI (gunicorn с воркерами uvicorn) на текущей базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--modes', nargs='+', choices=SERVERS, default=list(SERVERS),
+        )
+        parser.add_argument(
+            '--workers', type=int, default=2,
+            help='Воркеров gunicorn в каждом режиме.'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=64,
+            help='Одновременных соединений клиента.'
+        )
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument(
+            '--db-delay', type=float, default=0.0,
+            help='Задержка каждого запроса к базе, секунд (медленная база).'
+        )
+        parser.add_argument(
+            '--no-cache', action='store_true',
+            help='Не кэшировать ответы: каждый запрос идёт в базу.'
+        )
+        parser.add_argument('--port', type=int, default=8701)
+
+    def handle(self, *args, **options):
+        paths = read_paths()
+        host, port = '127.0.0.1', options['port']
+        env = dict(os.environ, BENCHMARK_DB_DELAY=str(options['db_delay']))
+        if options['no_cache']:
+            env['RESPONSE_CACHE_TIMEOUT'] = '0'
+        self.stdout.write(
+            f'{options["requests"]} запросов, {options["concurrency"]} '
+            f'соединений, воркеров: {options["workers"]}, задержка базы '
+            f'{options["db_delay"] * 1000:.0f} мс'
+        )
+        for mode in options['modes']:
+            process = subprocess.Popen(
+                [
+                    sys.executable, '-c', GUNICORN, *SERVERS[mode],
+                    '--bind', f'{host}:{port}',
+                    '--workers', str(options['workers']),
+                    '--log-level', 'warning',
+                ],
+                cwd=settings.BASE_DIR, env=env,
+            )
+            try:
+                wait_for_port(host, port, process)
+                # Прогрев: соединения с базой, импорты, кэши.
+                asyncio.run(run_load(host, port, paths, 4, len(paths) * 2))
+                latencies, errors, elapsed = asyncio.run(run_load(
+                    host, port, paths, options['concurrency'],
+                    options['requests'],
+                ))
+            finally:
+                process.terminate()
+                process.wait()
+            self.stdout.write(
+                f'{mode}: {len(latencies) / elapsed:.1f} запросов/с, '
+                f'p50 {percentile(latencies, 0.5) * 1000:.1f} мс, '
+                f'p99 {percentile(latencies, 0.99) * 1000:.1f} мс, '
+                f'ошибок {errors}'
+            )
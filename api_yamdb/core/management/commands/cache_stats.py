@@ -0,0 +1,28 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from core import metrics
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания и промахи кэша ответов по всем воркерам.'
+
+    def handle(self, *args, **kwargs):
+        totals = defaultdict(lambda: {'hit': 0, 'miss': 0})
+        for (name, labels), value in metrics.collect().items():
+            if name != 'response_cache_requests':
+                continue
+            labels = dict(labels)
+            endpoint = f'{labels["view"]}.{labels["action"]}'
+            totals[endpoint][labels['result']] += int(value)
+        if not totals:
+            self.stdout.write('Обращений к кэшу ответов пока не было')
+            return
+        for endpoint, counts in sorted(totals.items()):
+            requests = counts['hit'] + counts['miss']
+            self.stdout.write(
+                f'{endpoint}: попаданий {counts["hit"]}, '
+                f'промахов {counts["miss"]}, '
+                f'доля попаданий {counts["hit"] / requests:.1%}'
+            )
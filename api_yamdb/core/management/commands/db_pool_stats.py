@@ -0,0 +1,37 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from core import metrics
+
+COUNTERS = {
+    'db_pool_creates': 'открыто',
+    'db_pool_reuses': 'выдано повторно',
+    'db_pool_waits': 'ожиданий',
+    'db_pool_timeouts': 'не дождались',
+    'db_pool_discarded': 'закрыто',
+}
+
+
+class Command(BaseCommand):
+    help = 'Показывает состояние пулов соединений с базой по всем воркерам.'
+
+    def handle(self, *args, **kwargs):
+        totals = defaultdict(lambda: defaultdict(int))
+        for (name, labels), value in metrics.collect().items():
+            labels = dict(labels)
+            if name == 'db_pool_connections':
+                totals[labels['alias']][labels['state']] += int(value)
+            elif name in COUNTERS:
+                totals[labels['alias']][name] += int(value)
+        if not totals:
+            self.stdout.write('Пулы соединений с базой не использовались')
+            return
+        for alias, values in sorted(totals.items()):
+            counters = ', '.join(
+                f'{title} {values[name]}' for name, title in COUNTERS.items()
+            )
+            self.stdout.write(
+                f'{alias}: занято {values["in_use"]}, '
+                f'свободно {values["idle"]}, {counters}'
+            )
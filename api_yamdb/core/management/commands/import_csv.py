@@ -1,38 +1,152 @@
-from django.core.management.base import BaseCommand
-
-import logging
-import sqlite3
+import csv
+import json
 import os
-import pandas as pd
-
-from api_yamdb.settings import DICT_TABLE, CSV_DIR
+import time
+from glob import glob
 
-FORMATTER = '%(asctime)s — %(levelname)s — %(message)s'
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DatabaseError, connection, transaction
 
-logging.basicConfig(
-    level=logging.INFO,
-    format=FORMATTER
+from core import versions
+from core.loader import (
+    CONFLICT_MODES, UPDATE, LoadError, TableLoader, dependency_order
 )
+from reviews.models import Comment, Review, Title
+
+CSV_DIR = os.path.join(settings.BASE_DIR, 'static', 'data')
+CSV_MODELS = {
+    'users': 'users.User',
+    'category': 'reviews.Category',
+    'genre': 'reviews.Genre',
+    'titles': 'reviews.Title',
+    'genre_title': 'reviews.GenreTitle',
+    'review': 'reviews.Review',
+    'comments': 'reviews.Comment',
+}
+
+
+def csv_source(path):
+    """Модель, заголовок и поток строк CSV-файла."""
+    name = os.path.splitext(os.path.basename(path))[0]
+    if name not in CSV_MODELS:
+        raise CommandError(f'Неизвестный файл {path}')
+    model = apps.get_model(CSV_MODELS[name])
+
+    def rows():
+        with open(path, encoding='utf-8', newline='') as file:
+            reader = csv.reader(file)
+            next(reader)
+            yield from reader
+
+    with open(path, encoding='utf-8', newline='') as file:
+        header = next(csv.reader(file))
+    return model, header, rows()
+
+
+def fixture_sources(path):
+    """Модели, заголовки и строки фикстуры в формате dumpdata."""
+    with open(path, encoding='utf-8') as file:
+        objects = json.load(file)
+    grouped = {}
+    for obj in objects:
+        model = apps.get_model(obj['model'])
+        fields = {
+            name: value for name, value in obj['fields'].items()
+            if value != [] or not model._meta.get_field(name).many_to_many
+        }
+        header, rows = grouped.setdefault(
+            model, ([model._meta.pk.name, *fields], [])
+        )
+        try:
+            rows.append([obj['pk'], *(fields[name] for name in header[1:])])
+        except KeyError as error:
+            raise CommandError(
+                f'{path}: у объекта {obj["model"]} {obj["pk"]} '
+                f'нет поля {error}'
+            )
+    return [
+        (model, header, iter(rows))
+        for model, (header, rows) in grouped.items()
+    ]
 
 
 class Command(BaseCommand):
+    help = (
+        'Загружает данные из CSV-файлов (по умолчанию static/data/*.csv) '
+        'и фикстур dumpdata (*.json) в порядке внешних ключей.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*',
+            help='CSV-файлы с именами таблиц из static/data или фикстуры.'
+        )
+        parser.add_argument(
+            '--conflict', choices=CONFLICT_MODES, default=UPDATE,
+            help='Что делать со строками, чей первичный ключ уже есть: '
+                 'update - обновить поля из файла (по умолчанию), '
+                 'skip - пропустить, '
+                 'error - прервать загрузку.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Сколько строк отправлять в базу за раз.'
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        paths = options['paths'] or sorted(
+            glob(os.path.join(CSV_DIR, '*.csv'))
+        )
+        sources = []
+        for path in paths:
+            if path.endswith('.json'):
+                sources.extend(fixture_sources(path))
+            else:
+                sources.append(csv_source(path))
+        order = dependency_order(model for model, _, _ in sources)
+        sources.sort(key=lambda source: order.index(source[0]))
+        try:
+            with transaction.atomic():
+                for model, header, rows in sources:
+                    self.load(model, header, rows, options)
+                self.finish(order)
+        except (LoadError, DatabaseError) as error:
+            raise CommandError(error)
+        # Загрузка минует сигналы: все штампы версий сбрасываются разом.
+        versions.reset()
+
+    def report(self, message, verbosity=1):
+        if self.verbosity >= verbosity:
+            self.stdout.write(message)
+
+    def load(self, model, header, rows, options):
+        table = model._meta.db_table
+        loader = TableLoader(model, header, options['conflict'])
+        started = time.monotonic()
+
+        def progress(total):
+            self.report(f'{table}: {total} строк', verbosity=2)
+
+        total = loader.load(rows, options['chunk_size'], progress)
+        elapsed = time.monotonic() - started
+        rate = total / elapsed if elapsed else 0
+        self.report(
+            f'{table}: {total} строк за {elapsed:.2f} с ({rate:.0f} строк/с)'
+        )
 
-    def handle(self, *args, **kwargs):
-        con = sqlite3.connect('db.sqlite3')
-        for file_csv, table in DICT_TABLE.items():
-            df = pd.read_csv(os.path.join(CSV_DIR, file_csv), delimiter=',')
-            try:
-                df.to_sql(table, con=con, if_exists='append', index=False)
-                logging.info(f'Загружен файл {file_csv} в таблицу {table}')
-            except sqlite3.IntegrityError as e:
-                if 'not null' in e.args[0].lower():
-                    logging.error(f'Данные содержат значения NULL {file_csv}')
-                elif 'unique constraint' in e.args[0].lower():
-                    logging.error('Вы пытаетесь загрузить данные с '
-                                  f'одинаковыми ID в таблицу {table}. '
-                                  'Убедитесь, что не произвели загрузку '
-                                  'данных из файлов csc ранее.')
-                else:
-                    raise
-        con.commit()
-        con.close()
+    def finish(self, models):
+        # Строки загружены с явными id: счётчики первичных ключей
+        # сдвигаются за максимальный id.
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+        if Title in models or Review in models:
+            updated = Title.objects.rebuild_scores()
+            self.report(f'Пересчитаны рейтинги {updated} произведений')
+        if Review in models or Comment in models:
+            updated = Review.objects.rebuild_comment_counts()
+            self.report(f'Пересчитаны комментарии {updated} отзывов')
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import mail
+
+
+class Command(BaseCommand):
+    help = (
+        'Отправляет письма из очереди исходящей почты. Без --once '
+        'работает постоянно, как отдельный обработчик очереди.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Отправить готовые письма и завершиться.'
+        )
+        parser.add_argument(
+            '--stats', action='store_true',
+            help='Показать глубину очереди и задержку доставки.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Сколько писем отправлять через одно соединение.'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5.0,
+            help='Пауза между опросами очереди, секунд.'
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            for name, value in mail.stats().items():
+                self.stdout.write(f'{name}: {value}')
+            return
+        while True:
+            sent = mail.drain(options['batch_size'])
+            if sent or options['verbosity'] >= 2:
+                self.stdout.write(f'Отправлено писем: {sent}')
+            if options['once']:
+                return
+            time.sleep(options['interval'])
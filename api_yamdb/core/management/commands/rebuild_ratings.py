@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core import versions
+from reviews.models import Title
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает суммы оценок, их количество и рейтинги произведений.'
+
+    def handle(self, *args, **kwargs):
+        updated = Title.objects.rebuild_scores()
+        versions.bump('titles', *(
+            f'title:{pk}' for pk in Title.objects.values_list('pk', flat=True)
+        ))
+        self.stdout.write(f'Пересчитаны рейтинги {updated} произведений')
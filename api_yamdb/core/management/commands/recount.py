@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core import versions
+from reviews.models import Review, Title
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики комментариев к отзывам, количество '
+        'отзывов и рейтинги произведений.'
+    )
+
+    def handle(self, *args, **kwargs):
+        reviews = Review.objects.rebuild_comment_counts()
+        titles = Title.objects.rebuild_scores()
+        # Счётчики входят в ответы по отзывам всех произведений.
+        versions.reset()
+        self.stdout.write(
+            f'Пересчитаны счётчики {reviews} отзывов и {titles} произведений'
+        )
@@ -0,0 +1,359 @@
+"""Метрики приложения, общие для всех процессов.
+
+Каждый процесс (воркер gunicorn, команда manage.py) копит значения в
+памяти и не чаще раза в METRICS_FLUSH_INTERVAL секунд записывает их в
+собственный файл METRICS_DIR/<pid>.json. collect() и collect_all()
+складывают файлы всех процессов, поэтому метрики можно прочитать из
+любого процесса.
+
+Счётчики и гистограммы только растут: значения завершившихся процессов
+(например, перезапущенных воркеров) при запуске следующего процесса
+переносятся в METRICS_DIR/archive.json и продолжают учитываться.
+Показатели (gauge) - текущие значения вроде числа занятых соединений -
+складываются только по работающим процессам.
+"""
+import atexit
+import bisect
+import fcntl
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+ARCHIVE = 'archive.json'
+# Границы корзин гистограмм длительностей, секунд.
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+_lock = threading.Lock()
+# Файл процесса пишут и запросы, и отложенная запись из таймера.
+_flush_lock = threading.Lock()
+_counters = defaultdict(float)
+_gauges = {}
+# {(имя, метки): [границы, количества по корзинам и сверх, сумма, число]}
+_histograms = {}
+_collectors = []
+_last_flush = 0.0
+_pending_flush = None
+_archived_pid = None
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _metrics_dir():
+    return getattr(settings, 'METRICS_DIR', None)
+
+
+def _own_file(directory):
+    return os.path.join(directory, f'{os.getpid()}.json')
+
+
+def inc(name, value=1, **labels):
+    """Увеличивает счётчик name с метками labels."""
+    with _lock:
+        _counters[(name, _labels_key(labels))] += value
+    _maybe_flush()
+
+
+def set_gauge(name, value, **labels):
+    """Устанавливает показатель name с метками labels."""
+    with _lock:
+        _gauges[(name, _labels_key(labels))] = value
+    _maybe_flush()
+
+
+def observe(name, value, buckets=DEFAULT_BUCKETS, **labels):
+    """Добавляет значение value в гистограмму name с метками labels."""
+    key = (name, _labels_key(labels))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [
+                tuple(buckets), [0] * (len(buckets) + 1), 0.0, 0
+            ]
+        histogram[1][bisect.bisect_left(histogram[0], value)] += 1
+        histogram[2] += value
+        histogram[3] += 1
+    _maybe_flush()
+
+
+def register_collector(collector):
+    """collector() вызывается перед каждой записью метрик процесса и
+    возвращает показатели [(имя, значение, метки)].
+    """
+    with _lock:
+        if collector not in _collectors:
+            _collectors.append(collector)
+
+
+def _snapshot():
+    gauges = [
+        (name, value, labels)
+        for collector in list(_collectors)
+        for name, value, labels in collector()
+    ]
+    with _lock:
+        for name, value, labels in gauges:
+            _gauges[(name, _labels_key(labels))] = value
+        return {
+            'counters': [
+                [name, dict(labels), value]
+                for (name, labels), value in _counters.items()
+            ],
+            'gauges': [
+                [name, dict(labels), value]
+                for (name, labels), value in _gauges.items()
+            ],
+            'histograms': [
+                [name, dict(labels), list(buckets), list(counts), total,
+                 count]
+                for (name, labels), (buckets, counts, total, count)
+                in _histograms.items()
+            ],
+        }
+
+
+@contextmanager
+def _directory_lock(directory, operation):
+    """Перенос в архив (LOCK_EX) не должен идти во время чтения
+    (LOCK_SH), иначе значения на миг пропадут или задвоятся.
+    """
+    with open(os.path.join(directory, '.lock'), 'a') as lock:
+        fcntl.flock(lock, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _write(path, snapshot):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, path)
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _archive_finished(directory):
+    """Переносит счётчики и гистограммы завершившихся процессов в
+    архив. Файл со своим pid, записанный до первой записи процесса,
+    остался от завершившегося процесса с тем же pid.
+    """
+    own = _own_file(directory)
+    with _directory_lock(directory, fcntl.LOCK_EX):
+        finished = [
+            os.path.join(directory, filename)
+            for filename in os.listdir(directory)
+            if filename.endswith('.json') and filename != ARCHIVE
+            and (
+                os.path.join(directory, filename) == own
+                or not _is_running(filename)
+            )
+        ]
+        if not finished:
+            return
+        archive = _Totals()
+        archive.add(_read(os.path.join(directory, ARCHIVE)) or {})
+        for path in finished:
+            archive.add(_read(path) or {}, gauges=False)
+        _write(os.path.join(directory, ARCHIVE), archive.snapshot())
+        for path in finished:
+            os.remove(path)
+
+
+def flush():
+    """Записывает значения текущего процесса в его файл атомарно."""
+    global _last_flush, _archived_pid
+    directory = _metrics_dir()
+    _last_flush = time.monotonic()
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    with _flush_lock:
+        if _archived_pid != os.getpid():
+            _archive_finished(directory)
+            _archived_pid = os.getpid()
+        _write(_own_file(directory), _snapshot())
+
+
+def _flush_later():
+    global _pending_flush
+    with _lock:
+        _pending_flush = None
+    flush()
+
+
+def _maybe_flush():
+    """Записывает значения, если с прошлой записи прошло
+    METRICS_FLUSH_INTERVAL секунд, иначе откладывает запись, чтобы
+    последние изменения не потерялись, когда запросы закончатся.
+    """
+    global _pending_flush
+    interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0)
+    elapsed = time.monotonic() - _last_flush
+    if elapsed >= interval:
+        flush()
+        return
+    with _lock:
+        if _pending_flush is not None:
+            return
+        _pending_flush = threading.Timer(interval - elapsed, _flush_later)
+        _pending_flush.daemon = True
+        _pending_flush.start()
+
+
+def _is_running(filename):
+    try:
+        os.kill(int(filename.split('.')[0]), 0)
+    except ProcessLookupError:
+        return False
+    except (ValueError, PermissionError):
+        pass
+    return True
+
+
+class _Totals:
+    """Сумма снимков нескольких процессов."""
+
+    def __init__(self):
+        self.counters = defaultdict(float)
+        self.gauges = defaultdict(float)
+        self.histograms = {}
+
+    def add(self, snapshot, gauges=True):
+        for name, labels, value in snapshot.get('counters', ()):
+            self.counters[(name, _labels_key(labels))] += value
+        if gauges:
+            for name, labels, value in snapshot.get('gauges', ()):
+                self.gauges[(name, _labels_key(labels))] += value
+        for name, labels, buckets, counts, total, count in snapshot.get(
+            'histograms', ()
+        ):
+            key = (name, _labels_key(labels))
+            histogram = self.histograms.setdefault(
+                key, [tuple(buckets), [0] * len(counts), 0.0, 0]
+            )
+            if histogram[0] != tuple(buckets):
+                # Границы корзин изменились: такие значения не сложить.
+                continue
+            histogram[1] = [a + b for a, b in zip(histogram[1], counts)]
+            histogram[2] += total
+            histogram[3] += count
+
+    def snapshot(self):
+        return {
+            'counters': [
+                [name, dict(labels), value]
+                for (name, labels), value in self.counters.items()
+            ],
+            'histograms': [
+                [name, dict(labels), list(buckets), counts, total, count]
+                for (name, labels), (buckets, counts, total, count)
+                in self.histograms.items()
+            ],
+        }
+
+
+def _collect_totals():
+    totals = _Totals()
+    directory = _metrics_dir()
+    own = _own_file(directory) if directory else None
+    if directory and os.path.isdir(directory):
+        with _directory_lock(directory, fcntl.LOCK_SH):
+            for filename in os.listdir(directory):
+                path = os.path.join(directory, filename)
+                if not filename.endswith('.json') or path == own:
+                    continue
+                snapshot = _read(path)
+                if snapshot is not None:
+                    totals.add(snapshot, _is_running(filename))
+    totals.add(_snapshot())
+    return totals
+
+
+def collect():
+    """Возвращает счётчики и показатели всех процессов:
+    {(имя, метки): значение}.
+    """
+    totals = _collect_totals()
+    merged = totals.counters
+    for key, value in totals.gauges.items():
+        merged[key] += value
+    return merged
+
+
+def collect_all():
+    """Метрики всех процессов по типам: {'counters': {(имя, метки):
+    значение}, 'gauges': {...}, 'histograms': {(имя, метки): (границы,
+    количества по корзинам и сверх, сумма, число)}}.
+    """
+    totals = _collect_totals()
+    return {
+        'counters': dict(totals.counters),
+        'gauges': dict(totals.gauges),
+        'histograms': {
+            key: tuple(histogram)
+            for key, histogram in totals.histograms.items()
+        },
+    }
+
+
+def counter_value(name, **labels):
+    """Сумма счётчика name по всем процессам с указанными метками."""
+    return sum(
+        value for (metric, metric_labels), value in collect().items()
+        if metric == name
+        and all(dict(metric_labels).get(k) == v for k, v in labels.items())
+    )
+
+
+def process_gauges():
+    """Показатели процесса-воркера с меткой pid."""
+    pid = str(os.getpid())
+    yield 'worker_up', 1, {'pid': pid}
+    yield 'worker_start_time_seconds', _started, {'pid': pid}
+    yield 'worker_threads', threading.active_count(), {'pid': pid}
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return
+    yield (
+        'worker_resident_memory_bytes',
+        pages * os.sysconf('SC_PAGE_SIZE'),
+        {'pid': pid},
+    )
+
+
+def _after_fork():
+    """Потомок (воркер gunicorn) не наследует значения родителя."""
+    global _lock, _flush_lock, _pending_flush, _archived_pid, _started
+    global _last_flush
+    _lock = threading.Lock()
+    _flush_lock = threading.Lock()
+    _counters.clear()
+    _gauges.clear()
+    _histograms.clear()
+    _pending_flush = None
+    _archived_pid = None
+    _last_flush = 0.0
+    _started = time.time()
+
+
+_started = time.time()
+os.register_at_fork(after_in_child=_after_fork)
+atexit.register(flush)
@@ -0,0 +1,234 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import metrics, timing
+from .routers import replica_reads
+
+logger = logging.getLogger(__name__)
+
+ROUTE_GROUP = re.compile(r'\(\?P<(\w+)>[^)]*\)')
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class PrimaryPinningMiddleware:
+    """Безопасные запросы читают с реплик (см. core.routers), кроме
+    клиентов, успешно изменивших данные за последние
+    REPLICA_PIN_SECONDS секунд: они читают с основной базы и видят свои
+    изменения.
+
+    Срок привязки хранится в cookie, а для запросов с токеном - ещё и в
+    кэше REPLICA_PIN_CACHE по заголовку Authorization, для клиентов без
+    cookie. Чтобы привязка действовала во всех воркерах, кэш должен быть
+    общим.
+    """
+    cookie_name = 'primary_pin'
+    key_prefix = 'primary-pin:'
+    timer = time.time
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def cache_key(self, request):
+        authorization = request.META.get('HTTP_AUTHORIZATION')
+        if not authorization:
+            return None
+        digest = hashlib.md5(authorization.encode()).hexdigest()
+        return f'{self.key_prefix}{digest}'
+
+    def is_pinned(self, request, key):
+        now = self.timer()
+        try:
+            if float(request.COOKIES.get(self.cookie_name, 0)) > now:
+                return True
+        except ValueError:
+            pass
+        if key is None:
+            return False
+        return caches[settings.REPLICA_PIN_CACHE].get(key, 0) > now
+
+    def pin(self, response, key):
+        window = settings.REPLICA_PIN_SECONDS
+        if window <= 0:
+            return
+        until = self.timer() + window
+        response.set_cookie(
+            self.cookie_name, f'{until:.3f}', max_age=window, httponly=True
+        )
+        if key is not None:
+            caches[settings.REPLICA_PIN_CACHE].set(key, until, window)
+
+    def __call__(self, request):
+        if not settings.REPLICA_DATABASES:
+            return self.get_response(request)
+        key = self.cache_key(request)
+        safe = request.method in SAFE_METHODS
+        with replica_reads(safe and not self.is_pinned(request, key)):
+            response = self.get_response(request)
+        if not safe and response.status_code < 400:
+            self.pin(response, key)
+        return response
+
+
+def endpoint_name(view_func, method):
+    """Имя обработчика: вьюсет и действие, например TitleViewSet.list."""
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(method.lower(), method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+class ServerTimingMiddleware:
+    """Заголовок Server-Timing с общим временем обработки запроса.
+
+    Для доли запросов SERVER_TIMING_SAMPLE_RATE в заголовок и в журнал
+    (JSON, логгер core.middleware) попадают также число и время
+    SQL-запросов, повторы одинаковых запросов, время сериализаторов и
+    отрисовки ответа и обработчик (вьюсет и действие). Запрос,
+    повторённый SERVER_TIMING_REPEATED_QUERIES раз и больше, - вероятно,
+    N+1: такие записи журнала получают уровень WARNING.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        if random.random() >= settings.SERVER_TIMING_SAMPLE_RATE:
+            response = self.get_response(request)
+            total = (time.perf_counter() - started) * 1000
+            response['Server-Timing'] = f'total;dur={total:.1f}'
+            return response
+        with timing.collect(timing.RequestTimings()) as timings:
+            response = self.get_response(request)
+        total = (time.perf_counter() - started) * 1000
+        response['Server-Timing'] = self.header(timings, total)
+        self.log(request, response, timings, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = timing.current()
+        if timings is not None:
+            timings.endpoint = endpoint_name(view_func, request.method)
+
+    def process_template_response(self, request, response):
+        timings = timing.current()
+        if timings is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                timings.durations['render'] += (
+                    time.perf_counter() - started
+                )
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def header(self, timings, total):
+        values = [
+            f'total;dur={total:.1f}',
+            f'sql;dur={timings.sql_time * 1000:.1f};'
+            f'desc="{timings.sql_count} queries, '
+            f'{timings.duplicates} duplicates"',
+        ]
+        values.extend(
+            f'{name};dur={duration * 1000:.1f}'
+            for name, duration in timings.durations.items()
+        )
+        if timings.endpoint:
+            values.append(f'endpoint;desc="{timings.endpoint}"')
+        return ', '.join(values)
+
+    def log(self, request, response, timings, total):
+        repeated = timings.repeated(settings.SERVER_TIMING_REPEATED_QUERIES)
+        record = {
+            'endpoint': timings.endpoint,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total, 1),
+            'sql_queries': timings.sql_count,
+            'sql_ms': round(timings.sql_time * 1000, 1),
+            'duplicate_queries': timings.duplicates,
+            'serializer_ms': round(timings.durations['serializer'] * 1000, 1),
+            'render_ms': round(timings.durations['render'] * 1000, 1),
+            'repeated_queries': [
+                {'sql': sql[:200], 'count': count} for sql, count in repeated
+            ],
+        }
+        logger.log(
+            logging.WARNING if repeated else logging.INFO,
+            json.dumps(record, ensure_ascii=False),
+        )
+
+
+def route_pattern(request):
+    """Шаблон адреса запроса, например api/v1/titles/{title_id}/reviews:
+    метка с ограниченным числом значений.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    route = ROUTE_GROUP.sub(r'{\1}', match.route)
+    return route.replace('\\', '').strip('^$?/')
+
+
+class RequestMetricsMiddleware:
+    """Счётчики запросов и ошибок (ответы 5xx), гистограммы длительности
+    запросов и их времени в базе в core.metrics с метками шаблона адреса
+    и действия вьюсета. Метрики отдаёт в формате Prometheus адрес
+    /metrics (см. core.prometheus).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.in_progress = 0
+        self.lock = threading.Lock()
+        metrics.register_collector(metrics.process_gauges)
+
+    def track(self, delta):
+        with self.lock:
+            self.in_progress += delta
+            metrics.set_gauge(
+                'worker_requests_in_progress', self.in_progress,
+                pid=str(os.getpid()),
+            )
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        self.track(1)
+        try:
+            with timing.wrap_queries(timing.QueryTimer()) as queries:
+                response = self.get_response(request)
+        finally:
+            self.track(-1)
+        labels = {'route': route_pattern(request), 'action': 'unknown'}
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            labels['action'] = endpoint_name(
+                match.func, request.method
+            ).rsplit('.', 1)[-1]
+        metrics.inc(
+            'http_requests', status=f'{response.status_code // 100}xx',
+            **labels
+        )
+        if response.status_code >= 500:
+            metrics.inc('http_errors', **labels)
+        metrics.observe(
+            'http_request_duration_seconds',
+            time.perf_counter() - started, **labels
+        )
+        metrics.observe('http_request_db_seconds', queries.sql_time, **labels)
+        metrics.inc('db_queries', queries.sql_count, **labels)
+        return response
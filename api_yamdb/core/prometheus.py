@@ -0,0 +1,121 @@
+"""Метрики core.metrics в текстовом формате Prometheus.
+
+Значения складываются по всем процессам (воркерам gunicorn), поэтому
+опрашивать можно любой воркер. Счётчик name отдаётся как
+yamdb_<name>_total, показатель и гистограмма - как yamdb_<name>.
+Доля попаданий в кэш ответов считается из счётчиков
+response_cache_requests.
+"""
+from collections import defaultdict
+
+from . import metrics
+
+PREFIX = 'yamdb_'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DESCRIPTIONS = {
+    'http_requests': 'Запросы по шаблону адреса, действию и классу ответа.',
+    'http_errors': 'Запросы, завершившиеся ответом 5xx.',
+    'http_request_duration_seconds': 'Длительность обработки запроса.',
+    'http_request_db_seconds': 'Время SQL-запросов за один запрос.',
+    'db_queries': 'SQL-запросы, выполненные при обработке запросов.',
+    'response_cache_requests': 'Обращения к кэшу ответов.',
+    'response_cache_hit_ratio': 'Доля попаданий в кэш ответов.',
+    'worker_up': 'Работающие воркеры.',
+    'worker_start_time_seconds': 'Время запуска воркера (unix time).',
+    'worker_threads': 'Потоки воркера.',
+    'worker_resident_memory_bytes': 'Резидентная память воркера.',
+    'worker_requests_in_progress': 'Запросы, которые воркер обрабатывает.',
+    'db_pool_connections': 'Соединения пулов с базой.',
+}
+
+
+def _escape(value):
+    return (
+        str(value).replace('\\', r'\\').replace('\n', r'\n')
+        .replace('"', r'\"')
+    )
+
+
+def _labels(labels, **extra):
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        f'{name}="{_escape(value)}"' for name, value in pairs
+    ) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _family(lines, name, kind):
+    description = DESCRIPTIONS.get(name)
+    if description:
+        lines.append(f'# HELP {PREFIX}{name} {description}')
+    lines.append(f'# TYPE {PREFIX}{name} {kind}')
+
+
+def _by_name(values):
+    families = defaultdict(list)
+    for (name, labels), value in values.items():
+        families[name].append((labels, value))
+    return sorted(families.items())
+
+
+def cache_hit_ratios(counters):
+    """Доля попаданий в кэш ответов по вьюсетам и действиям."""
+    totals = defaultdict(lambda: defaultdict(float))
+    for (name, labels), value in counters.items():
+        if name != 'response_cache_requests':
+            continue
+        labels = dict(labels)
+        key = (('view', labels['view']), ('action', labels['action']))
+        totals[key][labels['result']] += value
+    return {
+        ('response_cache_hit_ratio', key): counts['hit'] / (
+            counts['hit'] + counts['miss']
+        )
+        for key, counts in totals.items() if counts['hit'] + counts['miss']
+    }
+
+
+def render():
+    """Текст для ответа на опрос Prometheus."""
+    collected = metrics.collect_all()
+    lines = []
+    for name, samples in _by_name(collected['counters']):
+        _family(lines, name, 'counter')
+        lines.extend(
+            f'{PREFIX}{name}_total{_labels(labels)} {_number(value)}'
+            for labels, value in sorted(samples)
+        )
+    gauges = {
+        **collected['gauges'], **cache_hit_ratios(collected['counters'])
+    }
+    for name, samples in _by_name(gauges):
+        _family(lines, name, 'gauge')
+        lines.extend(
+            f'{PREFIX}{name}{_labels(labels)} {_number(value)}'
+            for labels, value in sorted(samples)
+        )
+    for name, samples in _by_name(collected['histograms']):
+        _family(lines, name, 'histogram')
+        for labels, (buckets, counts, total, count) in sorted(samples):
+            cumulative = 0
+            for bound, bucket_count in zip(
+                (*buckets, float('inf')), counts
+            ):
+                cumulative += bucket_count
+                lines.append(
+                    f'{PREFIX}{name}_bucket'
+                    f'{_labels(labels, le=_number(bound))} {cumulative}'
+                )
+            lines.append(
+                f'{PREFIX}{name}_sum{_labels(labels)} {_number(total)}'
+            )
+            lines.append(f'{PREFIX}{name}_count{_labels(labels)} {count}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,161 @@
+"""Разбор планов запросов для аудита API.
+
+Запросы перехватываются вместе с параметрами, для каждого SELECT
+строится план (EXPLAIN, при возможности с ANALYZE) и отмечаются
+полное сканирование таблицы, сортировка без индекса и стоимость выше
+порога. По условиям равенства и сортировке таких запросов предлагаются
+составные индексы, которых ещё нет у моделей.
+"""
+import json
+import re
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.db import connection
+
+SEQ_SCAN = 'seq_scan'
+UNINDEXED_SORT = 'sort_without_index'
+HIGH_COST = 'high_cost'
+
+SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)')
+EQUALS = re.compile(r'"(\w+)"\."(\w+)" = %s')
+ORDER_BY = re.compile(r'"(\w+)"\."(\w+)" (ASC|DESC)')
+
+
+@contextmanager
+def capture_queries():
+    """Собирает (sql, params) всех запросов внутри блока."""
+    queries = []
+
+    def record(execute, sql, params, many, context):
+        queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(record):
+        yield queries
+
+
+def is_select(sql):
+    return sql.lstrip().upper().startswith('SELECT')
+
+
+def _postgresql_plan(cursor, sql, params, analyze):
+    options = 'ANALYZE, FORMAT JSON' if analyze else 'FORMAT JSON'
+    cursor.execute(f'EXPLAIN ({options}) {sql}', params)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    plan = plan[0]['Plan']
+    flags = []
+    nodes = [plan]
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.get('Plans', ()))
+        if node['Node Type'] == 'Seq Scan':
+            flags.append({'flag': SEQ_SCAN, 'table': node['Relation Name']})
+        elif node['Node Type'] == 'Sort':
+            flags.append({'flag': UNINDEXED_SORT, 'keys': node['Sort Key']})
+    return plan, flags, plan['Total Cost']
+
+
+def _sqlite_plan(cursor, sql, params):
+    cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+    plan = [row[-1] for row in cursor.fetchall()]
+    flags = []
+    for detail in plan:
+        scan = SQLITE_SCAN.match(detail)
+        if scan and 'USING' not in detail:
+            flags.append({'flag': SEQ_SCAN, 'table': scan.group(1)})
+        elif 'TEMP B-TREE FOR ORDER BY' in detail:
+            flags.append({'flag': UNINDEXED_SORT, 'detail': detail})
+    return plan, flags, None
+
+
+def explain(sql, params, analyze=True, cost_threshold=None):
+    """План запроса и отмеченные в нём проблемы."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            plan, flags, cost = _postgresql_plan(
+                cursor, sql, params, analyze
+            )
+        elif connection.vendor == 'sqlite':
+            plan, flags, cost = _sqlite_plan(cursor, sql, params)
+        else:
+            cursor.execute(f'EXPLAIN {sql}', params)
+            plan = [list(row) for row in cursor.fetchall()]
+            flags, cost = [], None
+    if cost is not None and cost_threshold and cost > cost_threshold:
+        flags.append({'flag': HIGH_COST, 'cost': cost})
+    return {'plan': plan, 'flags': flags, 'cost': cost}
+
+
+def _models_by_table():
+    return {model._meta.db_table: model for model in apps.get_models()}
+
+
+def _existing_indexes(model):
+    """Столбцы всех индексов модели, включая индексы внешних ключей,
+    уникальных полей и ограничений.
+    """
+    opts = model._meta
+
+    def columns(names):
+        return tuple(
+            opts.get_field(name.lstrip('-')).column for name in names
+        )
+
+    indexes = [columns(index.fields) for index in opts.indexes]
+    indexes += [
+        columns(constraint.fields) for constraint in opts.constraints
+        if getattr(constraint, 'fields', None)
+    ]
+    indexes += [columns(fields) for fields in opts.unique_together]
+    indexes += [columns(fields) for fields in opts.index_together]
+    indexes += [
+        (field.column,) for field in opts.concrete_fields
+        if field.primary_key or field.unique or field.db_index
+    ]
+    return indexes
+
+
+def suggest_index(sql):
+    """Составной индекс (модель, поля) для запроса: сначала поля из
+    условий равенства, затем поля сортировки. None, если у модели уже
+    есть индекс с таким началом или запрос не к одной таблице модели.
+    """
+    match = re.search(r'\bFROM "(\w+)"', sql)
+    if not match:
+        return None
+    table = match.group(1)
+    model = _models_by_table().get(table)
+    if model is None:
+        return None
+    where, _, order = sql.partition(' ORDER BY ')
+    where = where.partition(' WHERE ')[2]
+    columns = {field.column: field for field in model._meta.concrete_fields}
+    equal = [
+        column for name, column in EQUALS.findall(where)
+        if name == table and column in columns
+    ]
+    ordered = [
+        (column, direction) for name, column, direction
+        in ORDER_BY.findall(order)
+        if name == table and column in columns and column not in equal
+    ]
+    # Сортировка по первичному ключу после другого поля лишь разрешает
+    # равенства, индекс для неё не нужен.
+    if len(ordered) > 1 and ordered[-1][0] == model._meta.pk.column:
+        ordered.pop()
+    wanted = tuple(dict.fromkeys(equal)) + tuple(
+        column for column, _ in ordered
+    )
+    if not wanted or any(index[:len(wanted)] == wanted
+                         for index in _existing_indexes(model)):
+        return None
+    directions = dict(ordered)
+    fields = [
+        ('-' if directions.get(column) == 'DESC' else '')
+        + columns[column].name
+        for column in wanted
+    ]
+    return model._meta.label, fields
@@ -0,0 +1,129 @@
+"""Чтение с реплик базы.
+
+Запросы к базе из безопасных (GET, HEAD, OPTIONS) запросов к API
+ReplicaRouter отправляет на одну из реплик REPLICA_DATABASES, остальные
+- на основную базу 'default'. Реплики выбираются по кругу, одна на весь
+запрос, чтобы его данные были согласованы. Реплика, к которой не
+удалось подключиться, пропускается REPLICA_RETRY_INTERVAL секунд; если
+недоступны все, чтение идёт с основной базы.
+
+Включает чтение с реплик middleware PrimaryPinningMiddleware: клиент,
+который только что что-то изменил, ещё REPLICA_PIN_SECONDS секунд
+читает с основной базы и видит свои изменения, даже если реплики
+отстают. Вне запросов к API (команды, фоновые потоки) и внутри
+транзакций чтение всегда идёт с основной базы. Ответы, прочитанные с
+реплик в течение того же срока после изменения данных, не кэшируются
+(см. api.mixins.CachedResponseMixin).
+"""
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+_state = threading.local()
+_turn = itertools.count()
+_down_until = {}
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Разрешает чтение с реплик в текущем потоке на время блока."""
+    previous = getattr(_state, 'enabled', False), getattr(
+        _state, 'alias', None
+    )
+    _state.enabled, _state.alias = enabled, None
+    try:
+        yield
+    finally:
+        _state.enabled, _state.alias = previous
+
+
+def may_lag(changed_at):
+    """Текущий запрос читает с реплик, а данные изменились меньше
+    REPLICA_PIN_SECONDS секунд назад: реплики могут ещё отставать.
+    """
+    return (
+        getattr(_state, 'enabled', False)
+        and bool(settings.REPLICA_DATABASES)
+        and time.time() - changed_at < settings.REPLICA_PIN_SECONDS
+    )
+
+
+def is_available(alias):
+    """К реплике можно подключиться. Неудача запоминается на
+    REPLICA_RETRY_INTERVAL секунд.
+    """
+    if _down_until.get(alias, 0) > time.monotonic():
+        return False
+    connection = connections[alias]
+    if connection.connection is not None:
+        return True
+    try:
+        connection.ensure_connection()
+    except DatabaseError as error:
+        _down_until[alias] = (
+            time.monotonic() + settings.REPLICA_RETRY_INTERVAL
+        )
+        metrics.inc('db_replica_failures', alias=alias)
+        logger.warning('Реплика %s недоступна: %s', alias, error)
+        return False
+    return True
+
+
+def choose_replica():
+    """Следующая по кругу доступная реплика или основная база."""
+    replicas = settings.REPLICA_DATABASES
+    if not replicas:
+        return DEFAULT_DB_ALIAS
+    start = next(_turn)
+    for offset in range(len(replicas)):
+        alias = replicas[(start + offset) % len(replicas)]
+        if is_available(alias):
+            return alias
+    metrics.inc('db_replica_fallbacks')
+    return DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    """Чтения из безопасных запросов - с реплик, всё остальное - с
+    основной базы (по умолчанию Django).
+    """
+
+    def db_for_read(self, model, **hints):
+        if not getattr(_state, 'enabled', False):
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if _state.alias is None:
+            _state.alias = choose_replica()
+        return _state.alias
+
+    def db_for_write(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and (
+            instance._state.db in settings.REPLICA_DATABASES
+        ):
+            # Объект прочитан с реплики, а записывается в основную базу.
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и в основной базе.
+        databases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Схема реплик приходит с основной базы.
+        if db in settings.REPLICA_DATABASES:
+            return False
+        return None
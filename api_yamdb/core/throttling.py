@@ -0,0 +1,153 @@
+"""Ограничение частоты запросов корзиной токенов (token bucket).
+
+У каждого ключа (IP или имени пользователя в области scope) есть
+корзина на N токенов, которая наполняется со скоростью N за период
+из REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] ('20/min' - до 20 запросов
+подряд, затем один запрос в 3 секунды). Запрос забирает токен, а при
+пустой корзине отклоняется с 429 ещё до работы с базой: проверки
+выполняются до обработчика вьюсета, анонимные запросы не читают
+пользователя.
+
+Корзины хранятся в памяти процесса (THROTTLE_STORE = 'local') или в
+общем кэше THROTTLE_CACHE_ALIAS (THROTTLE_STORE = 'cache'). Общий кэш
+обновляется без блокировок, поэтому при одновременных запросах одного
+клиента к разным воркерам лимит может быть превышен на единицы
+запросов.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from . import metrics
+
+KEY_PREFIX = 'throttle:'
+
+
+def take_token(state, capacity, rate, now):
+    """Забирает токен из корзины state = (токенов, время). Возвращает
+    новое состояние и сколько секунд ждать, если токена нет (иначе 0).
+    """
+    tokens, updated = state or (capacity, now)
+    tokens = min(capacity, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return (tokens - 1, now), 0.0
+    return (tokens, now), (1 - tokens) / rate
+
+
+class LocalBucketStore:
+    """Корзины в памяти процесса. Хранит не больше max_keys корзин,
+    давно не использованные вытесняются (как полные).
+    """
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, key, capacity, rate, now):
+        with self.lock:
+            state, wait = take_token(
+                self.buckets.get(key), capacity, rate, now
+            )
+            self.buckets[key] = state
+            self.buckets.move_to_end(key)
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+
+
+class CacheBucketStore:
+    """Корзины в общем кэше: лимит действует на все воркеры."""
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def take(self, key, capacity, rate, now):
+        cache = caches[self.alias]
+        # Имя пользователя может содержать недопустимые в ключах символы.
+        key = f'{KEY_PREFIX}{hashlib.md5(key.encode()).hexdigest()}'
+        state, wait = take_token(cache.get(key), capacity, rate, now)
+        # Корзина полностью наполняется за capacity / rate секунд,
+        # после этого хранить её незачем.
+        cache.set(key, state, timeout=int(capacity / rate) + 1)
+        return wait
+
+
+_local_store = LocalBucketStore()
+
+
+def reset():
+    """Наполняет все корзины процесса."""
+    _local_store.clear()
+
+
+def get_store():
+    if settings.THROTTLE_STORE == 'cache':
+        return CacheBucketStore(settings.THROTTLE_CACHE_ALIAS)
+    return _local_store
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Базовый класс: корзина на ключ get_ident_key() в области
+    "<view.throttle_scope>_<kind>".
+    """
+    kind = None
+    timer = time.time
+
+    def get_ident_key(self, request):
+        raise NotImplementedError('Укажите, по чему считать запросы.')
+
+    def parse_rate(self, rate):
+        num, period = rate.split('/')
+        duration = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+        return int(num), int(num) / duration
+
+    def allow_request(self, request, view):
+        self.wait_time = None
+        scope = getattr(view, 'throttle_scope', None)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(f'{scope}_{self.kind}')
+        ident = self.get_ident_key(request)
+        if rate is None or ident is None:
+            return True
+        capacity, refill = self.parse_rate(rate)
+        wait = get_store().take(
+            f'{scope}_{self.kind}:{ident}', capacity, refill, self.timer()
+        )
+        if not wait:
+            return True
+        self.wait_time = wait
+        metrics.inc('throttled_requests', scope=scope, kind=self.kind)
+        return False
+
+    def wait(self):
+        return self.wait_time
+
+
+class IPThrottle(TokenBucketThrottle):
+    """Лимит запросов с одного IP-адреса."""
+    kind = 'ip'
+
+    def get_ident_key(self, request):
+        return self.get_ident(request)
+
+
+class UsernameThrottle(TokenBucketThrottle):
+    """Лимит запросов для одного имени пользователя из тела запроса."""
+    kind = 'username'
+
+    def get_ident_key(self, request):
+        data = request.data
+        username = data.get('username') if hasattr(data, 'get') else None
+        if not isinstance(username, str) or not username:
+            return None
+        return username.lower()
@@ -0,0 +1,122 @@
+"""Замеры обработки запроса для заголовка Server-Timing.
+
+Для запросов, попавших в выборку (SERVER_TIMING_SAMPLE_RATE),
+ServerTimingMiddleware (см. core.middleware) собирает в RequestTimings
+число и время SQL-запросов ко всем базам, повторы одинаковых запросов
+(признак N+1), время сериализаторов и отрисовки ответа. Остальные
+запросы получают только общее время и почти ничего не стоят.
+"""
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+_local = threading.local()
+
+
+class QueryTimer:
+    """Число и время SQL-запросов. Вызывается как execute_wrapper."""
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.sql_count += 1
+            self.record(sql)
+
+    def record(self, sql):
+        pass
+
+
+class RequestTimings(QueryTimer):
+    """Замеры одного запроса из выборки."""
+
+    def __init__(self):
+        super().__init__()
+        self.endpoint = None
+        self.statements = Counter()
+        self.durations = defaultdict(float)
+        self.active = set()
+
+    def record(self, sql):
+        # Параметры в SQL не подставлены: запросы N+1 совпадают.
+        self.statements[sql] += 1
+
+    @property
+    def duplicates(self):
+        """Сколько запросов повторили уже выполненные."""
+        return sum(count - 1 for count in self.statements.values())
+
+    def repeated(self, threshold):
+        """Запросы, выполненные не меньше threshold раз: [(sql, раз)]."""
+        return [
+            (sql, count) for sql, count in self.statements.most_common()
+            if count >= threshold
+        ]
+
+
+def current():
+    """Замеры текущего запроса или None, если он не в выборке."""
+    return getattr(_local, 'timings', None)
+
+
+@contextmanager
+def wrap_queries(timer):
+    """Передаёт SQL-запросы потока ко всем базам в timer на время
+    блока.
+    """
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timer))
+        yield timer
+
+
+@contextmanager
+def collect(timings):
+    """Собирает замеры запроса в timings на время блока."""
+    _local.timings = timings
+    try:
+        with wrap_queries(timings):
+            yield timings
+    finally:
+        _local.timings = None
+
+
+@contextmanager
+def measure(name):
+    """Добавляет время блока к замеру name. Вложенные блоки с тем же
+    именем (вложенные сериализаторы) не считаются дважды.
+    """
+    timings = current()
+    if timings is None or name in timings.active:
+        yield
+        return
+    timings.active.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.durations[name] += time.perf_counter() - started
+        timings.active.discard(name)
+
+
+class TimedSerializerMixin:
+    """Время сериализатора (вывод и проверка данных) попадает в замер
+    serializer.
+    """
+
+    def to_representation(self, instance):
+        with measure('serializer'):
+            return super().to_representation(instance)
+
+    def run_validation(self, *args, **kwargs):
+        with measure('serializer'):
+            return super().run_validation(*args, **kwargs)
@@ -0,0 +1,59 @@
+"""Штампы версий ресурсов API.
+
+Штамп - строка "<время изменения>:<случайная часть>", которая меняется
+при каждом изменении данных ресурса (списка категорий, произведения,
+отзывов к произведению и т.п.). Штампы хранятся в кэше
+settings.VERSIONS_CACHE_ALIAS, который должен быть общим для всех
+воркеров (по умолчанию файловый), и входят в ключи кэша ответов, так
+что изменение данных сразу делает старые ответы недостижимыми.
+"""
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+KEY_PREFIX = 'version:'
+
+
+def _cache():
+    return caches[settings.VERSIONS_CACHE_ALIAS]
+
+
+def new_stamp():
+    return f'{time.time():.6f}:{uuid.uuid4().hex[:8]}'
+
+
+def stamp_time(stamp):
+    """Время изменения ресурса (unix time) из его штампа."""
+    return float(stamp.split(':', 1)[0])
+
+
+def get_stamps(*scopes):
+    """Возвращает штампы {scope: stamp}. Отсутствующие в кэше штампы
+    создаются заново: потеря штампа лишь инвалидирует ответы.
+    """
+    cache = _cache()
+    keys = {f'{KEY_PREFIX}{scope}': scope for scope in scopes}
+    found = cache.get_many(keys)
+    stamps = {keys[key]: stamp for key, stamp in found.items()}
+    for key, scope in keys.items():
+        if scope not in stamps:
+            cache.add(key, new_stamp(), timeout=None)
+            stamps[scope] = cache.get(key) or new_stamp()
+    return stamps
+
+
+def bump(*scopes):
+    """Отмечает изменение данных ресурсов scopes."""
+    stamp = new_stamp()
+    _cache().set_many(
+        {f'{KEY_PREFIX}{scope}': stamp for scope in scopes}, timeout=None
+    )
+
+
+def reset():
+    """Сбрасывает все штампы: после массовых изменений в обход сигналов
+    все закэшированные ответы и справочники устаревают разом.
+    """
+    _cache().clear()
@@ -0,0 +1,20 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from . import prometheus
+
+
+def metrics_view(request):
+    """Метрики для Prometheus. Требуется заголовок Authorization:
+    Bearer <METRICS_TOKEN>; пока токен не задан, метрики не отдаются.
+    """
+    if not settings.METRICS_TOKEN or not hmac.compare_digest(
+        request.META.get('HTTP_AUTHORIZATION', ''),
+        f'Bearer {settings.METRICS_TOKEN}',
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        prometheus.render(), content_type=prometheus.CONTENT_TYPE
+    )
@@ -0,0 +1,5 @@
+import os
+
+# SERVER_MODE=asgi: воркеры uvicorn для api_yamdb.asgi (см. core.asgi).
+if os.getenv('SERVER_MODE') == 'asgi':
+    worker_class = 'uvicorn.workers.UvicornH11Worker'
@@ -1,5 +1,10 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ReviewsConfig(AppConfig):
     name = 'reviews'
+
+    def ready(self):
+        from . import search, signals  # noqa: F401
+        post_migrate.connect(search.ensure_sqlite_triggers, sender=self)
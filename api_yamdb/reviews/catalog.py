@@ -0,0 +1,81 @@
+"""Справочники категорий и жанров в памяти процесса.
+
+Категорий и жанров немного и меняются они редко, поэтому каждый воркер
+держит их целиком и ищет по slug и id без запросов к базе. Актуальность
+проверяется по штампу версии ('categories' или 'genres'), который
+сигналы меняют при любом изменении через API или админку, - один раз
+за запрос, а не при каждом поиске. Вне запросов (команды) штамп
+сверяется при каждом поиске.
+"""
+import threading
+
+from django.core.signals import request_started
+from django.db import DEFAULT_DB_ALIAS
+from django.dispatch import receiver
+
+from core import versions
+from .models import Category, Genre
+
+_local = threading.local()
+
+
+@receiver(request_started)
+def start_request(**kwargs):
+    """Новый запрос: справочники сверят свои штампы заново."""
+    _local.checked = set()
+
+
+class ReferenceCatalog:
+
+    def __init__(self, model, scope):
+        self.model = model
+        self.scope = scope
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._by_id = {}
+        self._by_slug = {}
+
+    def __deepcopy__(self, memo):
+        # Поля сериализаторов копируются глубоко, справочник - общий.
+        return self
+
+    def _load(self, stamp):
+        # Справочник хранится до смены штампа, поэтому читается с
+        # основной базы: отстающая реплика закрепила бы старые данные.
+        objects = list(self.model.objects.using(DEFAULT_DB_ALIAS))
+        with self._lock:
+            self._by_id = {obj.pk: obj for obj in objects}
+            self._by_slug = {obj.slug: obj for obj in objects}
+            self._stamp = stamp
+
+    def refresh(self, force=False):
+        """Перечитывает справочник, если его штамп версии изменился."""
+        stamp = versions.get_stamps(self.scope)[self.scope]
+        if force or stamp != self._stamp:
+            self._load(stamp)
+
+    def _check(self):
+        checked = getattr(_local, 'checked', None)
+        if checked is None:
+            self.refresh()
+        elif self.scope not in checked:
+            self.refresh()
+            checked.add(self.scope)
+
+    def _lookup(self, index_name, key):
+        # Неизвестный ключ справочник не перечитывает: записи, которых
+        # нет по свежему штампу, нет и в базе.
+        self._check()
+        return getattr(self, index_name).get(key)
+
+    def get_by_id(self, pk):
+        if pk is None:
+            return None
+        return self._lookup('_by_id', pk)
+
+    def get_by_slug(self, slug):
+        return self._lookup('_by_slug', slug)
+
+
+categories = ReferenceCatalog(Category, 'categories')
+genres = ReferenceCatalog(Genre, 'genres')
@@ -1,5 +1,6 @@
 from django_filters import rest_framework as filters
 from reviews.models import Title
+from reviews.search import search_titles
 
 
 class TitlesFilter(filters.FilterSet):
@@ -13,9 +14,17 @@ class TitlesFilter(filters.FilterSet):
     )
     genre = filters.CharFilter(
         field_name='genre__slug',
-        lookup_expr='icontains'
+        lookup_expr='icontains',
+        distinct=True
     )
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Title
-        fields = ('name', 'year', 'genre', 'category',)
+        fields = ('name', 'year', 'genre', 'category', 'search',)
+
+    def filter_search(self, queryset, name, value):
+        """Поиск по названию через индекс, результаты упорядочены
+        по релевантности.
+        """
+        return search_titles(queryset, value).order_by('-rank', 'name')
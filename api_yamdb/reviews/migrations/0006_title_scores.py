@@ -0,0 +1,40 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:51
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_scores(apps, schema_editor):
+    Title = apps.get_model('reviews', 'Title')
+    Review = apps.get_model('reviews', 'Review')
+    totals = Review.objects.filter(title__isnull=False).values(
+        'title'
+    ).annotate(score_sum=Sum('score'), score_count=Count('pk')).order_by()
+    for row in totals:
+        Title.objects.filter(pk=row['title']).update(
+            score_sum=row['score_sum'],
+            score_count=row['score_count'],
+            rating=(row['score_sum'] * 2 + row['score_count'])
+            // (row['score_count'] * 2),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0005_title_rating'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='title',
+            name='score_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Количество оценок'),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='score_sum',
+            field=models.PositiveIntegerField(default=0, verbose_name='Сумма оценок'),
+        ),
+        migrations.RunPython(fill_scores, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,11 @@
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import (
+    Case, Count, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+)
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save
+from django.utils import timezone
 from users.models import User
 
 from .validators import validate_year
@@ -55,6 +61,99 @@ class Genre(models.Model):
         return self.name
 
 
+def rating_expression(score_sum, score_count):
+    """Округлённое среднее score_sum / score_count.
+    Целочисленная арифметика даёт одинаковое округление (половина вверх)
+    на PostgreSQL и SQLite.
+    """
+    return (score_sum * 2 + score_count) / (score_count * 2)
+
+
+SCORES = range(1, 11)
+SCORE_FIELDS = tuple(f'score_{score}' for score in SCORES)
+
+
+def score_count_field(score):
+    return models.PositiveIntegerField(
+        verbose_name=f'Количество оценок {score}',
+        default=0
+    )
+
+
+class TitleQuerySet(models.QuerySet):
+
+    def change_score(self, title_id, added=None, removed=None):
+        """Атомарно учитывает в агрегатах произведения новую оценку
+        added и/или снятую оценку removed (при изменении отзыва - обе):
+        сумму, количество, распределение оценок и рейтинг - одним UPDATE.
+        В SET все выражения вычисляются по значениям строки до
+        обновления, поэтому новая сумма и количество считаются явно.
+        """
+        if title_id is None or added == removed:
+            return
+        score_delta = (added or 0) - (removed or 0)
+        count_delta = (added is not None) - (removed is not None)
+        score_sum = F('score_sum') + score_delta
+        score_count = F('score_count') + count_delta
+        histogram = {}
+        if added is not None:
+            histogram[f'score_{added}'] = F(f'score_{added}') + 1
+        if removed is not None:
+            histogram[f'score_{removed}'] = F(f'score_{removed}') - 1
+        self.filter(pk=title_id).update(
+            updated=timezone.now(),
+            score_sum=score_sum,
+            score_count=score_count,
+            rating=Case(
+                When(score_count=-count_delta, then=Value(None)),
+                default=rating_expression(score_sum, score_count),
+                output_field=IntegerField(),
+            ),
+            **histogram,
+        )
+
+    def rebuild_scores(self):
+        """Пересчитывает суммы, количества и распределения оценок и
+        рейтинги с нуля.
+        На PostgreSQL таблица отзывов блокируется от записи на время
+        пересчёта, чтобы не потерять параллельные изменения.
+        """
+        reviews = Review.objects.filter(
+            title=OuterRef('pk')
+        ).order_by().values('title')
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f'LOCK TABLE {Review._meta.db_table} '
+                        'IN SHARE MODE'
+                    )
+            updated = self.update(
+                score_sum=Coalesce(Subquery(
+                    reviews.annotate(total=Sum('score')).values('total')
+                ), 0),
+                score_count=Coalesce(Subquery(
+                    reviews.annotate(total=Count('pk')).values('total')
+                ), 0),
+                **{
+                    f'score_{score}': Coalesce(Subquery(
+                        reviews.filter(score=score).annotate(
+                            total=Count('pk')
+                        ).values('total')
+                    ), 0)
+                    for score in SCORES
+                },
+            )
+            self.update(rating=Case(
+                When(score_count=0, then=Value(None)),
+                default=rating_expression(
+                    F('score_sum'), F('score_count')
+                ),
+                output_field=IntegerField(),
+            ))
+        return updated
+
+
 class Title(models.Model):
     """Модель Title, в которой хранятся данные произведения.
     Содержит поля:
@@ -62,7 +161,12 @@ class Title(models.Model):
     - year - Дата выхода,
     - description - Описание произведения,
     - genre - Жанр,
-    - category - Категория
+    - category - Категория,
+    - rating - Округлённая средняя оценка,
+    - score_sum, score_count - Сумма и количество оценок, по которым
+      рейтинг поддерживается при изменении отзывов,
+    - score_1 ... score_10 - Количество каждой из оценок,
+    - updated - Время последнего изменения произведения или его рейтинга
     """
     name = models.CharField(
         verbose_name='Название',
@@ -93,6 +197,31 @@ class Title(models.Model):
         null=True,
         default=None
     )
+    score_sum = models.PositiveIntegerField(
+        verbose_name='Сумма оценок',
+        default=0
+    )
+    score_count = models.PositiveIntegerField(
+        verbose_name='Количество оценок',
+        default=0
+    )
+    score_1 = score_count_field(1)
+    score_2 = score_count_field(2)
+    score_3 = score_count_field(3)
+    score_4 = score_count_field(4)
+    score_5 = score_count_field(5)
+    score_6 = score_count_field(6)
+    score_7 = score_count_field(7)
+    score_8 = score_count_field(8)
+    score_9 = score_count_field(9)
+    score_10 = score_count_field(10)
+    updated = models.DateTimeField(
+        verbose_name='Изменено',
+        auto_now=True,
+        db_index=True
+    )
+
+    objects = TitleQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Произведение'
@@ -102,6 +231,26 @@ class Title(models.Model):
     def __str__(self):
         return self.name
 
+    @property
+    def score_histogram(self):
+        """Количество каждой из оценок {оценка: количество}."""
+        return {score: getattr(self, f'score_{score}') for score in SCORES}
+
+    @property
+    def score_median(self):
+        """Медиана оценок по распределению, без чтения отзывов."""
+        if not self.score_count:
+            return None
+        # Номера (с нуля) средних элементов упорядоченного ряда оценок.
+        middle = sorted({(self.score_count - 1) // 2, self.score_count // 2})
+        values, seen = [], 0
+        for score, count in self.score_histogram.items():
+            seen += count
+            while middle and middle[0] < seen:
+                middle.pop(0)
+                values.append(score)
+        return sum(values) / len(values)
+
 
 class GenreTitle(models.Model):
     title = models.ForeignKey(
@@ -123,6 +272,104 @@ class GenreTitle(models.Model):
         return f'{self.title}, жанр - {self.genre}'
 
 
+class ReviewQuerySet(models.QuerySet):
+
+    def upsert(self, title, author_id, **data):
+        """Создаёт отзыв автора с id author_id на произведение или
+        заменяет поля data у существующего. Возвращает (отзыв, создан ли
+        он).
+        Новый отзыв записывается INSERT ... ON CONFLICT DO NOTHING, у
+        существующего прежняя оценка читается с блокировкой строки, и
+        агрегаты произведения обновляются в той же транзакции.
+        """
+        review = self.model(title=title, author_id=author_id, **data)
+        existing = self.select_for_update().filter(
+            title=title, author_id=author_id
+        ).values_list('pk', 'pub_date', 'score')
+        with transaction.atomic():
+            previous = existing.first()
+            created = previous is None and self._insert_row(review)
+            if not created:
+                # Отзыв мог появиться параллельно: конфликт дожидается
+                # фиксации чужой транзакции, и строка перечитывается.
+                previous = previous or existing.get()
+                review.pk, review.pub_date, score = previous
+                self.filter(pk=review.pk).update(**data)
+                Title.objects.change_score(
+                    title.pk, added=review.score, removed=score
+                )
+            else:
+                Title.objects.change_score(title.pk, added=review.score)
+        # Получатели post_save (штампы версий) - как при save().
+        post_save.send(
+            sender=self.model, instance=review, created=created,
+            update_fields=None, raw=False, using=self.db,
+        )
+        return review, created
+
+    def rebuild_comment_counts(self):
+        """Пересчитывает количество комментариев к отзывам с нуля.
+        На PostgreSQL таблица комментариев блокируется от записи на время
+        пересчёта.
+        """
+        comments = Comment.objects.filter(
+            review=OuterRef('pk')
+        ).order_by().values('review')
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f'LOCK TABLE {Comment._meta.db_table} '
+                        'IN SHARE MODE'
+                    )
+            return self.update(comments_count=Coalesce(Subquery(
+                comments.annotate(total=Count('pk')).values('total')
+            ), 0))
+
+    def _insert_row(self, review):
+        """Записывает новый отзыв, если у автора его ещё нет.
+        Возвращает, записан ли он.
+        """
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            try:
+                with transaction.atomic():
+                    self.bulk_create([review])
+            except IntegrityError:
+                return False
+            if review.pk is None:
+                review.pk = self.filter(
+                    title_id=review.title_id, author_id=review.author_id
+                ).values_list('pk', flat=True).get()
+            return True
+        opts = self.model._meta
+        quote = connection.ops.quote_name
+        fields = [field for field in opts.concrete_fields
+                  if not field.primary_key]
+        values = [
+            field.get_db_prep_save(field.pre_save(review, True), connection)
+            for field in fields
+        ]
+        sql = (
+            f'INSERT INTO {quote(opts.db_table)} '
+            f'({", ".join(quote(field.column) for field in fields)}) '
+            f'VALUES ({", ".join(["%s"] * len(fields))}) '
+            'ON CONFLICT (author_id, title_id) DO NOTHING'
+        )
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(sql + ' RETURNING id', values)
+                row = cursor.fetchone()
+                if row is None:
+                    return False
+                review.pk = row[0]
+                return True
+            cursor.execute(sql, values)
+            if cursor.rowcount != 1:
+                return False
+            review.pk = cursor.lastrowid
+            return True
+
+
 class Review(models.Model):
     """Модель Review, в которой хранятся данные об отзыве.
     Содержит поля:
@@ -131,7 +378,8 @@ class Review(models.Model):
     - author - ссылка на автора отзыва,
     - score - из пользовательских оценок формируется усреднённая
               оценка произведения,
-    - pub_date - дата и время публикации комментария
+    - pub_date - дата и время публикации комментария,
+    - comments_count - количество комментариев к отзыву
     """
     title = models.ForeignKey(Title,
                               on_delete=models.CASCADE,
@@ -156,6 +404,12 @@ class Review(models.Model):
     pub_date = models.DateTimeField(auto_now_add=True,
                                     db_index=True,
                                     verbose_name='Опубликован')
+    comments_count = models.PositiveIntegerField(
+        verbose_name='Количество комментариев',
+        default=0
+    )
+
+    objects = ReviewQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
@@ -168,12 +422,41 @@ class Review(models.Model):
                 name='unique_author_title'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'pub_date'],
+                name='review_author_pub_date_idx'
+            )
+        ]
 
     def __str__(self):
         """Метод __str__ возвращает текст отзыва
         """
         return self.text
 
+    def save(self, *args, **kwargs):
+        """Сохраняет отзыв и в той же транзакции обновляет сумму и
+        количество оценок произведения. Прежние значения читаются с
+        блокировкой строки, чтобы параллельные правки одного отзыва
+        не искажали агрегаты.
+        """
+        with transaction.atomic():
+            previous = None
+            if self.pk is not None:
+                previous = Review.objects.select_for_update().filter(
+                    pk=self.pk
+                ).values_list('title_id', 'score').first()
+            super().save(*args, **kwargs)
+            if previous is None:
+                Title.objects.change_score(self.title_id, added=self.score)
+            elif previous[0] == self.title_id:
+                Title.objects.change_score(
+                    self.title_id, added=self.score, removed=previous[1]
+                )
+            else:
+                Title.objects.change_score(previous[0], removed=previous[1])
+                Title.objects.change_score(self.title_id, added=self.score)
+
 
 class Comment(models.Model):
     """Модель Comment, в которой хранятся данные о комментариях.
@@ -203,6 +486,24 @@ class Comment(models.Model):
         ordering = ('-pub_date',)
         verbose_name = "Комментарий"
         verbose_name_plural = "Комментарии"
+        indexes = [
+            models.Index(
+                fields=['author', 'pub_date'],
+                name='comment_author_pub_date_idx'
+            )
+        ]
 
     def __str__(self):
         return self.text
+
+    def save(self, *args, **kwargs):
+        """Сохраняет комментарий и в той же транзакции увеличивает
+        счётчик комментариев отзыва.
+        """
+        with transaction.atomic():
+            adding = self._state.adding
+            super().save(*args, **kwargs)
+            if adding:
+                Review.objects.filter(pk=self.review_id).update(
+                    comments_count=F('comments_count') + 1
+                )
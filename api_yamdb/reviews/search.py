@@ -0,0 +1,119 @@
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import F, FloatField, Func, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Title
+
+TITLE_FTS_TABLE = 'reviews_title_fts'
+
+# Триггеры, которые держат таблицу FTS5 в согласии с reviews_title.
+SQLITE_TRIGGERS = {
+    'reviews_title_fts_insert': f"""
+    CREATE TRIGGER IF NOT EXISTS reviews_title_fts_insert
+    AFTER INSERT ON reviews_title
+    BEGIN
+        INSERT INTO {TITLE_FTS_TABLE}(rowid, name) VALUES (new.id, new.name);
+    END""",
+    'reviews_title_fts_delete': f"""
+    CREATE TRIGGER IF NOT EXISTS reviews_title_fts_delete
+    AFTER DELETE ON reviews_title
+    BEGIN
+        INSERT INTO {TITLE_FTS_TABLE}({TITLE_FTS_TABLE}, rowid, name)
+        VALUES ('delete', old.id, old.name);
+    END""",
+    'reviews_title_fts_update': f"""
+    CREATE TRIGGER IF NOT EXISTS reviews_title_fts_update
+    AFTER UPDATE OF name ON reviews_title
+    BEGIN
+        INSERT INTO {TITLE_FTS_TABLE}({TITLE_FTS_TABLE}, rowid, name)
+        VALUES ('delete', old.id, old.name);
+        INSERT INTO {TITLE_FTS_TABLE}(rowid, name) VALUES (new.id, new.name);
+    END""",
+}
+
+
+def ensure_sqlite_triggers(using=DEFAULT_DB_ALIAS, **kwargs):
+    """Восстанавливает после миграций потерянные триггеры FTS5 и
+    перестраивает индекс. SQLite меняет столбцы, пересоздавая таблицу
+    reviews_title, и удаляет её триггеры, поэтому миграциям, которые
+    меняют таблицу, не нужно заботиться об индексе.
+    """
+    db = connections[using]
+    if db.vendor != 'sqlite':
+        return
+    table = Title._meta.db_table
+    with db.cursor() as cursor:
+        if TITLE_FTS_TABLE not in db.introspection.table_names(cursor):
+            return
+        cursor.execute(
+            "SELECT name FROM sqlite_master "
+            "WHERE type = 'trigger' AND tbl_name = %s",
+            [table],
+        )
+        existing = {name for name, in cursor.fetchall()}
+        missing = [name for name in SQLITE_TRIGGERS if name not in existing]
+        if not missing:
+            return
+        for name in missing:
+            cursor.execute(SQLITE_TRIGGERS[name])
+        # Изменения без триггеров в индекс не попали.
+        cursor.execute(
+            f"INSERT INTO {TITLE_FTS_TABLE}({TITLE_FTS_TABLE}) "
+            "VALUES ('rebuild')"
+        )
+
+
+def _sqlite_match(query):
+    """Строка запроса FTS5: каждое слово ищется как префикс."""
+    words = re.findall(r'\w+', query.lower())
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def _like_pattern(query):
+    """Шаблон ILIKE для подстроки: % и _ из запроса ищутся как есть."""
+    escaped = (
+        query.replace('\\', '\\\\').replace('%', '\\%')
+        .replace('_', '\\_')
+    )
+    return f'%{escaped}%'
+
+
+def search_titles(queryset, query):
+    """Отбирает произведения по названию через индекс и добавляет
+    аннотацию rank (чем больше, тем релевантнее).
+    PostgreSQL использует триграммный GIN-индекс, SQLite - таблицу FTS5.
+    Остальные СУБД получают обычный поиск по подстроке.
+    Условие задаётся через extra(): pk__in=RawSQL(...) в Django 2.2
+    заключает подзапрос в двойные скобки и превращает его в скалярный.
+    """
+    table = Title._meta.db_table
+    if connection.vendor == 'postgresql':
+        return queryset.extra(
+            where=[f'({table}.name ILIKE %s OR %s <%% {table}.name)'],
+            params=[_like_pattern(query), query],
+        ).annotate(rank=Func(
+            Value(query), F('name'),
+            function='WORD_SIMILARITY', output_field=FloatField()
+        ))
+    if connection.vendor == 'sqlite':
+        match = _sqlite_match(query)
+        if not match:
+            return queryset.none().annotate(
+                rank=Value(0.0, output_field=FloatField())
+            )
+        return queryset.extra(
+            where=[
+                f'{table}.id IN (SELECT rowid FROM {TITLE_FTS_TABLE} '
+                f'WHERE {TITLE_FTS_TABLE} MATCH %s)'
+            ],
+            params=[match],
+        ).annotate(rank=RawSQL(
+            f'SELECT -bm25({TITLE_FTS_TABLE}) FROM {TITLE_FTS_TABLE} '
+            f'WHERE {TITLE_FTS_TABLE} MATCH %s AND rowid = {table}.id',
+            [match], output_field=FloatField()
+        ))
+    return queryset.filter(name__icontains=query).annotate(
+        rank=Value(0.0, output_field=FloatField())
+    )
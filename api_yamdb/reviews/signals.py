@@ -0,0 +1,189 @@
+import threading
+
+from django.core.signals import request_started
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core import versions
+from .models import Category, Comment, Genre, GenreTitle, Review, Title
+
+
+def bump_on_commit(*scopes):
+    """Меняет штампы версий после фиксации транзакции, чтобы в кэш
+    не попал ответ, построенный по ещё не зафиксированным данным.
+    """
+    transaction.on_commit(lambda: versions.bump(*scopes))
+
+
+@receiver(pre_delete, sender=Review)
+def lock_review_score(sender, instance, **kwargs):
+    """Перечитывает удаляемый отзыв с блокировкой строки: вычитать
+    нужно оценку из базы, а не из, возможно, устаревшего экземпляра.
+    None - отзыва уже нет, вычитать нечего.
+    """
+    instance._deleted_score = Review.objects.select_for_update().filter(
+        pk=instance.pk
+    ).values_list('title_id', 'score').first()
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_score(sender, instance, **kwargs):
+    """Вычитает оценку удалённого отзыва из агрегатов произведения.
+    Срабатывает и при каскадном удалении отзывов.
+    """
+    deleted = getattr(instance, '_deleted_score', None)
+    if deleted is not None:
+        title_id, score = deleted
+        Title.objects.change_score(title_id, removed=score)
+
+
+# id отзывов, которые удаляются в текущем потоке. Их комментарии
+# удаляются каскадно (раньше или позже самого отзыва), и счётчики для
+# них не обновляются. Отметки снимаются после фиксации транзакции.
+_local = threading.local()
+
+
+def deleting_reviews():
+    if not hasattr(_local, 'reviews'):
+        _local.reviews = set()
+    return _local.reviews
+
+
+@receiver(request_started)
+def forget_deleting_reviews(**kwargs):
+    """Отметки удаления, отменённого откатом, не переживают запрос."""
+    _local.reviews = set()
+
+
+@receiver(pre_delete, sender=Review)
+def mark_review_deleting(sender, instance, **kwargs):
+    reviews = deleting_reviews()
+    reviews.add(instance.pk)
+    transaction.on_commit(lambda: reviews.discard(instance.pk))
+
+
+@receiver(pre_delete, sender=Comment)
+def lock_comment(sender, instance, **kwargs):
+    """Перечитывает удаляемый комментарий с блокировкой строки, как
+    lock_review_score: None - комментария уже нет.
+    """
+    if instance.review_id in deleting_reviews():
+        return
+    comments = Comment.objects.select_for_update().filter(pk=instance.pk)
+    instance._deleted_review_id = comments.values_list(
+        'review_id', flat=True
+    ).first()
+
+
+@receiver(post_delete, sender=Comment)
+def remove_comment_count(sender, instance, **kwargs):
+    """Уменьшает счётчик комментариев отзыва, если комментарий был в
+    базе, а сам отзыв не удаляется.
+    """
+    review_id = getattr(instance, '_deleted_review_id', None)
+    if review_id is None or review_id in deleting_reviews():
+        return
+    Review.objects.filter(pk=review_id).update(
+        comments_count=F('comments_count') - 1
+    )
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    bump_on_commit('categories', 'titles')
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def genre_changed(sender, instance, **kwargs):
+    bump_on_commit('genres', 'titles')
+
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def touch_category_titles(sender, instance, created=False, **kwargs):
+    """Категория произведений переименована или удаляется: выгрузка
+    с updated_since должна отдать эти произведения заново.
+    """
+    if not created:
+        Title.objects.filter(category=instance).update(
+            updated=timezone.now()
+        )
+
+
+@receiver(post_save, sender=Genre)
+@receiver(pre_delete, sender=Genre)
+def touch_genre_titles(sender, instance, created=False, **kwargs):
+    """То же для жанра."""
+    if not created:
+        Title.objects.filter(genre=instance).update(updated=timezone.now())
+
+
+@receiver(post_save, sender=Title)
+@receiver(post_delete, sender=Title)
+def title_changed(sender, instance, signal, **kwargs):
+    scopes = ['titles', f'title:{instance.pk}']
+    if signal is post_delete:
+        # Список отзывов удалённого произведения, даже пустой, должен
+        # отвечать 404, а не ответом из кэша.
+        scopes.append(f'reviews:{instance.pk}')
+    bump_on_commit(*scopes)
+
+
+@receiver(post_save, sender=GenreTitle)
+@receiver(post_delete, sender=GenreTitle)
+def genre_title_changed(sender, instance, **kwargs):
+    bump_on_commit('titles', f'title:{instance.title_id}')
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def title_genres_changed(sender, instance, action, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    title_ids = [instance.pk] if isinstance(instance, Title) else pk_set
+    Title.objects.filter(pk__in=title_ids or ()).update(
+        updated=timezone.now()
+    )
+    bump_on_commit('titles', *(f'title:{pk}' for pk in title_ids or ()))
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def review_changed(sender, instance, signal, **kwargs):
+    scopes = [
+        'titles',
+        f'title:{instance.title_id}',
+        f'reviews:{instance.title_id}',
+        f'review:{instance.pk}',
+    ]
+    if signal is post_delete:
+        scopes.append(f'comments:{instance.pk}')
+    bump_on_commit(*scopes)
+
+
+def comment_title_id(comment):
+    if Comment.review.is_cached(comment):
+        return comment.review.title_id
+    return Review.objects.filter(pk=comment.review_id).values_list(
+        'title_id', flat=True
+    ).first()
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    scopes = [f'comments:{instance.review_id}', f'comment:{instance.pk}']
+    if (kwargs.get('created', True)
+            and instance.review_id not in deleting_reviews()):
+        # Изменился счётчик комментариев в представлении отзыва.
+        scopes.append(f'review:{instance.review_id}')
+        title_id = comment_title_id(instance)
+        if title_id is not None:
+            scopes.append(f'reviews:{title_id}')
+    bump_on_commit(*scopes)
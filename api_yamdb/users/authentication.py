@@ -0,0 +1,55 @@
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+
+from . import tokens
+from .models import User
+
+VERSION_CLAIM = 'ver'
+ROLE_CLAIM = 'role'
+
+
+def add_user_claims(token, user):
+    """Добавляет в токен данные пользователя для проверки прав."""
+    token[ROLE_CLAIM] = user.role
+    token['is_superuser'] = user.is_superuser
+    token[VERSION_CLAIM] = user.token_version
+    tokens.warm(user.pk, tokens.user_version(user))
+    return token
+
+
+class ClaimsUser(TokenUser):
+    """Пользователь, восстановленный из утверждений токена без запроса
+    к базе. Для записей связей используется id (request.user.pk).
+    """
+
+    @cached_property
+    def role(self):
+        return self.token[ROLE_CLAIM]
+
+    @property
+    def is_admin(self):
+        return self.role == User.ADMIN_ROLE
+
+    @property
+    def is_moderator(self):
+        return self.role == User.MODERATOR_ROLE
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWT-аутентификация по утверждениям токена: пользователь не
+    читается из базы, а версия токена сверяется с текущей версией
+    токенов пользователя (см. users.tokens). Токены без версии,
+    выданные до её появления, проверяются по базе, как раньше.
+    """
+
+    def get_user(self, validated_token):
+        if VERSION_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+        user = ClaimsUser(validated_token)
+        if not tokens.is_current(user.id, validated_token[VERSION_CLAIM]):
+            raise AuthenticationFailed(
+                'Токен отозван, получите новый.', code='token_revoked'
+            )
+        return user
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from . import tokens
+
 
 class User(AbstractUser):
     """Данные о пользователе и список всех ролей.
@@ -21,6 +23,39 @@ class User(AbstractUser):
     role = models.CharField(
         'Роль', max_length=50, choices=ROLES, default='user'
     )
+    token_version = models.PositiveIntegerField(
+        'Версия токенов', default=0, editable=False
+    )
+    # Поля, которые входят в токен или решают, принимать ли его.
+    TOKEN_FIELDS = ('role', 'is_superuser', 'is_active')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        if all(name in loaded for name in cls.TOKEN_FIELDS):
+            user._token_fields = user.get_token_fields()
+        return user
+
+    def get_token_fields(self):
+        return tuple(getattr(self, name) for name in self.TOKEN_FIELDS)
+
+    def save(self, *args, **kwargs):
+        """Изменение полей токена отзывает выданные токены: версия
+        токенов увеличивается и публикуется после фиксации транзакции.
+        """
+        loaded = getattr(self, '_token_fields', None)
+        changed = loaded is not None and loaded != self.get_token_fields()
+        if changed:
+            self.token_version += 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {
+                    *kwargs['update_fields'], 'token_version'
+                }
+        super().save(*args, **kwargs)
+        self._token_fields = self.get_token_fields()
+        if changed:
+            tokens.publish_on_commit(self.pk, tokens.user_version(self))
 
     @property
     def is_admin(self):
@@ -1,9 +1,10 @@
 from rest_framework import serializers
 
+from core.timing import TimedSerializerMixin
 from reviews.models import User
 
 
-class UserRoleSerializer(serializers.ModelSerializer):
+class UserRoleSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор ролей пользователей."""
     class Meta:
         model = User
@@ -13,7 +14,7 @@ class UserRoleSerializer(serializers.ModelSerializer):
         read_only_fields = ('role',)
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор пользователей."""
     email = serializers.EmailField(required=True)
     username = serializers.CharField(required=True)
@@ -40,7 +41,7 @@ class UserSerializer(serializers.ModelSerializer):
         return value
 
 
-class CredentialsSerializer(serializers.ModelSerializer):
+class CredentialsSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор учетных данных."""
     email = serializers.EmailField(required=True)
 
@@ -66,7 +67,7 @@ class CredentialsSerializer(serializers.ModelSerializer):
         return value
 
 
-class RegisterSerializer(serializers.ModelSerializer):
+class RegisterSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор регистрации пользователей."""
     email = serializers.EmailField()
 
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from . import tokens
+from .models import User
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    """Токены удалённого пользователя больше не принимаются."""
+    tokens.publish_on_commit(instance.pk, tokens.REVOKED)
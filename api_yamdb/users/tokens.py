@@ -0,0 +1,105 @@
+"""Версии токенов пользователей.
+
+В токены, выданные CustomTokenObtainPairSerializer, входят id и роль
+пользователя и номер версии его токенов (User.token_version). Смена
+роли, прав суперпользователя или блокировка увеличивают версию, и
+выданные раньше токены, как и токены удалённых пользователей,
+перестают приниматься.
+Текущие версии хранятся в общем для воркеров кэше
+settings.VERSIONS_CACHE_ALIAS, а устаревшие версии запоминаются в
+небольшом LRU процесса: отозванный токен отклоняется без обращения к
+кэшу и базе.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+KEY_PREFIX = 'token-version:'
+# Версия удалённого или заблокированного пользователя.
+REVOKED = -1
+
+_latest = OrderedDict()
+_lock = threading.Lock()
+
+
+def _cache():
+    return caches[settings.VERSIONS_CACHE_ALIAS]
+
+
+def _remember(user_id, version):
+    """Запоминает самую новую известную версию токенов пользователя."""
+    with _lock:
+        if version > _latest.get(user_id, version - 1):
+            _latest[user_id] = version
+        _latest.move_to_end(user_id)
+        while len(_latest) > settings.TOKEN_VERSIONS_LRU_SIZE:
+            _latest.popitem(last=False)
+
+
+def _is_outdated(user_id, version):
+    with _lock:
+        return version < _latest.get(user_id, version)
+
+
+def clear():
+    """Забывает известные процессу версии."""
+    with _lock:
+        _latest.clear()
+
+
+def user_version(user):
+    return user.token_version if user.is_active else REVOKED
+
+
+def publish(user_id, version):
+    """Записывает текущую версию токенов пользователя в общий кэш."""
+    _cache().set(f'{KEY_PREFIX}{user_id}', version, timeout=None)
+    if version != REVOKED:
+        _remember(user_id, version)
+
+
+def warm(user_id, version):
+    """Кэширует версию при выдаче токена, только если её ещё нет:
+    пользователь мог быть прочитан до смены версии, и уже записанную
+    версию перезаписывать нельзя.
+    """
+    _cache().add(f'{KEY_PREFIX}{user_id}', version, timeout=None)
+
+
+def publish_on_commit(user_id, version):
+    """Публикует версию после фиксации транзакции: до неё в базе ещё
+    прежние роль и версия.
+    """
+    transaction.on_commit(lambda: publish(user_id, version))
+
+
+def current_version(user_id):
+    """Текущая версия токенов пользователя. Если её нет в кэше (кэш
+    сброшен), версия читается из основной базы и кэшируется.
+    """
+    cache = _cache()
+    key = f'{KEY_PREFIX}{user_id}'
+    version = cache.get(key)
+    if version is None:
+        # С основной базы: реплика может ещё не знать о смене версии.
+        version = get_user_model().objects.using(DEFAULT_DB_ALIAS).filter(
+            pk=user_id, is_active=True
+        ).values_list('token_version', flat=True).first()
+        if version is None:
+            version = REVOKED
+        cache.add(key, version, timeout=None)
+    return version
+
+
+def is_current(user_id, version):
+    """Принимается ли токен пользователя с версией version."""
+    if _is_outdated(user_id, version):
+        return False
+    current = current_version(user_id)
+    if current != REVOKED:
+        _remember(user_id, current)
+    return current == version
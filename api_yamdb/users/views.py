@@ -1,12 +1,16 @@
 import uuid
 
 from django.conf import settings
-from django.core.mail import send_mail
+from django.db import transaction
 from rest_framework import filters, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 
+from api.activity import ActivityPagination
+from api.serializers import ActivitySerializer
+from core import mail
+from core.throttling import IPThrottle, UsernameThrottle
 from reviews.models import User
 from .permissions import IsAdministratorRole
 from .serializers import (
@@ -33,23 +37,50 @@ class UsersViewSet(viewsets.ModelViewSet):
         """Обработка эндпоинта users/me. Запрос и возможность
         редактирования информации профиля пользователя.
         """
-        user = User.objects.get(username=request.user)
+        user = User.objects.get(pk=request.user.pk)
         serializer = UserRoleSerializer(user, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def activity_response(self, user_id, request):
+        paginator = ActivityPagination()
+        page = paginator.paginate(user_id, request)
+        return paginator.get_paginated_response(
+            ActivitySerializer(page, many=True).data
+        )
+
+    @action(
+        detail=False, url_path='me/activity',
+        permission_classes=[IsAuthenticated]
+    )
+    def me_activity(self, request):
+        """Отзывы и комментарии текущего пользователя, от новых к старым,
+        с пагинацией по курсору (ссылка next).
+        """
+        return self.activity_response(request.user.pk, request)
+
+    @action(detail=True)
+    def activity(self, request, username=None):
+        """Лента активности пользователя для администратора."""
+        return self.activity_response(self.get_object().pk, request)
+
 
 class RegisterUserViewSet(viewsets.ModelViewSet):
     """Обработка принимает на вход параметры POST запросом:
     email и username, генерирует verification_code,
     создает пользователя и отправляет
     код по указанной в параметре почте.
+    Письмо ставится в очередь в одной транзакции с пользователем и
+    отправляется в фоне: ответ не ждёт почтового сервера.
+    Частота запросов ограничена по IP и по username до работы с базой.
     """
     queryset = User.objects.all()
     serializer_class = CredentialsSerializer
     permission_classes = (AllowAny,)
+    throttle_classes = (IPThrottle, UsernameThrottle)
+    throttle_scope = 'signup'
 
     def create(self, request):
         data = {}
@@ -57,14 +88,12 @@ class RegisterUserViewSet(viewsets.ModelViewSet):
         if serializer.is_valid():
             confirmation_code = uuid.uuid4()
             data['confirmation_code'] = str(confirmation_code)
-            serializer.save(confirmation_code=confirmation_code)
             mail_text = f'Код подтверждения {confirmation_code}'
             mail_theme = 'Код подтверждения'
             mail_from = settings.MAIL_FROM
-            mail_to = serializer.data['email']
-            send_mail(
-                mail_theme, mail_text, mail_from, [mail_to],
-                fail_silently=False
-            )
+            with transaction.atomic():
+                serializer.save(confirmation_code=confirmation_code)
+                mail_to = serializer.data['email']
+                mail.enqueue(mail_theme, mail_text, mail_from, [mail_to])
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -1,9 +1,57 @@
 import sys
 from os.path import abspath, dirname, join
 
+import pytest
+
 root_dir = dirname(dirname(abspath(__file__)))
 sys.path.append(root_dir)
 infra_dir_path = join(root_dir, 'infra')
 
 pytest_plugins = [
 ]
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Кэш ответов, штампы версий и состояние потока не должны
+    переживать тест.
+    """
+    from django.conf import settings
+    from django.core.cache import caches
+
+    from core import throttling
+    from reviews import signals
+    from users import tokens
+
+    for alias in settings.CACHES:
+        caches[alias].clear()
+    tokens.clear()
+    throttling.reset()
+    signals.forget_deleting_reviews()
+
+
+@pytest.fixture
+def author_client():
+    """Функция, которая возвращает клиент API с токеном пользователя."""
+    from rest_framework.test import APIClient
+
+    from api.serializers import CustomTokenObtainPairSerializer
+
+    def make_client(user):
+        token = CustomTokenObtainPairSerializer.get_token(user).access_token
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return client
+
+    return make_client
+
+
+@pytest.fixture
+def admin_client(author_client):
+    """Клиент API с токеном администратора."""
+    from users.models import User
+
+    admin = User.objects.create(
+        username='admin', email='admin@yamdb.fake', role=User.ADMIN_ROLE
+    )
+    return author_client(admin)
@@ -0,0 +1,105 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from reviews.models import Comment, Review, Title
+from users.models import User
+
+URL = '/api/v1/users/me/activity/'
+
+
+@pytest.fixture
+def author():
+    return User.objects.create(username='author', email='a@yamdb.fake')
+
+
+@pytest.fixture
+def activity(author):
+    """Отзывы и комментарии с заданным временем публикации, два из них
+    опубликованы одновременно.
+    """
+    now = timezone.now()
+    titles = [
+        Title.objects.create(name=f'Произведение {number}', year=2000)
+        for number in range(3)
+    ]
+    reviews = [
+        Review.objects.create(title=title, author=author, text='Отзыв',
+                              score=5)
+        for title in titles
+    ]
+    comments = [
+        Comment.objects.create(review=reviews[0], author=author,
+                               text='Комментарий')
+        for _ in range(2)
+    ]
+    moments = {
+        reviews[0]: now - timedelta(minutes=5),
+        comments[0]: now - timedelta(minutes=4),
+        reviews[1]: now - timedelta(minutes=3),
+        comments[1]: now - timedelta(minutes=3),
+        reviews[2]: now - timedelta(minutes=1),
+    }
+    for item, moment in moments.items():
+        type(item).objects.filter(pk=item.pk).update(pub_date=moment)
+    return [
+        ('review', reviews[2].pk), ('review', reviews[1].pk),
+        ('comment', comments[1].pk), ('comment', comments[0].pk),
+        ('review', reviews[0].pk),
+    ]
+
+
+def read_feed(client, page_size, settings):
+    settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK,
+                               'PAGE_SIZE': page_size}
+    items, url = [], URL
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        assert len(response.data['results']) <= page_size
+        items += response.data['results']
+        url = response.data['next']
+    return items
+
+
+@pytest.mark.django_db
+class TestActivity:
+
+    def test_merged_order(self, author, activity, author_client):
+        response = author_client(author).get(URL)
+        assert response.status_code == 200
+        results = response.data['results']
+        assert [(item['type'], item['id']) for item in results] == activity, (
+            'Проверьте, что отзывы и комментарии сливаются от новых к '
+            'старым, а при одинаковом времени отзыв идёт раньше'
+        )
+        review, comment = results[0], results[2]
+        assert set(review) == {
+            'type', 'id', 'title', 'text', 'score', 'pub_date'
+        }
+        assert set(comment) == {
+            'type', 'id', 'title', 'review', 'text', 'pub_date'
+        }, 'Проверьте, что у комментария есть отзыв, но нет оценки'
+        assert isinstance(review['pub_date'], str)
+
+    @pytest.mark.parametrize('page_size', [1, 2, 3])
+    def test_cursor(self, author, activity, settings, page_size,
+                    author_client):
+        items = read_feed(author_client(author), page_size, settings)
+        assert [(item['type'], item['id']) for item in items] == activity, (
+            'Проверьте, что курсор продолжает ленту без пропусков и '
+            'повторов, в том числе на элементах с одинаковым временем'
+        )
+
+    def test_invalid_cursor(self, author, activity, author_client):
+        response = author_client(author).get(URL, {'cursor': 'мусор'})
+        assert response.status_code == 404
+
+    def test_other_user(self, author, activity, author_client):
+        other = User.objects.create(username='other', email='o@yamdb.fake')
+        response = author_client(other).get(URL)
+        assert response.data['results'] == []
+        assert author_client(other).get(
+            f'/api/v1/users/{author.username}/activity/'
+        ).status_code == 403
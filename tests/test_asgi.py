@@ -0,0 +1,157 @@
+import asyncio
+import threading
+
+from core.asgi import ASGIHandler, build_environ, is_read_route
+
+
+def http_scope(method='GET', path='/api/v1/titles/', headers=()):
+    return {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': method,
+        'path': path,
+        'query_string': b'',
+        'headers': list(headers),
+    }
+
+
+def serve(handler, scope, messages):
+    """Выполняет запрос и возвращает отправленные клиенту сообщения."""
+    sent = []
+    messages = list(messages)
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(handler(scope, receive, send))
+    return sent
+
+
+def request(body=b''):
+    return [{'type': 'http.request', 'body': body}]
+
+
+class RecordingApp:
+    """WSGI-приложение, которое запоминает окружение и поток."""
+
+    def __init__(self, chunks=(b'ok',), streaming=False):
+        self.chunks = chunks
+        self.streaming = streaming
+        self.calls = []
+        self.closed = False
+
+    def __call__(self, environ, start_response):
+        self.calls.append(
+            (environ, threading.current_thread().name,
+             environ['wsgi.input'].read())
+        )
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        app = self
+
+        class Result:
+            streaming = self.streaming
+
+            def __iter__(self):
+                return iter(app.chunks)
+
+            def close(self):
+                app.closed = True
+
+        return Result()
+
+
+class TestBuildEnviron:
+
+    def test_environ(self):
+        scope = dict(
+            http_scope('POST', '/api/v1/тест/', headers=[
+                (b'content-type', b'application/json'),
+                (b'content-length', b'2'),
+                (b'accept', b'text/html'),
+                (b'accept', b'application/json'),
+            ]),
+            query_string=b'page=2', client=('10.0.0.1', 5000),
+            server=('yamdb.fake', 8000), scheme='https',
+        )
+        environ = build_environ(scope, b'{}')
+        assert environ['REQUEST_METHOD'] == 'POST'
+        assert environ['PATH_INFO'].encode('latin-1').decode() == (
+            '/api/v1/тест/'
+        ), 'Проверьте, что путь передаётся в WSGI в кодировке latin-1'
+        assert environ['QUERY_STRING'] == 'page=2'
+        assert environ['CONTENT_TYPE'] == 'application/json'
+        assert environ['CONTENT_LENGTH'] == '2'
+        assert environ['HTTP_ACCEPT'] == 'text/html,application/json', (
+            'Проверьте, что повторённые заголовки объединяются'
+        )
+        assert (environ['REMOTE_ADDR'], environ['REMOTE_PORT']) == (
+            '10.0.0.1', '5000'
+        )
+        assert (environ['SERVER_NAME'], environ['SERVER_PORT']) == (
+            'yamdb.fake', '8000'
+        )
+        assert environ['wsgi.url_scheme'] == 'https'
+        assert environ['wsgi.input'].read() == b'{}'
+
+    def test_read_routes(self):
+        assert is_read_route('GET', '/api/v1/titles/')
+        assert is_read_route('HEAD', '/api/v1/titles/1/')
+        assert is_read_route('GET', '/api/v1/titles/1/reviews/2/comments/')
+        assert not is_read_route('POST', '/api/v1/titles/')
+        assert not is_read_route('GET', '/api/v1/users/')
+        assert not is_read_route('GET', '/no/such/path/')
+
+
+class TestASGIHandler:
+
+    def test_pools(self):
+        app = RecordingApp()
+        handler = ASGIHandler(app, read_threads=1, threads=1)
+        serve(handler, http_scope(), request())
+        serve(handler, http_scope('POST'), request(b'{}'))
+        threads = [thread for _, thread, _ in app.calls]
+        assert threads[0].startswith('asgi-read')
+        assert not threads[1].startswith('asgi-read'), (
+            'Проверьте, что записи выполняются в отдельном пуле потоков'
+        )
+
+    def test_response(self):
+        app = RecordingApp(chunks=(b'o', b'k'))
+        sent = serve(ASGIHandler(app), http_scope('POST'), [
+            {'type': 'http.request', 'body': b'a', 'more_body': True},
+            {'type': 'http.request', 'body': b'b'},
+        ])
+        assert app.calls[0][2] == b'ab'
+        assert sent == [
+            {'type': 'http.response.start', 'status': 200,
+             'headers': [(b'content-type', b'text/plain')]},
+            {'type': 'http.response.body', 'body': b'ok'},
+        ]
+        assert app.closed
+
+    def test_streaming(self):
+        app = RecordingApp(chunks=(b'first', b'', b'second'), streaming=True)
+        sent = serve(ASGIHandler(app), http_scope(), request())
+        assert sent[0]['type'] == 'http.response.start'
+        assert [message.get('body') for message in sent[1:]] == [
+            b'first', b'second', b''
+        ], 'Проверьте, что потоковый ответ отправляется по частям'
+        assert [message.get('more_body') for message in sent[1:]] == [
+            True, True, None
+        ]
+        assert app.closed
+
+    def test_disconnect(self):
+        app = RecordingApp()
+        sent = serve(ASGIHandler(app), http_scope('POST'), [
+            {'type': 'http.request', 'body': b'{"na', 'more_body': True},
+            {'type': 'http.disconnect'},
+        ])
+        assert not app.calls, (
+            'Проверьте, что запрос с недочитанным телом не выполняется, '
+            'если клиент отключился'
+        )
+        assert sent == []
@@ -0,0 +1,85 @@
+import pytest
+from rest_framework.test import APIClient
+
+from api.serializers import CustomTokenObtainPairSerializer
+from users import tokens
+from users.models import User
+
+
+@pytest.fixture
+def user():
+    return User.objects.create(
+        username='reader', email='reader@yamdb.fake',
+        confirmation_code='code'
+    )
+
+
+@pytest.fixture
+def admin():
+    return User.objects.create(
+        username='boss', email='boss@yamdb.fake', role=User.ADMIN_ROLE,
+        confirmation_code='code'
+    )
+
+
+def token_client(user):
+    response = APIClient().post(
+        '/api/v1/auth/token/',
+        {'username': user.username, 'confirmation_code': 'code'}
+    )
+    assert response.status_code == 200
+    assert 'token' in response.data, (
+        'Проверьте, что эндпоинт auth/token/ возвращает token'
+    )
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["token"]}')
+    return client
+
+
+@pytest.mark.django_db
+class TestAuthTokens:
+
+    def test_permissions_from_token(self, admin, django_assert_num_queries):
+        client = token_client(admin)
+        # Права администратора проверяются по токену, пользователь из
+        # базы не читается: остаётся запрос страницы и подсчёт строк.
+        with django_assert_num_queries(2):
+            response = client.get('/api/v1/users/')
+        assert response.status_code == 200
+
+    def test_issue_keeps_newer_version(self, user):
+        stale = User.objects.get(pk=user.pk)
+        user.role = User.ADMIN_ROLE
+        user.save()
+        tokens.publish(user.pk, user.token_version)
+        CustomTokenObtainPairSerializer.get_token(stale)
+        assert tokens.current_version(user.pk) == user.token_version, (
+            'Проверьте, что выдача токена по устаревшему пользователю не '
+            'перезаписывает более новую версию токенов'
+        )
+
+
+# Версии токенов публикуются после фиксации транзакции.
+@pytest.mark.django_db(transaction=True)
+class TestTokenRevocation:
+
+    def test_role_change_revokes_tokens(self, user, admin):
+        user_client = token_client(user)
+        admin_client = token_client(admin)
+        assert user_client.get('/api/v1/users/').status_code == 403
+
+        response = admin_client.patch(
+            f'/api/v1/users/{user.username}/', {'role': User.ADMIN_ROLE}
+        )
+        assert response.status_code == 200
+        assert user_client.get('/api/v1/users/me/').status_code == 401, (
+            'Проверьте, что смена роли отзывает выданные токены'
+        )
+        assert token_client(user).get('/api/v1/users/').status_code == 200
+
+    def test_deleted_user_token(self, user, admin):
+        user_client = token_client(user)
+        token_client(admin).delete(f'/api/v1/users/{user.username}/')
+        assert user_client.get('/api/v1/users/me/').status_code == 401, (
+            'Проверьте, что токен удалённого пользователя не принимается'
+        )
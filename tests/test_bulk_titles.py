@@ -0,0 +1,97 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from reviews.models import Category, Genre, Title
+
+URL = '/api/v1/titles/bulk/'
+
+
+@pytest.fixture
+def catalog_data():
+    Category.objects.create(name='Фильм', slug='movie')
+    Genre.objects.create(name='Драма', slug='drama')
+
+
+def new_title(name):
+    return {'name': name, 'year': 2000, 'genre': ['drama'],
+            'category': 'movie'}
+
+
+@pytest.mark.django_db
+class TestBulkTitles:
+
+    def test_create_and_update(self, admin_client, catalog_data):
+        first = Title.objects.create(name='Первое', year=1990,
+                                     description='Описание')
+        second = Title.objects.create(name='Второе', year=1991)
+        with CaptureQueriesContext(connection) as queries:
+            response = admin_client.post(URL, [
+                new_title('Новое'),
+                {'id': first.pk, 'name': 'Первое!'},
+                {'id': second.pk, 'year': 1995, 'description': 'Новое'},
+            ], format='json')
+        assert response.status_code == 201
+        assert [item['status'] for item in response.data] == [
+            'created', 'updated', 'updated'
+        ]
+        assert Title.objects.get(name='Новое').genre.count() == 1
+        first.refresh_from_db()
+        assert (first.name, first.year, first.description) == (
+            'Первое!', 1990, 'Описание'
+        )
+        updates = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE "reviews_title"')
+        ]
+        assert len(updates) == 2, (
+            'Проверьте, что произведения изменяются группами по набору '
+            'переданных полей'
+        )
+        assert not any(
+            '"description"' in sql and '"name"' in sql for sql in updates
+        ), 'Проверьте, что элемент получает только переданные поля'
+
+    def test_atomic(self, admin_client, catalog_data):
+        response = admin_client.post(
+            URL, [new_title('Новое'), {'name': 'Без года'}], format='json'
+        )
+        assert response.status_code == 400
+        assert response.data[0]['status'] == 'valid'
+        assert response.data[1]['status'] == 'error'
+        assert not Title.objects.exists(), (
+            'Проверьте, что в режиме atomic при ошибке ничего не записывается'
+        )
+
+    def test_partial(self, admin_client, catalog_data):
+        Title.objects.create(pk=1, name='Первое', year=1990)
+        response = admin_client.post(
+            f'{URL}?mode=partial',
+            [new_title('Новое'), {'name': 'Без года'},
+             {'id': True, 'name': 'Изменено'}],
+            format='json'
+        )
+        assert response.status_code == 207
+        assert [item['status'] for item in response.data] == [
+            'created', 'error', 'error'
+        ]
+        assert 'id' in response.data[2]['errors'], (
+            'Проверьте, что true не принимается за id'
+        )
+        assert list(Title.objects.values_list('name', flat=True)) == [
+            'Новое', 'Первое'
+        ]
+
+    def test_size_limit(self, admin_client, catalog_data, settings):
+        settings.BULK_TITLES_MAX = 2
+        response = admin_client.post(
+            URL, [new_title(f'Новое {number}') for number in range(3)],
+            format='json'
+        )
+        assert response.status_code == 400
+        assert not Title.objects.exists()
+
+    def test_admin_only(self, catalog_data):
+        response = APIClient().post(URL, [new_title('Новое')], format='json')
+        assert response.status_code == 401
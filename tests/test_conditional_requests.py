@@ -0,0 +1,105 @@
+from types import SimpleNamespace
+
+import pytest
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+
+from api import mixins
+from core import versions
+from reviews.models import Review, Title
+from users.models import User
+
+
+@pytest.fixture
+def review():
+    title = Title.objects.create(name='Произведение', year=2000)
+    author = User.objects.create(username='author', email='a@yamdb.fake')
+    return Review.objects.create(
+        title=title, author=author, text='Отзыв', score=5
+    )
+
+
+def review_url(review):
+    return f'/api/v1/titles/{review.title_id}/reviews/{review.pk}/'
+
+
+def set_stamp(review, moment):
+    versions._cache().set(
+        f'{versions.KEY_PREFIX}review:{review.pk}', f'{moment}:test', None
+    )
+
+
+def set_now(monkeypatch, moment):
+    monkeypatch.setattr(mixins, 'time', SimpleNamespace(time=lambda: moment))
+
+
+@pytest.mark.django_db
+class TestConditionalRequests:
+
+    def test_if_none_match(self, review):
+        client = APIClient()
+        etag = client.get(review_url(review))['ETag']
+        response = client.get(review_url(review), HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert client.get(
+            review_url(review), HTTP_IF_NONE_MATCH='"other"'
+        ).status_code == 200
+
+    def test_if_none_match_any(self, review):
+        client = APIClient()
+        assert client.get(
+            review_url(review), HTTP_IF_NONE_MATCH='*'
+        ).status_code == 304
+        missing = f'/api/v1/titles/{review.title_id}/reviews/{review.pk + 1}/'
+        response = client.get(missing, HTTP_IF_NONE_MATCH='*')
+        assert response.status_code == 404, (
+            'Проверьте, что If-None-Match: * не даёт 304 для '
+            'несуществующего объекта'
+        )
+
+    def test_last_modified(self, review, monkeypatch):
+        client = APIClient()
+        set_stamp(review, 1000.2)
+        set_now(monkeypatch, 1000.4)
+        assert 'Last-Modified' not in client.get(review_url(review)), (
+            'Проверьте, что Last-Modified не отдаётся, пока в ту же '
+            'секунду возможны новые изменения'
+        )
+        set_now(monkeypatch, 1001.3)
+        last_modified = client.get(review_url(review))['Last-Modified']
+        assert last_modified == http_date(1001)
+        assert client.get(
+            review_url(review), HTTP_IF_MODIFIED_SINCE=last_modified
+        ).status_code == 304
+        set_stamp(review, 1001.6)
+        set_now(monkeypatch, 1001.7)
+        assert client.get(
+            review_url(review), HTTP_IF_MODIFIED_SINCE=last_modified
+        ).status_code == 200, (
+            'Проверьте, что изменение после отданного Last-Modified не '
+            'даёт ответа 304'
+        )
+
+    def test_if_match(self, review, author_client):
+        client = author_client(review.author)
+        etag = client.get(review_url(review))['ETag']
+        assert client.patch(
+            review_url(review), {'score': 7}, HTTP_IF_MATCH='"other"'
+        ).status_code == 412
+        response = client.patch(
+            review_url(review), {'score': 8}, HTTP_IF_MATCH=etag
+        )
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+        assert client.patch(
+            review_url(review), {'score': 9}, HTTP_IF_MATCH=etag
+        ).status_code == 412, (
+            'Проверьте, что повторная запись с тем же If-Match отклоняется'
+        )
+        assert client.delete(
+            review_url(review), HTTP_IF_MATCH=etag
+        ).status_code == 412
+        assert Review.objects.get(pk=review.pk).score == 8
+        assert client.delete(
+            review_url(review), HTTP_IF_MATCH=response['ETag']
+        ).status_code == 204
@@ -0,0 +1,103 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from reviews.models import Comment, Review, Title
+from users.models import User
+
+
+@pytest.fixture
+def title():
+    return Title.objects.create(name='Произведение', year=2000)
+
+
+@pytest.fixture
+def author():
+    return User.objects.create(username='author', email='a@yamdb.fake')
+
+
+def add_review(title, author, comments=0):
+    review = Review.objects.create(title=title, author=author, text='Отзыв',
+                                   score=5)
+    for _ in range(comments):
+        Comment.objects.create(review=review, author=author, text='Текст')
+    return review
+
+
+def comments_count(review):
+    return Review.objects.values_list(
+        'comments_count', flat=True
+    ).get(pk=review.pk)
+
+
+def deletion_queries(review):
+    with CaptureQueriesContext(connection) as queries:
+        review.delete()
+    return len(queries)
+
+
+@pytest.mark.django_db
+class TestCounters:
+
+    def test_comments_count(self, title, author):
+        review = add_review(title, author, comments=3)
+        assert comments_count(review) == 3
+        review.comments.first().delete()
+        assert comments_count(review) == 2
+        response = APIClient().get(
+            f'/api/v1/titles/{title.pk}/reviews/{review.pk}/'
+        )
+        assert response.data['comments_count'] == 2, (
+            'Проверьте, что счётчик комментариев уменьшается при удалении'
+        )
+
+    def test_double_delete(self, title, author):
+        review = add_review(title, author, comments=2)
+        comment = review.comments.first()
+        copy = Comment.objects.get(pk=comment.pk)
+        comment.delete()
+        copy.delete()
+        assert comments_count(review) == 1, (
+            'Проверьте, что повторное удаление комментария не уменьшает '
+            'счётчик ещё раз'
+        )
+
+    def test_comments_of_other_reviews(self, title, author):
+        other = User.objects.create(username='other', email='o@yamdb.fake')
+        review = add_review(title, author)
+        Comment.objects.create(review=review, author=other, text='Текст')
+        Comment.objects.create(review=review, author=author, text='Текст')
+        other.delete()
+        assert comments_count(review) == 1, (
+            'Проверьте, что каскадное удаление комментариев уменьшает '
+            'счётчики отзывов, которые остаются'
+        )
+
+    def test_review_cascade_is_constant(self, title, author):
+        few = deletion_queries(add_review(title, author, comments=1))
+        many = deletion_queries(add_review(title, author, comments=10))
+        assert many == few, (
+            'Проверьте, что число запросов при удалении отзыва не зависит '
+            'от числа его комментариев'
+        )
+        assert not Comment.objects.exists()
+
+    def test_reviews_count(self, title, author):
+        others = [
+            User.objects.create(username=f'user{number}',
+                                email=f'user{number}@yamdb.fake')
+            for number in range(2)
+        ]
+        reviews = [add_review(title, user, comments=2)
+                   for user in (author, *others)]
+        url = f'/api/v1/titles/{title.pk}/'
+        assert APIClient().get(url).data['reviews_count'] == 3
+        reviews[0].delete()
+        others[0].delete()
+        assert APIClient().get(
+            url, {'fresh': 1}
+        ).data['reviews_count'] == 1, (
+            'Проверьте, что количество отзывов уменьшается при удалении, '
+            'в том числе каскадном'
+        )
@@ -0,0 +1,124 @@
+import threading
+import uuid
+
+import pytest
+from django.db.utils import OperationalError
+
+from core import metrics
+from core.db.pool import get_pool
+from core.db.sqlite3.base import DatabaseWrapper
+
+
+@pytest.fixture
+def make_wrapper(tmp_path, django_db_blocker):
+    """Соединения с отдельной базой SQLite через пул нового alias."""
+    alias = f'pool-{uuid.uuid4().hex[:8]}'
+
+    def make(**pool):
+        return DatabaseWrapper({
+            'ENGINE': 'core.db.sqlite3',
+            'NAME': str(tmp_path / 'pool.sqlite3'),
+            'USER': '', 'PASSWORD': '', 'HOST': '', 'PORT': '',
+            'OPTIONS': {}, 'TEST': {}, 'TIME_ZONE': None,
+            'AUTOCOMMIT': True, 'ATOMIC_REQUESTS': False,
+            'CONN_MAX_AGE': 0, 'POOL': pool,
+        }, alias)
+
+    make.alias = alias
+    with django_db_blocker.unblock():
+        yield make
+    get_pool(alias, None).close()
+
+
+def query(wrapper):
+    with wrapper.cursor() as cursor:
+        cursor.execute('SELECT 1')
+
+
+class TestDatabasePool:
+
+    def test_connection_reused(self, make_wrapper):
+        wrapper = make_wrapper()
+        query(wrapper)
+        connection = wrapper.connection
+        wrapper.close_if_unusable_or_obsolete()
+        assert wrapper.connection is None, (
+            'Проверьте, что в конце запроса соединение возвращается в пул'
+        )
+        query(wrapper)
+        assert wrapper.connection is connection, (
+            'Проверьте, что соединение из пула используется повторно'
+        )
+        alias = make_wrapper.alias
+        assert metrics.counter_value('db_pool_creates', alias=alias) == 1
+        assert metrics.counter_value('db_pool_reuses', alias=alias) == 1
+
+    def test_broken_connection_replaced(self, make_wrapper):
+        wrapper = make_wrapper(CHECK_INTERVAL=0)
+        query(wrapper)
+        broken = wrapper.connection
+        wrapper.close()
+        broken.close()
+        query(wrapper)
+        assert wrapper.connection is not broken, (
+            'Проверьте, что соединение проверяется перед повторной выдачей'
+        )
+        assert metrics.counter_value(
+            'db_pool_discarded', alias=make_wrapper.alias, reason='invalid'
+        ) == 1
+
+    def test_idle_connections_evicted(self, make_wrapper):
+        wrapper = make_wrapper(MAX_IDLE=60)
+        query(wrapper)
+        pool = get_pool(make_wrapper.alias, None)
+        now = [0.0]
+        pool.timer = lambda: now[0]
+        wrapper.close()
+        assert len(pool.idle) == 1
+        now[0] = 61.0
+        query(wrapper)
+        assert metrics.counter_value(
+            'db_pool_discarded', alias=make_wrapper.alias, reason='idle'
+        ) == 1, 'Проверьте, что простаивающие соединения закрываются'
+        assert metrics.counter_value(
+            'db_pool_creates', alias=make_wrapper.alias
+        ) == 2
+
+    def test_limit_and_timeout(self, make_wrapper):
+        busy = make_wrapper(MAX_SIZE=1, TIMEOUT=0.05)
+        query(busy)
+        with pytest.raises(OperationalError):
+            query(make_wrapper())
+        alias = make_wrapper.alias
+        assert metrics.counter_value('db_pool_waits', alias=alias) == 1
+        assert metrics.counter_value('db_pool_timeouts', alias=alias) == 1
+        busy.close()
+        query(make_wrapper())
+
+    def test_threads_share_limited_pool(self, make_wrapper):
+        errors = []
+
+        def worker():
+            # У каждого потока своё соединение Django, как в воркере.
+            wrapper = make_wrapper(MAX_SIZE=2, TIMEOUT=5)
+            try:
+                for _ in range(20):
+                    query(wrapper)
+                    wrapper.close_if_unusable_or_obsolete()
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors
+        pool = get_pool(make_wrapper.alias, None)
+        assert metrics.counter_value(
+            'db_pool_creates', alias=make_wrapper.alias
+        ) <= 2, 'Проверьте, что пул не открывает соединений сверх лимита'
+        assert pool.in_use == 0
+        assert metrics.counter_value(
+            'db_pool_connections', alias=make_wrapper.alias, state='in_use'
+        ) == 0
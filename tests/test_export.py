@@ -0,0 +1,103 @@
+import csv
+import io
+import json
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from reviews.models import Category, Genre, Title
+from users.models import User
+
+URL = '/api/v1/titles/export/'
+
+
+@pytest.fixture
+def titles():
+    movie = Category.objects.create(name='Фильм', slug='movie')
+    book = Category.objects.create(name='Книга', slug='book')
+    drama = Genre.objects.create(name='Драма', slug='drama')
+    comedy = Genre.objects.create(name='Комедия', slug='comedy')
+    first = Title.objects.create(name='Первое', year=2000, category=movie)
+    first.genre.set([drama, comedy])
+    second = Title.objects.create(name='Второе', year=2001, category=book)
+    second.genre.set([comedy])
+    return first, second
+
+
+def content(response):
+    assert response.status_code == 200
+    return b''.join(response.streaming_content).decode()
+
+
+def make_old(titles):
+    moment = timezone.now() - timedelta(days=1)
+    Title.objects.filter(pk__in=[title.pk for title in titles]).update(
+        updated=moment - timedelta(days=1)
+    )
+    return moment.isoformat()
+
+
+@pytest.mark.django_db
+class TestTitleExport:
+
+    def test_ndjson(self, admin_client, titles):
+        response = admin_client.get(URL)
+        assert response['Content-Type'].startswith('application/x-ndjson')
+        items = [json.loads(line) for line in content(response).splitlines()]
+        assert [item['name'] for item in items] == ['Первое', 'Второе']
+        assert items[0]['category'] == {'name': 'Фильм', 'slug': 'movie'}
+        assert [genre['slug'] for genre in items[0]['genre']] == [
+            'drama', 'comedy'
+        ]
+
+    def test_csv(self, admin_client, titles):
+        response = admin_client.get(URL, {'format': 'csv'})
+        assert response['Content-Type'].startswith('text/csv')
+        rows = list(csv.DictReader(io.StringIO(content(response))))
+        assert [row['name'] for row in rows] == ['Первое', 'Второе']
+        assert rows[0]['category'] == 'movie'
+        assert rows[0]['genre'] == 'drama|comedy'
+
+    def test_updated_since(self, admin_client, titles):
+        first, second = titles
+        since = make_old(titles)
+        assert content(admin_client.get(URL, {'updated_since': since})) == ''
+        second.name = 'Второе издание'
+        second.save()
+        lines = content(
+            admin_client.get(URL, {'updated_since': since})
+        ).splitlines()
+        assert [json.loads(line)['id'] for line in lines] == [second.pk]
+
+    @pytest.mark.parametrize('model, slug', [
+        (Category, 'movie'), (Genre, 'drama'),
+    ])
+    def test_reference_changes(self, admin_client, titles, model, slug):
+        first, _ = titles
+        since = make_old(titles)
+        reference = model.objects.get(slug=slug)
+        reference.name = 'Новое название'
+        reference.save()
+        lines = content(
+            admin_client.get(URL, {'updated_since': since})
+        ).splitlines()
+        assert [json.loads(line)['id'] for line in lines] == [first.pk], (
+            'Проверьте, что переименование категории или жанра попадает в '
+            'инкрементальную выгрузку'
+        )
+        since = make_old(titles)
+        reference.delete()
+        lines = content(
+            admin_client.get(URL, {'updated_since': since, 'format': 'csv'})
+        ).splitlines()
+        assert len(lines) == 2
+
+    def test_invalid_updated_since(self, admin_client, titles):
+        response = admin_client.get(URL, {'updated_since': 'вчера'})
+        assert response.status_code == 400
+
+    def test_admin_only(self, titles, author_client):
+        user = User.objects.create(username='user', email='u@yamdb.fake')
+        client = author_client(user)
+        assert client.get(URL).status_code == 403
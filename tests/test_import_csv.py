@@ -0,0 +1,75 @@
+import os
+from datetime import timedelta
+
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+from django.utils import timezone
+
+from reviews.models import Title
+from users.models import User
+
+DATA_DIR = os.path.join(settings.BASE_DIR, 'static', 'data')
+
+
+def import_csv(*names, **options):
+    call_command(
+        'import_csv',
+        *(os.path.join(DATA_DIR, f'{name}.csv') for name in names),
+        verbosity=0, **options
+    )
+
+
+@pytest.mark.django_db
+class TestImportCSV:
+
+    def test_import(self):
+        import_csv('category', 'genre', 'titles', 'genre_title', 'users',
+                   'review', 'comments')
+        assert Title.objects.count() == 32
+        title = Title.objects.get(pk=1)
+        assert title.score_count == title.reviews.count(), (
+            'Проверьте, что после загрузки пересчитываются рейтинги'
+        )
+        assert Title.objects.filter(rating__isnull=False).exists()
+
+    def test_reimport_keeps_other_columns(self):
+        import_csv('users')
+        user = User.objects.get(pk=100)
+        joined = timezone.now() - timedelta(days=30)
+        user.set_password('secret')
+        User.objects.filter(pk=100).update(
+            password=user.password, confirmation_code='12345',
+            is_staff=True, is_superuser=True, token_version=3,
+            date_joined=joined, bio='Биография', username='renamed',
+        )
+        import_csv('users')
+        user = User.objects.get(pk=100)
+        assert user.username == 'bingobongo'
+        assert user.bio == '', (
+            'Проверьте, что повторная загрузка обновляет поля из файла'
+        )
+        assert user.check_password('secret')
+        assert (user.confirmation_code, user.is_staff, user.is_superuser,
+                user.token_version, user.date_joined) == (
+            '12345', True, True, 3, joined
+        ), 'Проверьте, что поля, которых нет в файле, не сбрасываются'
+
+    def test_reimport_touches_auto_now(self):
+        import_csv('category', 'titles')
+        moment = timezone.now() - timedelta(days=1)
+        Title.objects.filter(pk=1).update(
+            updated=moment, description='Описание'
+        )
+        import_csv('titles')
+        title = Title.objects.get(pk=1)
+        assert title.description == 'Описание'
+        assert title.updated > moment, (
+            'Проверьте, что повторная загрузка отмечает время изменения'
+        )
+
+    def test_skip(self):
+        import_csv('users')
+        User.objects.filter(pk=100).update(username='renamed')
+        import_csv('users', conflict='skip')
+        assert User.objects.get(pk=100).username == 'renamed'
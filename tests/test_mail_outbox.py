@@ -0,0 +1,145 @@
+from datetime import timedelta
+
+import pytest
+from django.core import mail as outbox
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
+from django.utils import timezone
+
+from core import mail, metrics
+from core.models import OutgoingMail
+
+
+class FailingBackend(BaseEmailBackend):
+    def send_messages(self, messages):
+        raise OSError('Почтовый сервер недоступен')
+
+
+@pytest.fixture
+def mail_settings(settings):
+    settings.EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+    settings.MAIL_OUTBOX_WORKER = False
+    settings.MAIL_OUTBOX_RETRY_DELAY = 30
+    settings.MAIL_OUTBOX_MAX_RETRY_DELAY = 100
+    settings.MAIL_OUTBOX_MAX_ATTEMPTS = 3
+    return settings
+
+
+def enqueue(number=1):
+    return [
+        mail.enqueue('Тема', f'Письмо {index}', 'from@yamdb.fake',
+                     ['to@yamdb.fake'])
+        for index in range(number)
+    ]
+
+
+def delivered():
+    return sum(
+        histogram[3] for (name, _), histogram
+        in metrics.collect_all()['histograms'].items()
+        if name == 'mail_delivery_seconds'
+    )
+
+
+# Письма будят поток отправки после фиксации транзакции.
+@pytest.mark.django_db(transaction=True)
+class TestMailOutboxCommit:
+
+    def test_wakes_after_commit(self, mail_settings, monkeypatch):
+        mail_settings.MAIL_OUTBOX_WORKER = True
+        woken = []
+        monkeypatch.setattr(mail, 'wake', lambda: woken.append(True))
+        with transaction.atomic():
+            enqueue()
+            assert not woken, (
+                'Проверьте, что поток отправки будится только после фиксации '
+                'транзакции'
+            )
+        assert woken == [True]
+        with transaction.atomic():
+            enqueue()
+            transaction.set_rollback(True)
+        assert woken == [True]
+        assert OutgoingMail.objects.count() == 1
+
+
+@pytest.mark.django_db
+class TestMailOutbox:
+
+    def test_batches(self, mail_settings, monkeypatch):
+        enqueue(5)
+        connections = []
+        get_connection = mail.get_connection
+
+        def counting(*args, **kwargs):
+            connections.append(True)
+            return get_connection(*args, **kwargs)
+
+        monkeypatch.setattr(mail, 'get_connection', counting)
+        before = delivered()
+        assert mail.drain(batch_size=2) == 5
+        assert len(outbox.outbox) == 5
+        assert len(connections) == 3, (
+            'Проверьте, что порция писем отправляется через одно соединение'
+        )
+        assert not OutgoingMail.objects.exclude(
+            status=OutgoingMail.SENT
+        ).exists()
+        assert delivered() - before == 5, (
+            'Проверьте, что задержка доставки попадает в гистограмму'
+        )
+        assert mail.drain() == 0
+
+    def test_retry_backoff(self, mail_settings):
+        [queued] = enqueue()
+        mail_settings.EMAIL_BACKEND = 'tests.test_mail_outbox.FailingBackend'
+        started = timezone.now()
+        assert mail.drain() == 0
+        queued.refresh_from_db()
+        assert queued.status == OutgoingMail.PENDING
+        assert queued.attempts == 1
+        assert 'Почтовый сервер' in queued.last_error
+        assert (started + timedelta(seconds=30) <= queued.next_attempt
+                <= timezone.now() + timedelta(seconds=30))
+        assert mail.drain() == 0
+        queued.refresh_from_db()
+        assert queued.attempts == 1, (
+            'Проверьте, что письмо не отправляется повторно до срока'
+        )
+        assert [mail.retry_delay(attempt) for attempt in range(1, 5)] == [
+            30, 60, 100, 100
+        ], 'Проверьте, что задержка удваивается до предела'
+
+    def test_max_attempts(self, mail_settings):
+        [queued] = enqueue()
+        mail_settings.EMAIL_BACKEND = 'tests.test_mail_outbox.FailingBackend'
+        OutgoingMail.objects.filter(pk=queued.pk).update(attempts=2)
+        mail.drain()
+        queued.refresh_from_db()
+        assert queued.status == OutgoingMail.FAILED, (
+            'Проверьте, что после MAIL_OUTBOX_MAX_ATTEMPTS попыток письмо '
+            'помечается недоставленным'
+        )
+        assert queued.attempts == 3
+        mail_settings.EMAIL_BACKEND = (
+            'django.core.mail.backends.locmem.EmailBackend'
+        )
+        assert mail.drain() == 0
+
+    def test_claim_lease(self, mail_settings):
+        enqueue(3)
+        first = mail.claim(2)
+        assert len(first) == 2
+        second = mail.claim(2)
+        assert len(second) == 1, (
+            'Проверьте, что взятые письма не достаются другому обработчику'
+        )
+        assert not {item.pk for item in first} & {item.pk for item in second}
+
+    def test_stats(self, mail_settings):
+        enqueue(2)
+        assert mail.stats()['pending'] == 2
+        mail.drain()
+        stats = mail.stats()
+        assert (stats['pending'], stats['sent']) == (0, 2)
+        assert stats['average_delivery_seconds'] >= 0
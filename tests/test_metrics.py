@@ -0,0 +1,89 @@
+import json
+
+import pytest
+from rest_framework.test import APIClient
+
+from core import metrics, prometheus
+
+
+@pytest.fixture
+def metrics_dir(tmp_path, settings):
+    settings.METRICS_DIR = str(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def metrics_token(settings):
+    settings.METRICS_TOKEN = 'secret'
+    return 'Bearer secret'
+
+
+@pytest.mark.django_db
+class TestMetricsEndpoint:
+
+    def test_prometheus_format(self, metrics_dir, metrics_token):
+        client = APIClient()
+        client.get('/api/v1/titles/')
+        response = client.get('/metrics', HTTP_AUTHORIZATION=metrics_token)
+        assert response.status_code == 200
+        assert response['Content-Type'] == prometheus.CONTENT_TYPE
+        body = response.content.decode()
+        for line in (
+            'yamdb_http_requests_total{action="list",'
+            'route="api/v1/titles",status="2xx"} 1',
+            'yamdb_http_request_duration_seconds_bucket{action="list",'
+            'route="api/v1/titles",le="+Inf"} 1',
+            'yamdb_http_request_duration_seconds_count{action="list",'
+            'route="api/v1/titles"} 1',
+        ):
+            assert line in body, f'Проверьте, что в метриках есть {line}'
+        for name in ('yamdb_http_request_db_seconds_sum',
+                     'yamdb_db_queries_total', 'yamdb_worker_up{pid='):
+            assert name in body, f'Проверьте, что в метриках есть {name}'
+
+    def test_route_pattern_label(self, metrics_dir):
+        APIClient().get('/api/v1/titles/1/reviews/')
+        body = prometheus.render()
+        assert 'route="api/v1/titles/{title_id}/reviews"' in body, (
+            'Проверьте, что запросы помечены шаблоном адреса, а не адресом'
+        )
+
+    def test_token(self, metrics_dir, settings):
+        client = APIClient()
+        assert client.get('/metrics').status_code == 403, (
+            'Проверьте, что без заданного METRICS_TOKEN метрики не отдаются'
+        )
+        client.credentials(HTTP_AUTHORIZATION='Bearer ')
+        assert client.get('/metrics').status_code == 403
+        settings.METRICS_TOKEN = 'secret'
+        assert client.get('/metrics').status_code == 403
+        client.credentials(HTTP_AUTHORIZATION='Bearer wrong')
+        assert client.get('/metrics').status_code == 403, (
+            'Проверьте, что без токена метрики не отдаются'
+        )
+        client.credentials(HTTP_AUTHORIZATION='Bearer secret')
+        assert client.get('/metrics').status_code == 200
+
+    def test_finished_processes(self, metrics_dir, monkeypatch):
+        # Файл процесса, которого уже нет: pid больше допустимого.
+        snapshot = {
+            'counters': [['http_errors', {'route': 'x'}, 2]],
+            'gauges': [['worker_up', {'pid': '99999999'}, 1]],
+            'histograms': [['latency', {}, [0.1], [1, 1], 0.3, 2]],
+        }
+        (metrics_dir / '99999999.json').write_text(json.dumps(snapshot))
+        # Архив пополняется при первой записи нового процесса.
+        monkeypatch.setattr(metrics, '_archived_pid', None)
+        metrics.flush()
+        assert not (metrics_dir / '99999999.json').exists()
+        collected = metrics.collect_all()
+        counters = collected['counters']
+        assert counters[('http_errors', (('route', 'x'),))] == 2, (
+            'Проверьте, что счётчики завершившихся процессов сохраняются'
+        )
+        assert ('worker_up', (('pid', '99999999'),)) not in (
+            collected['gauges']
+        ), 'Проверьте, что показатели считаются только по работающим'
+        assert collected['histograms'][('latency', ())] == (
+            (0.1,), [1, 1], 0.3, 2
+        )
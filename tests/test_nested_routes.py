@@ -0,0 +1,85 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from reviews.models import Comment, Review, Title
+from users.models import User
+
+
+@pytest.fixture
+def author():
+    return User.objects.create(username='author', email='a@yamdb.fake')
+
+
+@pytest.fixture
+def reviews(author):
+    titles = [
+        Title.objects.create(name=f'Произведение {number}', year=2000)
+        for number in range(2)
+    ]
+    reviews = [
+        Review.objects.create(title=title, author=author, text='Отзыв',
+                              score=5)
+        for title in titles
+    ]
+    for review in reviews:
+        Comment.objects.create(review=review, author=author, text='Текст')
+    return reviews
+
+
+def parent_queries(queries):
+    return [
+        query['sql'] for query in queries.captured_queries
+        if query['sql'].startswith('SELECT')
+        and 'FROM "reviews_review"' in query['sql']
+    ]
+
+
+@pytest.mark.django_db
+class TestNestedRoutes:
+
+    def test_comments_parent_resolved_once(self, reviews, author,
+                                           author_client):
+        review = reviews[0]
+        url = f'/api/v1/titles/{review.title_id}/reviews/{review.pk}/comments/'
+        with CaptureQueriesContext(connection) as queries:
+            response = author_client(author).post(url, {'text': 'Новый'})
+        assert response.status_code == 201
+        assert len(parent_queries(queries)) == 1, (
+            'Проверьте, что отзыв и произведение из адреса проверяются '
+            'одним запросом'
+        )
+        assert 'JOIN "reviews_title"' in parent_queries(queries)[0]
+        assert Comment.objects.get(pk=response.data['id']).review == review
+
+    @pytest.mark.parametrize('method', ['get', 'post'])
+    def test_mismatched_parents(self, reviews, author, method, author_client):
+        client = author_client(author)
+        review, other = reviews
+        comment = review.comments.get()
+        urls = [
+            f'/api/v1/titles/{other.title_id}/reviews/{review.pk}/comments/',
+            '/api/v1/titles/0/reviews/',
+        ]
+        if method == 'get':
+            urls += [
+                f'/api/v1/titles/{other.title_id}/reviews/{review.pk}/',
+                f'/api/v1/titles/{other.title_id}/reviews/{review.pk}/'
+                f'comments/{comment.pk}/',
+                f'/api/v1/titles/{review.title_id}/reviews/{other.pk}/'
+                f'comments/{comment.pk}/',
+            ]
+        for url in urls:
+            response = getattr(client, method)(url, {'text': 'Текст',
+                                                     'score': 5})
+            assert response.status_code == 404, (
+                f'Проверьте, что {url} с чужим родителем даёт 404'
+            )
+
+    def test_mismatched_detail_write(self, reviews, author, author_client):
+        client = author_client(author)
+        review, other = reviews
+        url = f'/api/v1/titles/{other.title_id}/reviews/{review.pk}/'
+        assert client.patch(url, {'text': 'Изменено'}).status_code == 404
+        assert client.delete(url).status_code == 404
+        assert Review.objects.get(pk=review.pk).text == 'Отзыв'
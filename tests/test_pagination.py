@@ -0,0 +1,70 @@
+import json
+from base64 import b64encode
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from rest_framework.test import APIClient
+
+from reviews.models import Review, Title
+from users.models import User
+
+
+@pytest.fixture
+def title():
+    title = Title.objects.create(name='Произведение', year=2000)
+    for number in range(7):
+        author = User.objects.create(username=f'author{number}',
+                                     email=f'author{number}@yamdb.fake')
+        Review.objects.create(title=title, author=author, text='Отзыв',
+                              score=number + 1)
+    return title
+
+
+def cursor_of(link):
+    return parse_qs(urlparse(link).query)['cursor'][0]
+
+
+def encode(payload):
+    return b64encode(json.dumps(payload).encode()).decode()
+
+
+@pytest.mark.django_db
+class TestCursorPagination:
+
+    def test_pages(self, title):
+        client = APIClient()
+        url = f'/api/v1/titles/{title.pk}/reviews/'
+        first = client.get(url, {'cursor': ''}).data
+        assert 'count' not in first
+        assert first['previous'] is None
+        second = client.get(url, {'cursor': cursor_of(first['next'])}).data
+        assert second['next'] is None
+        assert len(first['results']) + len(second['results']) == 7
+        ids = [review['id'] for review in first['results']]
+        ids += [review['id'] for review in second['results']]
+        expected = list(Review.objects.values_list('pk', flat=True))
+        assert ids == expected, (
+            'Проверьте, что курсор продолжает выдачу в порядке сортировки'
+        )
+        back = client.get(
+            url, {'cursor': cursor_of(second['previous'])}
+        ).data
+        assert back['results'] == first['results'], (
+            'Проверьте, что ссылка previous возвращает предыдущую страницу'
+        )
+
+    @pytest.mark.parametrize('cursor', [
+        'not-base64!',
+        encode({'value': 1}),
+        encode(['not-a-date', 1, False]),
+        encode([None, 1, False]),
+        encode(['2022-06-27T00:00:00', 'x', False]),
+    ])
+    def test_invalid_cursor(self, title, cursor):
+        response = APIClient().get(
+            f'/api/v1/titles/{title.pk}/reviews/', {'cursor': cursor}
+        )
+        assert response.status_code == 404, (
+            'Проверьте, что некорректный курсор даёт ответ 404, а не ошибку '
+            'сервера'
+        )
@@ -0,0 +1,98 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from core.query_audit import (
+    SEQ_SCAN, capture_queries, explain, is_select, suggest_index
+)
+from reviews.models import Category, Comment, Genre, Review, Title
+from users.models import User
+
+
+@pytest.fixture
+def catalog():
+    category = Category.objects.create(name='Фильм', slug='movie')
+    genre = Genre.objects.create(name='Драма', slug='drama')
+    title = Title.objects.create(name='Побег', year=2000, category=category)
+    title.genre.set([genre])
+    author = User.objects.create(username='author', email='a@yamdb.fake')
+    review = Review.objects.create(title=title, author=author, text='Отзыв',
+                                   score=5)
+    Comment.objects.create(review=review, author=author, text='Текст')
+
+
+def audit(*args):
+    stdout = StringIO()
+    call_command('audit_queries', *args, stdout=stdout)
+    return json.loads(stdout.getvalue())
+
+
+@pytest.mark.django_db
+class TestQueryAudit:
+
+    def test_report(self, catalog):
+        users = User.objects.count()
+        report = audit()
+        endpoints = {item['name']: item for item in report['endpoints']}
+        assert {'titles-list', 'reviews-detail', 'comments-detail',
+                'users-me-activity'} <= set(endpoints)
+        # Вторых страниц на таких данных нет.
+        assert all(
+            item['status'] == 200 for name, item in endpoints.items()
+            if not name.endswith('-page-2')
+        ), 'Проверьте, что все сценарии аудита выполняются успешно'
+        statement = endpoints['titles-detail']['queries'][0]
+        assert {'sql', 'plan', 'flags', 'cost'} <= set(statement)
+        assert all(is_select(query['sql'])
+                   for item in endpoints.values()
+                   for query in item['queries'])
+        assert User.objects.count() == users, (
+            'Проверьте, что временный администратор аудита удаляется'
+        )
+
+    def test_empty_database_and_output(self, tmp_path):
+        path = tmp_path / 'audit.json'
+        call_command('audit_queries', '--no-analyze', '--output', str(path))
+        report = json.loads(path.read_text(encoding='utf-8'))
+        assert report['analyze'] is False
+        names = [item['name'] for item in report['endpoints']]
+        assert 'titles-list' in names
+        assert 'reviews-detail' not in names, (
+            'Проверьте, что сценарии с объектами пропускаются, если '
+            'объектов нет'
+        )
+
+    def test_explain_and_capture(self, catalog):
+        with capture_queries() as queries:
+            list(Title.objects.filter(description='Описание'))
+        [(sql, params)] = queries
+        assert params == ('Описание',)
+        flags = explain(sql, params, analyze=False)['flags']
+        assert SEQ_SCAN in {flag['flag'] for flag in flags}
+
+
+class TestSuggestIndex:
+
+    def test_missing_index(self):
+        sql = (
+            'SELECT "reviews_comment"."id" FROM "reviews_comment" '
+            'WHERE "reviews_comment"."text" = %s '
+            'ORDER BY "reviews_comment"."pub_date" DESC, '
+            '"reviews_comment"."id" DESC'
+        )
+        assert suggest_index(sql) == (
+            'reviews.Comment', ['text', '-pub_date']
+        ), (
+            'Проверьте, что предлагается индекс по равенствам, затем по '
+            'сортировке без первичного ключа'
+        )
+
+    def test_existing_index(self):
+        sql = (
+            'SELECT "reviews_title"."id" FROM "reviews_title" '
+            'WHERE "reviews_title"."id" = %s'
+        )
+        assert suggest_index(sql) is None
+        assert suggest_index('SELECT 1') is None
@@ -0,0 +1,111 @@
+import pytest
+from django.core.management import call_command
+from django.db import connections
+from rest_framework.test import APIClient
+
+from core import metrics, routers
+from core.middleware import PrimaryPinningMiddleware
+from reviews import catalog
+from reviews.models import Category, Title
+from users import tokens
+from users.models import User
+
+
+def add_database(alias, name):
+    connections.databases[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3', 'NAME': name,
+    }
+
+
+def remove_database(alias):
+    connections[alias].close()
+    del connections.databases[alias]
+    delattr(connections._connections, alias)
+
+
+@pytest.fixture
+def replica(tmp_path, settings):
+    """Реплика - отдельная база SQLite со своими данными, чтобы было
+    видно, откуда прочитан ответ.
+    """
+    add_database('replica', str(tmp_path / 'replica.sqlite3'))
+    call_command('migrate', database='replica', verbosity=0)
+    settings.REPLICA_DATABASES = ['replica']
+    yield 'replica'
+    remove_database('replica')
+    routers._down_until.clear()
+
+
+@pytest.fixture
+def title(replica):
+    title = Title.objects.create(name='Произведение', year=2000)
+    Title.objects.using(replica).create(
+        pk=title.pk, name='Произведение с реплики', year=2000
+    )
+    return title
+
+
+# Чтение внутри транзакции идёт с основной базы, поэтому тестам нужна
+# база без транзакции теста.
+@pytest.mark.django_db(transaction=True)
+class TestReplicaRouting:
+
+    def test_reads_from_replica(self, title):
+        response = APIClient().get(f'/api/v1/titles/{title.pk}/')
+        assert response.status_code == 200
+        assert response.data['name'] == 'Произведение с реплики', (
+            'Проверьте, что GET-запросы читают данные с реплики'
+        )
+
+    def test_writer_pinned_to_primary(self, title, settings, monkeypatch,
+                                      author_client):
+        settings.REPLICA_PIN_SECONDS = 10
+        user = User.objects.create(username='writer', email='w@yamdb.fake')
+        client = author_client(user)
+        url = f'/api/v1/titles/{title.pk}/reviews/'
+        response = client.post(url, {'text': 'Отзыв', 'score': 7})
+        assert response.status_code == 201
+        assert client.get(url).data['count'] == 1, (
+            'Проверьте, что после записи клиент читает с основной базы'
+        )
+        # Без cookie клиент узнаётся по токену.
+        client.cookies.clear()
+        assert client.get(url).data['count'] == 1
+        assert APIClient().get(url).data['count'] == 0
+
+        now = PrimaryPinningMiddleware.timer()
+        monkeypatch.setattr(
+            PrimaryPinningMiddleware, 'timer', staticmethod(lambda: now + 11)
+        )
+        assert client.get(url).data['count'] == 0, (
+            'Проверьте, что привязка к основной базе ограничена по времени'
+        )
+
+    def test_fallback_to_primary(self, title, settings, tmp_path):
+        add_database('broken', str(tmp_path / 'missing' / 'db.sqlite3'))
+        settings.REPLICA_DATABASES = ['broken']
+        try:
+            response = APIClient().get(f'/api/v1/titles/{title.pk}/')
+        finally:
+            remove_database('broken')
+        assert response.status_code == 200, (
+            'Проверьте, что при недоступной реплике чтение идёт с основной '
+            'базы'
+        )
+        assert response.data['name'] == 'Произведение'
+        assert metrics.counter_value(
+            'db_replica_failures', alias='broken'
+        ) >= 1
+
+    def test_stamped_caches_read_primary(self, replica):
+        # Реплика отстаёт: категории и пользователя на ней ещё нет.
+        Category.objects.create(name='Фильм', slug='movie')
+        user = User.objects.create(username='reader', email='r@yamdb.fake')
+        with routers.replica_reads():
+            assert catalog.categories.get_by_slug('movie') is not None, (
+                'Проверьте, что справочник, который хранится до смены '
+                'штампа, читается с основной базы'
+            )
+            assert tokens.current_version(user.pk) == user.token_version, (
+                'Проверьте, что версия токенов кэшируется по основной базе'
+            )
@@ -0,0 +1,88 @@
+import pytest
+from rest_framework.test import APIClient
+
+from reviews.models import Comment, Review, Title
+from users.models import User
+
+
+@pytest.fixture
+def titles():
+    return [
+        Title.objects.create(name=f'Произведение {number}', year=2000)
+        for number in range(7)
+    ]
+
+
+@pytest.fixture
+def review():
+    title = Title.objects.create(name='Произведение', year=2000)
+    author = User.objects.create(username='author', email='a@yamdb.fake')
+    return Review.objects.create(
+        title=title, author=author, text='Отзыв', score=5
+    )
+
+
+@pytest.mark.django_db
+class TestResponseCache:
+
+    def test_hit(self, titles):
+        client = APIClient()
+        assert client.get('/api/v1/titles/')['X-Cache'] == 'MISS'
+        assert client.get('/api/v1/titles/')['X-Cache'] == 'HIT', (
+            'Проверьте, что повторный запрос получает ответ из кэша'
+        )
+
+    def test_key_includes_host(self, titles):
+        client = APIClient()
+        client.get('/api/v1/titles/', {'page': 1}, HTTP_HOST='evil.example')
+        response = client.get('/api/v1/titles/', {'page': 1})
+        assert response['X-Cache'] == 'MISS'
+        assert response.data['next'].startswith('http://testserver/'), (
+            'Проверьте, что ответ с абсолютными ссылками, закэшированный '
+            'для одного хоста, не отдаётся запросам к другому'
+        )
+
+
+# Штампы версий меняются после фиксации транзакции.
+@pytest.mark.django_db(transaction=True)
+class TestResponseCacheInvalidation:
+
+    def test_write_invalidates_list(self, review):
+        client = APIClient()
+        url = f'/api/v1/titles/{review.title_id}/reviews/{review.pk}/comments/'
+        assert client.get(url).data['count'] == 0
+        assert client.get(url)['X-Cache'] == 'HIT'
+        Comment.objects.create(review=review, author=review.author,
+                               text='Текст')
+        response = client.get(url)
+        assert response['X-Cache'] == 'MISS'
+        assert response.data['count'] == 1, (
+            'Проверьте, что новый комментарий сбрасывает кэш списка'
+        )
+        detail = f'/api/v1/titles/{review.title_id}/reviews/{review.pk}/'
+        assert client.get(detail).data['comments_count'] == 1
+
+    def test_deleted_title_reviews(self, review):
+        client = APIClient()
+        title = Title.objects.create(name='Без отзывов', year=2001)
+        url = f'/api/v1/titles/{title.pk}/reviews/'
+        response = client.get(url)
+        assert response.data['results'] == []
+        etag = response['ETag']
+        title.delete()
+        assert client.get(url).status_code == 404, (
+            'Проверьте, что список отзывов удалённого произведения '
+            'не отдаётся из кэша'
+        )
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 404
+
+    def test_deleted_review_comments(self, review):
+        client = APIClient()
+        url = f'/api/v1/titles/{review.title_id}/reviews/{review.pk}/comments/'
+        etag = client.get(url)['ETag']
+        review.delete()
+        assert client.get(url).status_code == 404, (
+            'Проверьте, что список комментариев удалённого отзыва '
+            'не отдаётся из кэша'
+        )
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 404
@@ -0,0 +1,78 @@
+import pytest
+from rest_framework.test import APIClient
+
+from reviews.models import Comment, Review, Title
+from users.models import User
+
+
+@pytest.fixture
+def review():
+    title = Title.objects.create(name='Произведение', year=2000)
+    authors = [
+        User.objects.create(username=f'author{number}',
+                            email=f'author{number}@yamdb.fake')
+        for number in range(5)
+    ]
+    for number, author in enumerate(authors):
+        Review.objects.create(
+            title=title, author=author, text='Отзыв', score=number + 1
+        )
+    review = Review.objects.get(author=authors[0])
+    for author in authors:
+        Comment.objects.create(review=review, author=author, text='Текст')
+    return review
+
+
+@pytest.mark.django_db
+class TestReviewQueries:
+
+    def test_reviews_list(self, review, django_assert_num_queries):
+        client = APIClient()
+        with django_assert_num_queries(3):
+            response = client.get(f'/api/v1/titles/{review.title_id}/reviews/')
+        assert response.status_code == 200
+        assert len(response.data['results']) == 5
+        assert response.data['results'][0]['author'].startswith('author'), (
+            'Проверьте, что в поле author выводится username автора'
+        )
+
+    def test_comments_list(self, review, django_assert_num_queries):
+        client = APIClient()
+        url = (f'/api/v1/titles/{review.title_id}/reviews/{review.pk}/'
+               'comments/')
+        with django_assert_num_queries(3):
+            response = client.get(url)
+        assert response.status_code == 200
+        assert len(response.data['results']) == 5
+
+    def test_review_detail(self, review, django_assert_num_queries):
+        client = APIClient()
+        url = f'/api/v1/titles/{review.title_id}/reviews/{review.pk}/'
+        with django_assert_num_queries(1):
+            response = client.get(url)
+        assert response.status_code == 200
+        assert response.data['author'] == review.author.username
+
+    def test_review_update_by_author(self, review, author_client,
+                                     django_assert_num_queries):
+        client = author_client(review.author)
+        url = f'/api/v1/titles/{review.title_id}/reviews/{review.pk}/'
+        # Отзыв с автором, прежняя оценка, запись отзыва и агрегатов
+        # произведения, SAVEPOINT и RELEASE транзакции теста. Пользователь
+        # берётся из токена.
+        with django_assert_num_queries(6):
+            response = client.patch(url, {'score': 10})
+        assert response.status_code == 200
+        assert response.data['author'] == review.author.username
+
+    def test_comment_update_by_other_user(self, review, author_client,
+                                          django_assert_num_queries):
+        comment = review.comments.exclude(author=review.author).first()
+        client = author_client(review.author)
+        url = (f'/api/v1/titles/{review.title_id}/reviews/{review.pk}/'
+               f'comments/{comment.pk}/')
+        with django_assert_num_queries(1):
+            response = client.patch(url, {'text': 'Новый текст'})
+        assert response.status_code == 403, (
+            'Проверьте, что чужой комментарий нельзя изменить'
+        )
@@ -0,0 +1,228 @@
+import pytest
+from rest_framework.test import APIClient
+
+from reviews.models import Review, Title
+from users.models import User
+
+
+@pytest.fixture
+def title():
+    return Title.objects.create(name='Произведение', year=2000)
+
+
+@pytest.fixture
+def authors():
+    return [
+        User.objects.create(username=f'author{number}',
+                            email=f'author{number}@yamdb.fake')
+        for number in range(3)
+    ]
+
+
+def aggregates(title):
+    return Title.objects.values_list(
+        'score_sum', 'score_count', 'rating'
+    ).get(pk=title.pk)
+
+
+@pytest.mark.django_db
+class TestTitleScores:
+
+    def test_create(self, title, authors):
+        assert aggregates(title) == (0, 0, None)
+        Review.objects.create(title=title, author=authors[0], text='Отзыв',
+                              score=7)
+        Review.objects.create(title=title, author=authors[1], text='Отзыв',
+                              score=8)
+        assert aggregates(title) == (15, 2, 8), (
+            'Проверьте, что сумма, количество оценок и округлённый рейтинг '
+            'обновляются при создании отзыва'
+        )
+
+    def test_edit_score(self, title, authors):
+        review = Review.objects.create(
+            title=title, author=authors[0], text='Отзыв', score=3
+        )
+        review.score = 9
+        review.save()
+        assert aggregates(title) == (9, 1, 9), (
+            'Проверьте, что при изменении оценки прежняя вычитается'
+        )
+        review.text = 'Новый текст'
+        review.save()
+        assert aggregates(title) == (9, 1, 9)
+
+    def test_move_review(self, title, authors):
+        other = Title.objects.create(name='Другое', year=2001)
+        review = Review.objects.create(
+            title=title, author=authors[0], text='Отзыв', score=4
+        )
+        review.title = other
+        review.save()
+        assert aggregates(title) == (0, 0, None)
+        assert aggregates(other) == (4, 1, 4)
+
+    def test_delete(self, title, authors):
+        reviews = [
+            Review.objects.create(title=title, author=author, text='Отзыв',
+                                  score=score)
+            for author, score in zip(authors, (2, 5, 10))
+        ]
+        reviews[0].delete()
+        assert aggregates(title) == (15, 2, 8)
+        Review.objects.filter(pk=reviews[1].pk).delete()
+        assert aggregates(title) == (10, 1, 10)
+        authors[2].delete()
+        assert aggregates(title) == (0, 0, None), (
+            'Проверьте, что оценки вычитаются и при каскадном удалении '
+            'отзывов'
+        )
+
+    def test_double_delete(self, title, authors):
+        Review.objects.create(title=title, author=authors[0], text='Отзыв',
+                              score=6)
+        review = Review.objects.create(
+            title=title, author=authors[1], text='Отзыв', score=4
+        )
+        copy = Review.objects.get(pk=review.pk)
+        review.delete()
+        copy.delete()
+        assert aggregates(title) == (6, 1, 6), (
+            'Проверьте, что повторное удаление отзыва не вычитает оценку '
+            'ещё раз'
+        )
+
+    def test_delete_stale_instance(self, title, authors):
+        review = Review.objects.create(
+            title=title, author=authors[0], text='Отзыв', score=3
+        )
+        stale = Review.objects.get(pk=review.pk)
+        review.score = 9
+        review.save()
+        stale.delete()
+        assert aggregates(title) == (0, 0, None), (
+            'Проверьте, что вычитается оценка из базы, а не из устаревшего '
+            'экземпляра'
+        )
+        assert histogram(title) == {}
+
+    def test_title_cascade(self, title, authors):
+        for author in authors:
+            Review.objects.create(title=title, author=author, text='Отзыв',
+                                  score=5)
+        title.delete()
+        assert not Review.objects.exists(), (
+            'Проверьте, что отзывы удаляются вместе с произведением'
+        )
+
+    def test_rebuild(self, title, authors):
+        for author, score in zip(authors, (1, 2, 6)):
+            Review.objects.create(title=title, author=author, text='Отзыв',
+                                  score=score)
+        Title.objects.filter(pk=title.pk).update(
+            score_sum=0, score_count=0, rating=None
+        )
+        assert Title.objects.rebuild_scores() == 1
+        assert aggregates(title) == (9, 3, 3)
+
+
+def histogram(title):
+    counts = Title.objects.get(pk=title.pk).score_histogram
+    return {score: count for score, count in counts.items() if count}
+
+
+@pytest.mark.django_db
+class TestScoreHistogram:
+
+    def test_changes(self, title, authors):
+        reviews = [
+            Review.objects.create(title=title, author=author, text='Отзыв',
+                                  score=score)
+            for author, score in zip(authors, (3, 3, 8))
+        ]
+        assert histogram(title) == {3: 2, 8: 1}, (
+            'Проверьте, что распределение оценок обновляется при создании '
+            'отзыва'
+        )
+        reviews[0].score = 10
+        reviews[0].save()
+        assert histogram(title) == {3: 1, 8: 1, 10: 1}
+        reviews[1].delete()
+        authors[2].delete()
+        assert histogram(title) == {10: 1}, (
+            'Проверьте, что распределение оценок обновляется при удалении '
+            'отзывов, в том числе каскадном'
+        )
+
+    def test_rebuild(self, title, authors):
+        for author, score in zip(authors, (1, 1, 7)):
+            Review.objects.create(title=title, author=author, text='Отзыв',
+                                  score=score)
+        Title.objects.filter(pk=title.pk).update(score_1=0, score_7=5)
+        Title.objects.rebuild_scores()
+        assert histogram(title) == {1: 2, 7: 1}
+
+    def test_endpoint(self, title, authors):
+        for author, score in zip(authors, (2, 9, 10)):
+            Review.objects.create(title=title, author=author, text='Отзыв',
+                                  score=score)
+        response = APIClient().get(f'/api/v1/titles/{title.pk}/histogram/')
+        assert response.status_code == 200
+        assert response.data['count'] == 3
+        assert response.data['mean'] == 7.0
+        assert response.data['median'] == 9
+        assert response.data['scores']['10'] == 1
+        assert response.data['scores']['1'] == 0
+
+    def test_median(self):
+        title = Title(score_count=4, score_2=1, score_5=2, score_9=1)
+        assert title.score_median == 5
+        title = Title(score_count=2, score_4=1, score_7=1)
+        assert title.score_median == 5.5
+        assert Title().score_median is None
+
+
+@pytest.mark.django_db
+class TestReviewUpsert:
+
+    def test_create_then_replace(self, title, authors, author_client):
+        client = author_client(authors[0])
+        url = f'/api/v1/titles/{title.pk}/reviews/me/'
+        response = client.put(url, {'text': 'Отзыв', 'score': 4})
+        assert response.status_code == 201
+        review_id = response.data['id']
+        assert aggregates(title) == (4, 1, 4)
+        response = client.put(url, {'text': 'Новый отзыв', 'score': 9})
+        assert response.status_code == 200, (
+            'Проверьте, что повторный PUT заменяет отзыв и отвечает 200'
+        )
+        assert response.data['id'] == review_id
+        assert response.data['text'] == 'Новый отзыв'
+        assert aggregates(title) == (9, 1, 9), (
+            'Проверьте, что при замене отзыва прежняя оценка вычитается'
+        )
+        assert histogram(title) == {9: 1}
+
+    def test_idempotent(self, title, authors, author_client):
+        client = author_client(authors[0])
+        Review.objects.create(title=title, author=authors[1], text='Отзыв',
+                              score=2)
+        url = f'/api/v1/titles/{title.pk}/reviews/me/'
+        for _ in range(3):
+            response = client.put(url, {'text': 'Отзыв', 'score': 6})
+        assert response.status_code == 200
+        assert Review.objects.filter(author=authors[0]).count() == 1
+        assert aggregates(title) == (8, 2, 4), (
+            'Проверьте, что повтор запроса не меняет агрегаты произведения'
+        )
+
+    def test_conflicting_insert(self, title, authors):
+        Review.objects.create(title=title, author=authors[0], text='Отзыв',
+                              score=3)
+        review = Review(title=title, author=authors[0], text='Второй',
+                        score=5)
+        assert not Review.objects.all()._insert_row(review), (
+            'Проверьте, что вставка существующего отзыва не перезаписывает '
+            'его'
+        )
+        assert Review.objects.get().text == 'Отзыв'
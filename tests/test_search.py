@@ -0,0 +1,78 @@
+import pytest
+from django.db import connection
+from rest_framework.test import APIClient
+
+from reviews.models import Genre, Title
+from reviews.search import ensure_sqlite_triggers
+
+
+@pytest.fixture
+def titles():
+    drama = Genre.objects.create(name='Драма', slug='drama')
+    titles = [
+        Title.objects.create(name=name, year=2000)
+        for name in ('Побег из Шоушенка', 'Побег', 'Зелёная миля')
+    ]
+    titles[0].genre.set([drama])
+    titles[2].genre.set([drama])
+    return titles
+
+
+def search(query, **params):
+    response = APIClient().get(
+        '/api/v1/titles/', {'search': query, **params}
+    )
+    assert response.status_code == 200
+    return [title['name'] for title in response.data['results']]
+
+
+@pytest.mark.django_db
+class TestTitleSearch:
+
+    def test_relevance(self, titles):
+        assert search('побег') == ['Побег', 'Побег из Шоушенка'], (
+            'Проверьте, что поиск находит произведения по слову из '
+            'названия и упорядочивает их по релевантности'
+        )
+        assert search('ногучи') == []
+
+    def test_wildcards(self, titles):
+        assert search('%') == [] and search('_') == [], (
+            'Проверьте, что % и _ в запросе не находят все произведения'
+        )
+        Title.objects.create(name='100% любовь', year=2011)
+        assert search('100%') == ['100% любовь']
+
+    def test_with_filters(self, titles):
+        assert search('побег', genre='drama') == ['Побег из Шоушенка'], (
+            'Проверьте, что поиск сочетается с фильтрами'
+        )
+
+    def test_index_follows_changes(self, titles):
+        titles[1].name = 'Остров проклятых'
+        titles[1].save()
+        titles[0].delete()
+        assert search('побег') == []
+        assert search('остров') == ['Остров проклятых'], (
+            'Проверьте, что индекс поиска обновляется при изменении '
+            'названий'
+        )
+
+    @pytest.mark.skipif(
+        connection.vendor != 'sqlite', reason='Триггеры FTS5 есть в SQLite'
+    )
+    def test_lost_triggers_restored(self, titles):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER reviews_title_fts_insert')
+            cursor.execute('DROP TRIGGER reviews_title_fts_update')
+        titles[1].name = 'Остров проклятых'
+        titles[1].save()
+        Title.objects.create(name='Побег в никуда', year=2001)
+        ensure_sqlite_triggers()
+        assert search('остров') == ['Остров проклятых']
+        assert 'Побег в никуда' in search('побег'), (
+            'Проверьте, что после миграций триггеры поиска восстанавливаются '
+            'и индекс перестраивается'
+        )
+        Title.objects.create(name='Побег из Алькатраса', year=1979)
+        assert search('алькатрас') == ['Побег из Алькатраса']
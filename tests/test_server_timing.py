@@ -0,0 +1,63 @@
+import json
+import logging
+
+import pytest
+from rest_framework.test import APIClient
+
+from core import timing
+from reviews import catalog
+from reviews.models import Category, Title
+
+
+@pytest.fixture
+def titles():
+    category = Category.objects.create(name='Фильм', slug='movie')
+    catalog.categories.refresh()
+    return [
+        Title.objects.create(
+            name=f'Произведение {number}', year=2000, category=category
+        )
+        for number in range(5)
+    ]
+
+
+@pytest.mark.django_db
+class TestServerTiming:
+
+    def test_sampled_request(self, titles, settings, caplog):
+        settings.SERVER_TIMING_SAMPLE_RATE = 1
+        with caplog.at_level(logging.INFO, logger='core.middleware'):
+            response = APIClient().get('/api/v1/titles/')
+        header = response['Server-Timing']
+        for name in ('total;dur=', 'sql;dur=', 'serializer;dur=',
+                     'render;dur='):
+            assert name in header, (
+                f'Проверьте, что в заголовке Server-Timing есть {name}'
+            )
+        assert 'desc="3 queries, 0 duplicates"' in header
+        assert 'endpoint;desc="TitleViewSet.list"' in header, (
+            'Проверьте, что замеры помечены вьюсетом и действием'
+        )
+        record = json.loads(caplog.records[-1].getMessage())
+        assert record['endpoint'] == 'TitleViewSet.list'
+        assert record['sql_queries'] == 3
+        assert record['status'] == 200
+
+    def test_not_sampled_request(self, titles, settings, caplog):
+        settings.SERVER_TIMING_SAMPLE_RATE = 0
+        with caplog.at_level(logging.INFO, logger='core.middleware'):
+            response = APIClient().get('/api/v1/titles/')
+        assert response['Server-Timing'].startswith('total;dur=')
+        assert 'sql' not in response['Server-Timing']
+        assert not caplog.records, (
+            'Проверьте, что в журнал попадают только запросы из выборки'
+        )
+
+    def test_repeated_queries(self, titles):
+        with timing.collect(timing.RequestTimings()) as timings:
+            for title in titles:
+                Title.objects.get(pk=title.pk)
+        assert timings.sql_count == 5
+        assert timings.duplicates == 4
+        [(sql, count)] = timings.repeated(5)
+        assert count == 5, 'Проверьте, что повторы запроса (N+1) находятся'
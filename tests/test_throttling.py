@@ -0,0 +1,96 @@
+import pytest
+from rest_framework.test import APIClient
+
+from core import metrics, throttling
+from core.throttling import TokenBucketThrottle, take_token
+
+URL = '/api/v1/auth/signup/'
+
+
+@pytest.fixture
+def rates(settings):
+    settings.REST_FRAMEWORK = {
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {
+            'signup_ip': '2/min', 'signup_username': '1/min',
+        },
+    }
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(
+        TokenBucketThrottle, 'timer', staticmethod(lambda: now[0])
+    )
+    return now
+
+
+def signup(client_ip, username=None, forwarded=None):
+    data = {'username': username} if username else {}
+    forwarded = f'{forwarded}, {client_ip}' if forwarded else client_ip
+    return APIClient().post(URL, data, HTTP_X_FORWARDED_FOR=forwarded)
+
+
+class TestTokenBucket:
+
+    def test_take_token(self):
+        state = None
+        for _ in range(3):
+            state, wait = take_token(state, 3, 1.0, 100.0)
+            assert wait == 0
+        state, wait = take_token(state, 3, 1.0, 100.0)
+        assert wait == 1.0, 'Проверьте, что пустая корзина даёт ожидание'
+        state, wait = take_token(state, 3, 1.0, 100.5)
+        assert wait == 0.5
+        state, wait = take_token(state, 3, 1.0, 101.0)
+        assert wait == 0, 'Проверьте, что корзина наполняется со временем'
+        _, wait = take_token((0, 0.0), 3, 1.0, 1000.0)
+        assert wait == 0
+
+    def test_local_store_evicts(self):
+        store = throttling.LocalBucketStore(max_keys=2)
+        for key in ('a', 'b', 'c'):
+            store.take(key, 1, 1.0, 100.0)
+        assert list(store.buckets) == ['b', 'c']
+        assert store.take('a', 1, 1.0, 100.0) == 0
+
+
+@pytest.mark.django_db
+class TestThrottling:
+
+    def test_ip_limit(self, rates, clock):
+        before = metrics.counter_value(
+            'throttled_requests', scope='signup', kind='ip'
+        )
+        assert signup('10.0.0.1').status_code == 400
+        assert signup('10.0.0.1').status_code == 400
+        response = signup('10.0.0.1')
+        assert response.status_code == 429
+        assert response['Retry-After'] == '30', (
+            'Проверьте, что ответ 429 сообщает, через сколько секунд '
+            'появится токен'
+        )
+        assert metrics.counter_value(
+            'throttled_requests', scope='signup', kind='ip'
+        ) == before + 1
+        assert signup('10.0.0.2').status_code == 400
+        clock[0] += 30
+        assert signup('10.0.0.1').status_code == 400
+
+    def test_forwarded_for_spoofing(self, rates, clock):
+        for number in range(2):
+            signup('10.0.0.1', forwarded=f'192.168.0.{number}')
+        assert signup(
+            '10.0.0.1', forwarded='192.168.0.99'
+        ).status_code == 429, (
+            'Проверьте, что IP клиента берётся из адреса, дописанного '
+            'прокси, а не из присланного клиентом X-Forwarded-For'
+        )
+
+    def test_username_limit(self, rates, clock):
+        assert signup('10.0.0.1', username='Имя').status_code == 400
+        response = signup('10.0.0.2', username='имя')
+        assert response.status_code == 429
+        assert response['Retry-After'] == '60'
+        assert signup('10.0.0.3', username='другое').status_code == 400
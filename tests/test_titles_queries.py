@@ -0,0 +1,70 @@
+import pytest
+from rest_framework.test import APIClient
+
+from core import versions
+from reviews import catalog
+from reviews.models import Category, Genre, Title
+
+
+@pytest.fixture
+def titles():
+    category = Category.objects.create(name='Фильм', slug='movie')
+    genres = [
+        Genre.objects.create(name='Драма', slug='drama'),
+        Genre.objects.create(name='Комедия', slug='comedy'),
+    ]
+    for number in range(5):
+        title = Title.objects.create(
+            name=f'Произведение {number}', year=2000, category=category
+        )
+        title.genre.set(genres)
+    return Title.objects.all()
+
+
+@pytest.mark.django_db
+class TestTitleQueries:
+
+    @pytest.mark.parametrize('query', ['', '?genre=drama&category=movie'])
+    def test_titles_list(self, titles, django_assert_num_queries, query):
+        client = APIClient()
+        # Количество, произведения и связи с жанрами, а также загрузка
+        # справочников категорий и жанров при первом обращении.
+        with django_assert_num_queries(5):
+            response = client.get(f'/api/v1/titles/{query}')
+        assert response.status_code == 200
+        assert len(response.data['results']) == 5, (
+            'Проверьте, что жанры не дублируют произведения в выдаче'
+        )
+        assert response.data['results'][0]['category']['slug'] == 'movie'
+        assert len(response.data['results'][0]['genre']) == 2
+
+    def test_title_detail(self, titles, django_assert_num_queries):
+        client = APIClient()
+        title_id = titles.first().pk
+        with django_assert_num_queries(4):
+            response = client.get(f'/api/v1/titles/{title_id}/')
+        assert response.status_code == 200
+        # Другой адрес, чтобы ответ не взялся из кэша ответов.
+        with django_assert_num_queries(2):
+            response = client.get(f'/api/v1/titles/{title_id}/?format=json')
+        assert response.status_code == 200, (
+            'Проверьте, что загруженные справочники не читаются заново'
+        )
+
+    def test_catalog_checked_once_per_request(self, titles, monkeypatch,
+                                              django_assert_num_queries):
+        checks = []
+        get_stamps = versions.get_stamps
+
+        def counting_get_stamps(*scopes):
+            checks.extend(scopes)
+            return get_stamps(*scopes)
+
+        monkeypatch.setattr(versions, 'get_stamps', counting_get_stamps)
+        APIClient().get('/api/v1/titles/')
+        assert checks.count('genres') == 1, (
+            'Проверьте, что штамп справочника сверяется один раз за запрос'
+        )
+        with django_assert_num_queries(0):
+            for _ in range(100):
+                assert catalog.genres.get_by_slug('missing') is None